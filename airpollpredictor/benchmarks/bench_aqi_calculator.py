@@ -0,0 +1,52 @@
+# pylint: disable=E0401, W0212
+
+"""
+Benchmark of the AQI calculation for 10+ years of hourly data:
+vectorized calculation against the calculation per day (DataFrame.apply).
+Run from the airpollpredictor folder: python -m benchmarks.bench_aqi_calculator
+"""
+
+import timeit
+import numpy as np
+import pandas as pd
+from settings import settings
+import data_preprocessing.aqi_calculations.aqi_calculator as aqc
+from benchmarks import bench_utils
+
+YEARS_COUNT = 12
+REPEAT_COUNT = 3
+
+
+def __calc_aqi_per_day(pollutant_id: int, df_aqi: pd.DataFrame) -> pd.Series:
+    pollutant_info = aqc._POLLUTANTS_INFO[pollutant_id]
+    return df_aqi.apply(lambda x: aqc.__get_aqi_for_day(pollutant_info, x.values), axis=1)
+
+
+def __calc_aqi_vectorized(pollutant_id: int, df_aqi: pd.DataFrame) -> np.ndarray:
+    return aqc.calc_aqi_for_days_np(
+        pollutant_id, [df_aqi[col].to_numpy(dtype=np.float64) for col in df_aqi.columns])
+
+
+def run_benchmark():
+    """
+    Runs the benchmark for every pollutant and prints the results
+    """
+    for pollutant_id, pollutant_info in aqc._POLLUTANTS_INFO.items():
+        df_hourly = bench_utils.get_hourly_concentrations(YEARS_COUNT)
+        df_aqi = aqc.__recalculate_concentration_pd(pollutant_info, df_hourly,
+                                                    settings.POL_MEASURES[pollutant_id])
+        aqi_per_day = __calc_aqi_per_day(pollutant_id, df_aqi).to_numpy()
+        aqi_vectorized = __calc_aqi_vectorized(pollutant_id, df_aqi)
+        assert np.array_equal(aqi_per_day, aqi_vectorized)
+
+        time_per_day = min(timeit.repeat(lambda: __calc_aqi_per_day(pollutant_id, df_aqi),
+                                         number=1, repeat=REPEAT_COUNT))
+        time_vectorized = min(timeit.repeat(lambda: __calc_aqi_vectorized(pollutant_id, df_aqi),
+                                            number=1, repeat=REPEAT_COUNT))
+        bench_utils.print_result(f'{pollutant_info.pollutant_code}: '
+                                 f'{df_hourly.shape[0]} hours, {df_aqi.shape[0]} days',
+                                 time_per_day, time_vectorized)
+
+
+if __name__ == '__main__':
+    run_benchmark()
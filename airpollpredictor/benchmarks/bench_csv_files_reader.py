@@ -0,0 +1,74 @@
+# pylint: disable=E0401
+
+"""
+Benchmark of the reading of the raw EEA files of a pollutant:
+sequential pd.concat(map(pd.read_csv, files)) against the parallel reader
+on the thread pool and on the process pool.
+Run from the airpollpredictor folder: python -m benchmarks.bench_csv_files_reader
+"""
+
+import glob
+import os
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+from settings import settings
+from data_preprocessing import csv_files_reader, dtypes_schema
+from benchmarks import bench_utils
+
+FILES_COUNT = 5000
+ROWS_PER_FILE = 500
+WORKERS_COUNT = min(8, os.cpu_count() or 1)
+REPEAT_COUNT = 2
+
+
+def __write_source_files(source_path: str):
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2022-01-01 01:00', periods=ROWS_PER_FILE, freq='H', tz='Etc/GMT-1')
+    dates = index.strftime('%Y-%m-%d %H:%M:%S %z')
+    for file_num in range(FILES_COUNT):
+        station = f'STA-NL{file_num // 5:05d}'
+        pd.DataFrame({'Countrycode': 'NL', 'Namespace': 'NL.RIVM.AQ', 'AirQualityStation': station,
+                      'SamplingPoint': f'SPO-NL{file_num:05d}_06001_100',
+                      'SamplingProcess': 'SPP-NL_A_BETA', 'UnitOfMeasurement': 'µg/m3',
+                      'Concentration': rng.lognormal(2.5, 0.8, ROWS_PER_FILE).round(2),
+                      'AveragingTime': 'hour', 'DatetimeEnd': dates,
+                      'Validity': 1, 'Verification': 1}) \
+            .to_csv(os.path.join(source_path, f'NL_6001_{file_num}_2022_timeseries.csv'),
+                    index=False)
+
+
+def run_benchmark():
+    """
+    Runs the benchmark for the thread and process pools and prints the results
+    """
+    dtypes = dtypes_schema.get_pol_dtypes(settings.POL_USE_COLUMNS)
+    with tempfile.TemporaryDirectory() as source_path:
+        __write_source_files(source_path)
+        files = glob.glob(os.path.join(source_path, '*.csv'))
+
+        def read_sequential():
+            return pd.concat(map(lambda p: pd.read_csv(p, usecols=settings.POL_USE_COLUMNS,
+                                                       dtype=dtypes), files))
+
+        time_sequential = min(timeit.repeat(read_sequential, number=1, repeat=REPEAT_COUNT))
+        df_sequential = read_sequential().reset_index(drop=True)
+        for use_processes in [False, True]:
+            df_parallel = csv_files_reader.read_csv_files(
+                files, workers_count=WORKERS_COUNT, use_processes=use_processes,
+                usecols=settings.POL_USE_COLUMNS, dtype=dtypes)
+            pd.testing.assert_frame_equal(df_parallel.astype(df_sequential.dtypes),
+                                          df_sequential)
+            time_parallel = min(timeit.repeat(
+                lambda: csv_files_reader.read_csv_files(
+                    files, workers_count=WORKERS_COUNT, use_processes=use_processes,
+                    usecols=settings.POL_USE_COLUMNS, dtype=dtypes),
+                number=1, repeat=REPEAT_COUNT))
+            bench_utils.print_result(
+                f'{FILES_COUNT} files, {WORKERS_COUNT} {"processes" if use_processes else "threads"}',
+                time_sequential, time_parallel)
+
+
+if __name__ == '__main__':
+    run_benchmark()
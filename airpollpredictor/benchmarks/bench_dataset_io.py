@@ -0,0 +1,76 @@
+# pylint: disable=E0401
+
+"""
+Benchmark of the loading of the wide features dataset between the stages:
+CSV against Parquet and Feather, and reading of all the columns against
+reading of the required columns only.
+Run from the airpollpredictor folder: python -m benchmarks.bench_dataset_io
+"""
+
+import os
+import tempfile
+import timeit
+import yaml
+import pandas as pd
+from settings import settings
+from data_preprocessing import dataset_io
+from data_preprocessing.features_generations import ts_lag_features_generator as lag_gen
+from benchmarks import bench_utils
+
+YEARS_COUNT = 12
+REPEAT_COUNT = 3
+PROJECTED_COLUMNS_COUNT = 60
+PARAMS_FILE = 'dvc_pipelines/dataset_prep/params.yaml'
+
+
+def __get_enriched_dataset() -> pd.DataFrame:
+    with open(PARAMS_FILE, 'r', encoding='UTF-8') as file_stream:
+        enrich_params = yaml.safe_load(file_stream)['enrich-pollutants']
+    df_aqi = bench_utils.get_daily_aqi(YEARS_COUNT)
+    return lag_gen.generate_lagged_features(
+        df_aqi, target_cols=['AQI', 'AQI_O3', 'AQI_PM25'], id_cols=[],
+        date_col=settings.DATE_COLUMN_NAME, lags=enrich_params['lag_agg_aqi'],
+        windows=enrich_params['windows_filters_aqi'], preagg_methods=['mean'],
+        agg_methods=enrich_params['methods_agg_aqi'],
+        dynamic_filters=enrich_params['filters'] + ['NoFilter'],
+        ewm_params=enrich_params['ewm_filters_aqi'])
+
+
+def run_benchmark():
+    """
+    Runs the benchmark for every format and prints the results
+    """
+    df_dataset = __get_enriched_dataset()
+    with tempfile.TemporaryDirectory() as datasets_path:
+        csv_file_path = os.path.join(datasets_path, 'aqi_all.csv')
+        dataset_io.write_dataset(df_dataset, csv_file_path)
+        time_csv = min(timeit.repeat(lambda: dataset_io.read_dataset(csv_file_path),
+                                     number=1, repeat=REPEAT_COUNT))
+        for extension in ['.parquet', '.feather']:
+            file_path = os.path.join(datasets_path, f'aqi_all{extension}')
+            dataset_io.write_dataset(df_dataset, file_path)
+            pd.testing.assert_frame_equal(dataset_io.read_dataset(file_path), df_dataset,
+                                          check_freq=False)
+            time_format = min(timeit.repeat(lambda: dataset_io.read_dataset(file_path),
+                                            number=1, repeat=REPEAT_COUNT))
+            bench_utils.print_result(
+                f'{extension[1:]}: {df_dataset.shape[0]} rows, {df_dataset.shape[1]} columns, '
+                f'{os.path.getsize(file_path) / os.path.getsize(csv_file_path):.2f} of csv size',
+                time_csv, time_format)
+
+        columns = df_dataset.columns.tolist()[
+            ::df_dataset.shape[1] // PROJECTED_COLUMNS_COUNT][:PROJECTED_COLUMNS_COUNT]
+        for extension in ['.csv', '.parquet', '.feather']:
+            file_path = os.path.join(datasets_path, f'aqi_all{extension}')
+            time_all = min(timeit.repeat(lambda: dataset_io.read_dataset(file_path)[columns],
+                                         number=1, repeat=REPEAT_COUNT))
+            time_projected = min(timeit.repeat(
+                lambda: dataset_io.read_dataset(file_path, columns=columns),
+                number=1, repeat=REPEAT_COUNT))
+            bench_utils.print_result(f'{extension[1:]}: {len(columns)} of '
+                                     f'{df_dataset.shape[1]} columns',
+                                     time_all, time_projected)
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,62 @@
+# pylint: disable=E0401
+
+"""
+Benchmark of the preparation of the features for a trial and for a prediction:
+selection of the top features from the float64 dataframe and the cast to float32
+against the selection by integer positions from the memory-mapped float32 matrix.
+Run from the airpollpredictor folder: python -m benchmarks.bench_features_matrix
+"""
+
+import os
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+from model_tune_helpers import features_matrix_store
+from benchmarks import bench_utils
+
+ROWS_COUNT = 4000
+COLUMNS_COUNT = 3000
+TOP_FEATURES_COUNT = 500
+REPEAT_COUNT = 5
+
+
+def __get_features() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(ROWS_COUNT, COLUMNS_COUNT)),
+                        columns=[f'feature_{col}' for col in range(COLUMNS_COUNT)])
+
+
+def run_benchmark():
+    """
+    Runs the benchmark and prints the results
+    """
+    x_df = __get_features()
+    top_features = x_df.columns[::COLUMNS_COUNT // TOP_FEATURES_COUNT].tolist()
+    with tempfile.TemporaryDirectory() as matrix_path:
+        matrix_file = os.path.join(matrix_path, 'x_train.npy')
+        features_matrix_store.write_matrix(x_df, matrix_file)
+        x_matrix = features_matrix_store.read_matrix(matrix_file)
+        np.testing.assert_array_equal(x_matrix[top_features].values,
+                                      x_df[top_features].to_numpy(dtype=np.float32))
+
+        time_df = min(timeit.repeat(
+            lambda: x_df[top_features].astype(np.float32).to_numpy(),
+            number=1, repeat=REPEAT_COUNT))
+        time_matrix = min(timeit.repeat(lambda: x_matrix[top_features].values,
+                                        number=1, repeat=REPEAT_COUNT))
+        bench_utils.print_result(f'select {TOP_FEATURES_COUNT} of {COLUMNS_COUNT} columns',
+                                 time_df, time_matrix)
+
+        time_df = min(timeit.repeat(lambda: x_df.astype(np.float32).to_numpy(),
+                                    number=1, repeat=REPEAT_COUNT))
+        time_matrix = min(timeit.repeat(lambda: features_matrix_store.to_float32(x_matrix),
+                                        number=1, repeat=REPEAT_COUNT))
+        bench_utils.print_result(f'all {COLUMNS_COUNT} columns to float32', time_df, time_matrix)
+        print(f'memory: dataframe {x_df.memory_usage(index=False).sum() / 2 ** 20:.1f} MB, '
+              f'matrix file {os.path.getsize(matrix_file) / 2 ** 20:.1f} MB (memory-mapped)')
+        del x_matrix
+
+
+if __name__ == '__main__':
+    run_benchmark()
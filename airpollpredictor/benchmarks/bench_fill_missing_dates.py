@@ -0,0 +1,52 @@
+# pylint: disable=E0401, W0212
+
+"""
+Benchmark of filling missing dates for the pre-aggregation of the lag features:
+one reindex for all the groups against fill_missing_dates applied per group.
+Run from the airpollpredictor folder: python -m benchmarks.bench_fill_missing_dates
+"""
+
+import timeit
+import pandas as pd
+from settings import settings
+from data_preprocessing.features_generations import ts_lag_features_generator as lag_gen
+from benchmarks import bench_utils
+
+YEARS_COUNT = 12
+REPEAT_COUNT = 3
+TARGET_COLS = ['AQI_O3', 'AQI_PM25', settings.AQI_COLUMN_NAME]
+FILTERS = ['weekday', 'month', 'NoFilter']
+
+
+def __fill_per_group(data_preag: pd.DataFrame, group_col: list) -> pd.DataFrame:
+    return data_preag.groupby(group_col[:-1]).apply(
+        lag_gen.fill_missing_dates, date_col=settings.DATE_COLUMN_NAME) \
+        .drop(group_col[:-1], axis=1).reset_index()
+
+
+def __fill_all_groups(data_preag: pd.DataFrame, group_col: list) -> pd.DataFrame:
+    return lag_gen.fill_missing_dates_groups(data_preag, group_col, settings.DATE_COLUMN_NAME)
+
+
+def run_benchmark():
+    """
+    Runs the benchmark for every filter and prints the results
+    """
+    date_col = settings.DATE_COLUMN_NAME
+    data_adj = lag_gen.adjust_datetime_indices(bench_utils.get_daily_aqi(YEARS_COUNT), date_col)
+    for filter_col in FILTERS:
+        group_col = [filter_col, date_col]
+        data_preag = data_adj.groupby(group_col)[TARGET_COLS].agg('mean').reset_index()
+        pd.testing.assert_frame_equal(__fill_per_group(data_preag, group_col),
+                                      __fill_all_groups(data_preag, group_col))
+
+        time_per_group = min(timeit.repeat(lambda: __fill_per_group(data_preag, group_col),
+                                           number=1, repeat=REPEAT_COUNT))
+        time_all_groups = min(timeit.repeat(lambda: __fill_all_groups(data_preag, group_col),
+                                            number=1, repeat=REPEAT_COUNT))
+        bench_utils.print_result(f'{filter_col}: {data_preag.shape[0]} rows',
+                                 time_per_group, time_all_groups)
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,77 @@
+# pylint: disable=E0401, R0913, R0914, W0212
+
+"""
+Benchmark of the lag features generation with the enrich-pollutants params:
+rolling and ewm calculated once for all the lags against the calculation per lag.
+Run from the airpollpredictor folder: python -m benchmarks.bench_lag_features_generator
+"""
+
+import os
+import timeit
+import yaml
+import pandas as pd
+from settings import settings
+from data_preprocessing.features_generations import ts_lag_features_generator as lag_gen
+from benchmarks import bench_utils
+
+YEARS_COUNT = 4
+REPEAT_COUNT = 1
+TARGET_COLS = ['AQI_O3', 'AQI_PM25', settings.AQI_COLUMN_NAME]
+PARAMS_PATH = os.path.join('dvc_pipelines', 'dataset_prep', 'params.yaml')
+
+
+def __generate_per_lag(data: pd.DataFrame, lags: list, windows: dict, agg_methods: list,
+                       dynamic_filters: list, ewm_params: dict) -> list[pd.DataFrame]:
+    # pre-aggregation, rolling and ewm are recalculated for every lag
+    date_col = settings.DATE_COLUMN_NAME
+    data_adj = lag_gen.adjust_datetime_indices(data, date_col)
+    features = []
+    for filter_col in dynamic_filters:
+        group_col = [filter_col, date_col]
+        for lag in lags:
+            data_preag_filled = lag_gen.calc_preag_fill(data_adj, group_col, date_col,
+                                                        TARGET_COLS, 'mean')
+            for alpha in ewm_params.get(filter_col, []):
+                ewm_filled = lag_gen.calc_ewm(data_preag_filled, group_col, date_col, alpha)
+                features.append(lag_gen.shift(ewm_filled, group_col, date_col, lag))
+            for window in windows.get(filter_col, []):
+                for method in agg_methods:
+                    method_func, method_param = lag_gen.get_agg_function(method)
+                    rolling_filled = lag_gen.calc_rolling(data_preag_filled, group_col, date_col,
+                                                          method_func, method_param, window)
+                    features.append(lag_gen.shift(rolling_filled, group_col, date_col, lag))
+    return features
+
+
+def __generate_shared(data: pd.DataFrame, lags: list, windows: dict, agg_methods: list,
+                      dynamic_filters: list, ewm_params: dict) -> pd.DataFrame:
+    return lag_gen.generate_lagged_features(
+        data, target_cols=TARGET_COLS, id_cols=[], date_col=settings.DATE_COLUMN_NAME,
+        lags=lags, windows=windows, preagg_methods=['mean'], agg_methods=agg_methods,
+        dynamic_filters=dynamic_filters, ewm_params=ewm_params)
+
+
+def run_benchmark():
+    """
+    Runs the benchmark for the lags from the params and prints the results
+    """
+    with open(PARAMS_PATH, 'r', encoding='UTF-8') as file_stream:
+        params = yaml.safe_load(file_stream)['enrich-pollutants']
+    data = bench_utils.get_daily_aqi(YEARS_COUNT)
+    generation_args = {'windows': params['windows_filters_aqi'],
+                       'agg_methods': params['methods_agg_aqi'],
+                       'dynamic_filters': params['filters'] + ['NoFilter'],
+                       'ewm_params': params['ewm_filters_aqi']}
+    for lags in [params['lag_agg_aqi'][:1], params['lag_agg_aqi']]:
+        time_per_lag = min(timeit.repeat(
+            lambda: __generate_per_lag(data, lags, **generation_args),
+            number=1, repeat=REPEAT_COUNT))
+        time_shared = min(timeit.repeat(
+            lambda: __generate_shared(data, lags, **generation_args),
+            number=1, repeat=REPEAT_COUNT))
+        bench_utils.print_result(f'{data.shape[0]} days, {len(lags)} lags',
+                                 time_per_lag, time_shared)
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,57 @@
+# pylint: disable=E0401
+
+"""
+Helpers for the benchmarks: synthetic datasets and printing of the results
+"""
+
+import numpy as np
+import pandas as pd
+from settings import settings
+from data_preprocessing.features_generations import ts_date_features_generator as date_gen
+
+
+def get_hourly_concentrations(years_count: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates hourly concentrations of a pollutant (with gaps) like the cleaned EEA data
+    @param years_count: The number of years of hourly data
+    @param seed: Seed for the random generator
+    @return: Dataframe with DateIndex and Concentration column
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end='2022-12-31 23:00', periods=years_count * 365 * 24, freq='H',
+                          tz='Etc/GMT-1', name=settings.DATE_COLUMN_NAME)
+    concentrations = rng.lognormal(mean=2.5, sigma=0.8, size=index.shape[0])
+    concentrations[rng.random(index.shape[0]) < 0.02] = np.nan
+    return pd.DataFrame({settings.CONCENTRATION_COLUMN_NAME: concentrations}, index=index)
+
+
+def get_daily_aqi(years_count: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates daily AQI per pollutant (with gaps) with date features like the merged data
+    for pollutants enrichment
+    @param years_count: The number of years of daily data
+    @param seed: Seed for the random generator
+    @return: Dataframe with DateIndex, AQI columns, date features and NoFilter column
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(end='2022-12-31', periods=years_count * 365, freq='D',
+                          name=settings.DATE_COLUMN_NAME)
+    df_aqi = pd.DataFrame({'AQI_O3': rng.integers(5, 120, index.shape[0]).astype(float),
+                           'AQI_PM25': rng.integers(5, 160, index.shape[0]).astype(float)},
+                          index=index)
+    df_aqi.iloc[rng.random(index.shape[0]) < 0.03, 0] = np.nan
+    df_aqi[settings.AQI_COLUMN_NAME] = df_aqi[['AQI_O3', 'AQI_PM25']].max(axis=1)
+    df_aqi = date_gen.add_date_info(df_aqi)
+    df_aqi['NoFilter'] = 1
+    return df_aqi
+
+
+def print_result(title: str, time_before: float, time_after: float):
+    """
+    Prints the result of the benchmark
+    @param title: The title of the benchmark case
+    @param time_before: The time of the previous implementation in seconds
+    @param time_after: The time of the new implementation in seconds
+    """
+    print(f'{title:50} before: {time_before:9.4f}s  after: {time_after:9.4f}s  '
+          f'speedup: {time_before / time_after:8.1f}x')
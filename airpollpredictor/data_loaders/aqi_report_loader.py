@@ -2,15 +2,15 @@
 
 """
 Async loader of .csv files with concentrations of pollutants from fme.discomap.eea.europa.eu
-Supports logging and re-downloading
+Supports logging and re-downloading, the files are downloaded concurrently
 """
 
+import asyncio
 import datetime
 import os
 import pathlib
-import time
-import requests
-from . import logger
+from .async_downloader import AsyncDownloader
+from .download_manifest import DownloadManifest, MANIFEST_FILE_NAME
 
 URL_POLLUTANT_LIST = "https://fme.discomap.eea.europa.eu/fmedatastreaming/AirQualityDownload/" \
                      "AQData_Extract.fmw?CountryCode=$country$&CityName=$city$&Pollutant=" \
@@ -18,6 +18,7 @@ URL_POLLUTANT_LIST = "https://fme.discomap.eea.europa.eu/fmedatastreaming/AirQua
                      "$station$&Samplingpoint=&Source=All&Output=TEXT&UpdateDate=&TimeCoverage=Year"
 RELOAD_COUNTER = 2
 RELOAD_REPEATING_COUNTER = 5
+MAX_REQUESTS_PER_HOST = 4
 POLLUTANTS_CODES_ALL = [7, 6001, 5, 10, 1, 8]
 
 
@@ -48,6 +49,7 @@ async def pollutants_txt_lists_load(save_dir_path: str,
     if pollutant_codes is None:
         pollutant_codes = POLLUTANTS_CODES_ALL
 
+    urls_files = []
     for pol_id in pollutant_codes:
         url = URL_POLLUTANT_LIST.replace("$pollutant_id$", str(pol_id))
         url = url.replace("$country$", ('' if country is None else country))
@@ -59,34 +61,34 @@ async def pollutants_txt_lists_load(save_dir_path: str,
         url = url.replace("$city$", ('' if city is None else city))
         url = url.replace("$year_from$", str(year_from))
         url = url.replace("$year_to$", str(year_to))
-        await __txt_file_load_and_save(f'{str(pol_id)}.txt', save_path, url)
-    return save_path
-
+        urls_files.append((url, os.path.join(save_path, f'{str(pol_id)}.txt')))
 
-async def __txt_file_load_and_save(file_name: str, save_path: str, url: str) -> None:
-    print(f'Request TXT {url} sent')
-    response = requests.get(url)
-    print(f'Response TXT status_code: {response.status_code}')
-    txt_file = str(response.content, encoding='UTF8')
-    if response.status_code != 200:
-        logger.log_error(save_path=save_path, text=txt_file, url=url)
-        raise ConnectionError()
-    file_path = os.path.join(save_path, f'{file_name}')
-    with open(file_path, 'w', encoding='UTF8') as file_stream:
-        file_stream.write(txt_file)
-    print(f'File {file_name} saved')
+    # a failed list raises ConnectionError, the error is logged to log.txt in save_path
+    async with AsyncDownloader(RELOAD_COUNTER, RELOAD_REPEATING_COUNTER,
+                               max_requests_per_host=MAX_REQUESTS_PER_HOST) as downloader:
+        await asyncio.gather(*[downloader.download_file(url, file_path)
+                               for url, file_path in urls_files])
+    return save_path
 
 
-async def csv_list_load(save_path: str, url_path: str) -> None:
+async def csv_list_load(save_path: str, url_path: str,
+                        max_requests_per_host: int = MAX_REQUESTS_PER_HOST,
+                        revalidate: bool = True) -> None:
     """
-    Downloads .csv files by urls saved in .txt
+    Downloads .csv files by urls saved in .txt.
+    The downloaded files are recorded to the manifest in save_path:
+    the unchanged files are not downloaded again and an interrupted run continues
+    from the files and the parts of the files it has not downloaded
     @param url_path: Path to .txt  with urls for .csv files
     @param save_path: Path to save .csv files
+    @param max_requests_per_host: The max number of the concurrent requests to a host
+    @param revalidate: Flag if the unchanged files are revalidated by the conditional requests,
+    otherwise they are skipped without requests (i.e. the files of the previous years)
     @return:
     """
     txt_lists = list(pathlib.Path(url_path).glob('*.txt'))
     print(f'Loaded {len(txt_lists)} txt lists')
-    repeated_reloads_for_dif_files = 0
+    urls_files = []
     for txt_list in txt_lists:
         with open(txt_list, "r", encoding='utf-8-sig') as file_stream:
             txt_content = file_stream.read()
@@ -94,49 +96,17 @@ async def csv_list_load(save_path: str, url_path: str) -> None:
         print(f'Loaded {len(csv_list)} csv urls for file {txt_list}')
         pollutant_id = os.path.splitext(os.path.basename(txt_list))[0]
         sub_path = __create_sub_dir(save_path=save_path, sub_dir=pollutant_id)
-        for csv_url in csv_list:
-            file_name = csv_url.split('/')[-1:][0]
-            for i in range(RELOAD_COUNTER + 1):
-                if i == RELOAD_COUNTER:
-                    repeated_reloads_for_dif_files += 1
-                    logger.log_error(save_path=sub_path,
-                              text=f"Reload attempt {repeated_reloads_for_dif_files}",
-                              url=csv_url)
-                    break
-                try:
-                    csv_file = await __load_csv_file(csv_url)
-                    await __save_csv_file_from_str(
-                        save_path=sub_path, file_name=file_name, csv_file=csv_file)
-                    break
-                except Exception:
-                    print("SHORT SLEEP")
-                    time.sleep(30)
-
-            if repeated_reloads_for_dif_files == RELOAD_REPEATING_COUNTER:
-                time.sleep(60 * 60)
-                print("LONG LONG SLEEP")
-                repeated_reloads_for_dif_files = 0
-
-
-async def __load_csv_file(url: str) -> str:
-    print(f'Request CSV {url} sent')
-    response = requests.get(url, timeout=120)
-    csv_file = str(response.content, encoding='UTF8')
-    print(f'Response CSV status_code: {response.status_code}')
-    return csv_file
-
-
-async def __save_csv_file_from_str(save_path: str, file_name: str, csv_file: str) -> None:
-    """
-    Save string with csv file data to .csv file
-    @param save_path: Path to the directory
-    @param file_name: The required .csv file name
-    @param csv_file: Dataframe for saving
-    """
-    file_path = os.path.join(save_path, f'{file_name}')
-    with open(file_path, 'w', encoding='UTF8') as file_stream:
-        file_stream.write(csv_file)
-    print(f'File {file_name} saved')
+        urls_files.extend((csv_url, os.path.join(sub_path, csv_url.split('/')[-1:][0]))
+                          for csv_url in csv_list)
+
+    manifest = DownloadManifest(os.path.join(save_path, MANIFEST_FILE_NAME))
+    async with AsyncDownloader(RELOAD_COUNTER, RELOAD_REPEATING_COUNTER,
+                               max_requests_per_host=max_requests_per_host,
+                               manifest=manifest, revalidate=revalidate) as downloader:
+        downloaded = await downloader.download_files(urls_files)
+        for host, rate_limiter in downloader.rate_limiters.items():
+            rate_limiter.print_metrics(host)
+    print(f'Downloaded {sum(downloaded)} of {len(urls_files)} csv files')
 
 
 def __create_sub_dir(save_path: str, sub_dir: str) -> str:
@@ -0,0 +1,284 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Concurrent asyncio downloader with the pooled HTTP client.
+The connections are kept alive in one aiohttp session, the requests to a host are throttled
+by the adaptive rate limiter, the responses are streamed to the files.
+The retries keep the counters of aqi_report_loader: every file is requested
+up to reload_counter times, the pauses after 429, 5xx and timeouts are set by the limiter,
+after reload_repeating_counter files failed all the attempts all the downloads pause for a long time.
+With the manifest the unchanged files are revalidated by the conditional requests
+(or skipped without requests) and the interrupted downloads are continued by the range requests.
+The responses that are not saved as is (i.e. the lists of links or the files parsed on the fly)
+are passed to the async handler by fetch_urls with the same throttling and retries
+"""
+
+import asyncio
+import hashlib
+from http import HTTPStatus
+import os
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+import aiohttp
+from . import logger
+from .download_manifest import DownloadManifest, update_file_hash
+from .rate_limiter import AdaptiveRateLimiter, get_retry_after, is_throttling_status
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AsyncDownloader:
+    """
+    Concurrent downloader of the files. Use as the async context manager:
+    async with AsyncDownloader() as downloader: await downloader.download_files(...)
+    """
+
+    def __init__(self, reload_counter: int, reload_repeating_counter: int,
+                 max_requests_per_host: int = 4, timeout: float = 120,
+                 short_pause: float = 30, long_pause: float = 60 * 60,
+                 manifest: DownloadManifest = None, revalidate: bool = True,
+                 rate_limiter: AdaptiveRateLimiter = None):
+        """
+        @param reload_counter: The number of the attempts to download a file
+        @param reload_repeating_counter: The number of the failed files
+        after which all the downloads pause for long_pause
+        @param max_requests_per_host: The max number of the concurrent requests to a host
+        @param timeout: The total timeout of a request in seconds
+        @param short_pause: The first pause of the limiter after 429, 5xx or timeout in seconds,
+        the pause is doubled on every failure in a row
+        @param long_pause: The pause after reload_repeating_counter failed files in seconds
+        @param manifest: The manifest of the downloaded files (optional)
+        @param revalidate: Flag if the unchanged files of the manifest are revalidated
+        by the conditional requests, otherwise they are skipped without requests
+        @param rate_limiter: The limiter shared by all the hosts (i.e. with other loaders),
+        by default every host has own limiter with max_requests_per_host concurrent requests
+        """
+        self.__reload_counter = reload_counter
+        self.__reload_repeating_counter = reload_repeating_counter
+        self.__max_requests_per_host = max_requests_per_host
+        self.__timeout = timeout
+        self.__short_pause = short_pause
+        self.__long_pause = long_pause
+        self.__manifest = manifest
+        self.__revalidate = revalidate
+        self.__rate_limiter = rate_limiter
+        self.__hosts_limiters = {}
+        self.__repeated_reloads = 0
+        self.__resumed = None
+        self.__session = None
+
+    async def __aenter__(self) -> 'AsyncDownloader':
+        self.__resumed = asyncio.Event()
+        self.__resumed.set()
+        self.__session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.__max_requests_per_host),
+            timeout=aiohttp.ClientTimeout(total=self.__timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.__session.close()
+        if self.__manifest is not None:
+            self.__manifest.compact()
+
+    @property
+    def repeated_reloads(self) -> int:
+        """
+        The number of the files failed all the attempts since the last long pause
+        """
+        return self.__repeated_reloads
+
+    @property
+    def rate_limiters(self) -> dict[str, AdaptiveRateLimiter]:
+        """
+        The rate limiters of the requested hosts
+        """
+        return dict(self.__hosts_limiters)
+
+    async def download_file(self, url: str, file_path: str) -> int:
+        """
+        Downloads the file streaming the response to the disk, without retries
+        @param url: The url of the file
+        @param file_path: The path to save the file, the file is replaced
+        only if the response is downloaded completely
+        @return: The status code of the response, 304 if the file of the manifest is unchanged
+        @raise ConnectionError: If the status code of the response is not 200, 206 or 304
+        """
+        headers = {}
+        if self.__manifest is not None:
+            if self.__manifest.is_file_unchanged(url, file_path):
+                if not self.__revalidate:
+                    print(f'File {os.path.basename(file_path)} is unchanged, skipped')
+                    return HTTPStatus.NOT_MODIFIED
+                headers = self.__manifest.get_conditional_headers(url)
+            else:
+                headers = self.__manifest.get_resume_headers(url, f'{file_path}.part')
+
+        rate_limiter = self.__get_rate_limiter(url)
+        await self.__resumed.wait()
+        async with rate_limiter:
+            print(f'Request {url} sent')
+            try:
+                async with self.__session.get(url, headers=headers) as response:
+                    print(f'Response status_code: {response.status}')
+                    if is_throttling_status(response.status):
+                        rate_limiter.record_failure(get_retry_after(response.headers))
+                    status = await self.__save_response(response, url, file_path, bool(headers))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                rate_limiter.record_failure()
+                raise
+        rate_limiter.record_success(0 if status == HTTPStatus.NOT_MODIFIED
+                                    else os.path.getsize(file_path))
+        return status
+
+    async def __save_response(self, response: aiohttp.ClientResponse, url: str,
+                              file_path: str, is_conditional: bool) -> int:
+        tmp_file_path = f'{file_path}.part'
+        if response.status == HTTPStatus.NOT_MODIFIED and is_conditional:
+            print(f'File {os.path.basename(file_path)} is not modified')
+            return response.status
+        await self.__check_status(response, url, os.path.dirname(file_path),
+                                  (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT))
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        file_hash = hashlib.sha256()
+        if response.status == HTTPStatus.PARTIAL_CONTENT:
+            print(f'Download of {os.path.basename(file_path)} is resumed')
+            entry = self.__manifest.get_entry(url)
+            etag = etag or entry['etag']
+            last_modified = last_modified or entry['last_modified']
+            update_file_hash(file_hash, tmp_file_path)
+            file_mode = 'ab'
+        else:
+            file_mode = 'wb'
+            if self.__manifest is not None:
+                # the validators to resume the download if it is interrupted
+                self.__manifest.add_entry(url, file_path, etag=etag,
+                                          last_modified=last_modified, complete=False)
+        with open(tmp_file_path, file_mode) as file_stream:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                file_stream.write(chunk)
+                file_hash.update(chunk)
+        os.replace(tmp_file_path, file_path)
+        if self.__manifest is not None:
+            self.__manifest.add_entry(url, file_path, etag=etag, last_modified=last_modified,
+                                      size=os.path.getsize(file_path),
+                                      sha256=file_hash.hexdigest())
+        print(f'File {os.path.basename(file_path)} saved')
+        return response.status
+
+    async def fetch_url(self, url: str,
+                        handler: Callable[[str, aiohttp.ClientResponse], Awaitable],
+                        log_path: str) -> None:
+        """
+        Requests the url and passes the response to the handler, without retries
+        @param url: The url to request
+        @param handler: The async function handler(url, response) consuming the body
+        of the response as it arrives, i.e. collecting the text or parsing the lines
+        @param log_path: The folder of log.txt for the failed requests
+        @raise ConnectionError: If the status code of the response is not 200
+        """
+        rate_limiter = self.__get_rate_limiter(url)
+        await self.__resumed.wait()
+        async with rate_limiter:
+            print(f'Request {url} sent')
+            try:
+                async with self.__session.get(url) as response:
+                    print(f'Response status_code: {response.status}')
+                    if is_throttling_status(response.status):
+                        rate_limiter.record_failure(get_retry_after(response.headers))
+                    await self.__check_status(response, url, log_path, (HTTPStatus.OK,))
+                    await handler(url, response)
+                    bytes_count = response.content.total_bytes
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                rate_limiter.record_failure()
+                raise
+        rate_limiter.record_success(bytes_count)
+
+    async def fetch_url_with_retries(self, url: str,
+                                     handler: Callable[[str, aiohttp.ClientResponse], Awaitable],
+                                     log_path: str) -> bool:
+        """
+        Requests the url with the retries, the failed urls are logged to log.txt.
+        The errors of the handler (i.e. ValueError of the parsing) are retried as well
+        @param url: The url to request
+        @param handler: The async function handler(url, response) consuming the body of the response
+        @param log_path: The folder of log.txt for the failed urls
+        @return: True if the response is handled
+        """
+        return await self.__call_with_retries(url, log_path,
+                                              lambda: self.fetch_url(url, handler, log_path))
+
+    async def fetch_urls(self, urls: list[str],
+                         handler: Callable[[str, aiohttp.ClientResponse], Awaitable],
+                         log_path: str) -> list[bool]:
+        """
+        Requests the urls concurrently, the responses are passed to the handler
+        @param urls: The urls to request
+        @param handler: The async function handler(url, response) consuming the body of the response
+        @param log_path: The folder of log.txt for the failed urls
+        @return: The list of the flags if the responses are handled
+        """
+        return list(await asyncio.gather(*[self.fetch_url_with_retries(url, handler, log_path)
+                                           for url in urls]))
+
+    async def download_file_with_retries(self, url: str, file_path: str) -> bool:
+        """
+        Downloads the file with the retries, the failed files are logged to log.txt
+        in the folder of the file
+        @param url: The url of the file
+        @param file_path: The path to save the file
+        @return: True if the file is downloaded
+        """
+        return await self.__call_with_retries(url, os.path.dirname(file_path),
+                                              lambda: self.download_file(url, file_path))
+
+    async def __call_with_retries(self, url: str, log_path: str,
+                                  request: Callable[[], Awaitable]) -> bool:
+        for attempt in range(self.__reload_counter):
+            if attempt > 0:
+                self.__get_rate_limiter(url).record_retry()
+            try:
+                await request()
+                return True
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError, OSError,
+                    ValueError) as error:
+                print(f'Attempt {attempt + 1} failed: {error}')
+
+        self.__repeated_reloads += 1
+        logger.log_error(save_path=log_path,
+                         text=f"Reload attempt {self.__repeated_reloads}", url=url)
+        if self.__repeated_reloads >= self.__reload_repeating_counter and self.__resumed.is_set():
+            # all the downloads wait until the end of the pause
+            self.__resumed.clear()
+            print("LONG LONG SLEEP")
+            await asyncio.sleep(self.__long_pause)
+            self.__repeated_reloads = 0
+            self.__resumed.set()
+        return False
+
+    async def download_files(self, urls_files: list[tuple[str, str]]) -> list[bool]:
+        """
+        Downloads the files concurrently
+        @param urls_files: The list of the urls and the paths to save the files
+        @return: The list of the flags if the files are downloaded
+        """
+        return list(await asyncio.gather(*[self.download_file_with_retries(url, file_path)
+                                           for url, file_path in urls_files]))
+
+    @staticmethod
+    async def __check_status(response: aiohttp.ClientResponse, url: str, log_path: str,
+                             expected_statuses: tuple) -> None:
+        if response.status not in expected_statuses:
+            text = await response.text(errors='replace')
+            logger.log_error(save_path=log_path, text=text, url=url, status_code=response.status)
+            raise ConnectionError(f'Status code {response.status} for {url}')
+
+    def __get_rate_limiter(self, url: str) -> AdaptiveRateLimiter:
+        host = urlsplit(url).netloc
+        if host not in self.__hosts_limiters:
+            self.__hosts_limiters[host] = self.__rate_limiter if self.__rate_limiter is not None \
+                else AdaptiveRateLimiter(initial_concurrency=min(2, self.__max_requests_per_host),
+                                         max_concurrency=self.__max_requests_per_host,
+                                         backoff=self.__short_pause,
+                                         max_backoff=max(self.__short_pause, 60))
+        return self.__hosts_limiters[host]
@@ -0,0 +1,159 @@
+# pylint: disable=E0401, R0913, W0703
+
+"""
+Manifest of the downloaded files stored next to the downloads.
+For every url the manifest keeps the file path, size, ETag, Last-Modified and sha256
+of the content, so the unchanged files are revalidated by the conditional requests
+or skipped, and the interrupted downloads are resumed.
+The records are appended to a JSON lines file as soon as a file is downloaded,
+an interrupted run loses nothing; the last record of an url wins
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE_NAME = 'manifest.jsonl'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_hash(file_path: str) -> str:
+    """
+    Calculates sha256 of the file content
+    @param file_path: The path to the file
+    @return: The hex digest
+    """
+    return update_file_hash(hashlib.sha256(), file_path).hexdigest()
+
+
+def update_file_hash(file_hash, file_path: str):
+    """
+    Updates the hash by the file content, i.e. by the already downloaded part of the file
+    @param file_hash: The hash object of hashlib
+    @param file_path: The path to the file
+    @return: The updated hash object
+    """
+    with open(file_path, 'rb') as file_stream:
+        for block in iter(lambda: file_stream.read(HASH_BLOCK_SIZE), b''):
+            file_hash.update(block)
+    return file_hash
+
+
+class DownloadManifest:
+    """
+    Manifest of the downloaded files, the paths of the files are stored
+    relative to the folder of the manifest
+    """
+
+    def __init__(self, manifest_path: str):
+        """
+        @param manifest_path: The path to the manifest file, the file is created if not exists
+        """
+        self.__manifest_path = manifest_path
+        self.__entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf8') as file_stream:
+                for line in file_stream:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line of the interrupted run can be incomplete
+                        continue
+                    self.__entries[entry['url']] = entry
+
+    @property
+    def manifest_path(self) -> str:
+        """
+        The path to the manifest file
+        """
+        return self.__manifest_path
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get_entry(self, url: str) -> dict:
+        """
+        Returns the record of the url
+        @param url: The url of the file
+        @return: The record or None if the url has not been downloaded
+        """
+        return self.__entries.get(url)
+
+    def is_file_unchanged(self, url: str, file_path: str) -> bool:
+        """
+        Checks if the file is completely downloaded and not changed on the disk
+        @param url: The url of the file
+        @param file_path: The path to the file
+        @return: True if the size and the hash of the file match the record
+        """
+        entry = self.__entries.get(url)
+        if entry is None or not entry['complete'] or not os.path.exists(file_path) \
+                or entry['file'] != self.__get_relative_path(file_path):
+            return False
+        return os.path.getsize(file_path) == entry['size'] \
+            and get_file_hash(file_path) == entry['sha256']
+
+    def get_conditional_headers(self, url: str) -> dict:
+        """
+        Returns the headers of the conditional request for the recorded url
+        @param url: The url of the file
+        @return: If-None-Match and If-Modified-Since headers, empty if nothing is recorded
+        """
+        entry = self.__entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry['etag'] is not None:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified'] is not None:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get_resume_headers(self, url: str, part_file_path: str) -> dict:
+        """
+        Returns the headers of the range request continuing the interrupted download
+        @param url: The url of the file
+        @param part_file_path: The path to the partially downloaded file
+        @return: Range and If-Range headers, empty if the download can't be resumed
+        """
+        entry = self.__entries.get(url)
+        if entry is None or entry['complete'] or not os.path.exists(part_file_path):
+            return {}
+        validator = entry['etag'] if entry['etag'] is not None else entry['last_modified']
+        part_size = os.path.getsize(part_file_path)
+        if validator is None or part_size == 0:
+            return {}
+        return {'Range': f'bytes={part_size}-', 'If-Range': validator}
+
+    def add_entry(self, url: str, file_path: str, etag: str = None, last_modified: str = None,
+                  size: int = None, sha256: str = None, complete: bool = True) -> dict:
+        """
+        Records the file and appends the record to the manifest file
+        @param url: The url of the file
+        @param file_path: The path to the file
+        @param etag: ETag header of the response
+        @param last_modified: Last-Modified header of the response
+        @param size: The size of the file in bytes
+        @param sha256: sha256 of the file content
+        @param complete: False for the started download, the validators are used to resume it
+        @return: The record
+        """
+        entry = {'url': url, 'file': self.__get_relative_path(file_path), 'size': size,
+                 'etag': etag, 'last_modified': last_modified, 'sha256': sha256,
+                 'complete': complete}
+        self.__entries[url] = entry
+        with open(self.__manifest_path, 'a', encoding='utf8') as file_stream:
+            file_stream.write(json.dumps(entry) + '\n')
+        return entry
+
+    def compact(self) -> None:
+        """
+        Rewrites the manifest file with one record per url
+        """
+        tmp_manifest_path = f'{self.__manifest_path}.tmp'
+        with open(tmp_manifest_path, 'w', encoding='utf8') as file_stream:
+            for entry in self.__entries.values():
+                file_stream.write(json.dumps(entry) + '\n')
+        os.replace(tmp_manifest_path, self.__manifest_path)
+
+    def __get_relative_path(self, file_path: str) -> str:
+        return os.path.relpath(file_path, os.path.dirname(os.path.abspath(self.__manifest_path)))
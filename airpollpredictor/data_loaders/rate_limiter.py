@@ -0,0 +1,202 @@
+# pylint: disable=E0401, R0913, R0902
+
+"""
+Adaptive rate limiter of the requests to an endpoint (EEA, Meteostat).
+The number of the concurrent requests is controlled by AIMD: the limit grows by
+increase_step after every `limit` healthy responses and is multiplied by decrease_factor
+on 429, 5xx and timeouts. After such response no new requests are sent during
+the cooldown: Retry-After of the response or the exponential backoff.
+The optional token bucket bounds the requests per second.
+The limiter collects the metrics: requests/s, retries, bytes/s
+"""
+
+import asyncio
+import time
+from http import HTTPStatus
+
+
+def is_throttling_status(status: int) -> bool:
+    """
+    Checks if the status code of the response means the server is overloaded
+    @param status: The status code of the response
+    @return: True for 429 and 5xx
+    """
+    return status == HTTPStatus.TOO_MANY_REQUESTS or status >= HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def get_retry_after(headers) -> float:
+    """
+    Returns Retry-After of the response
+    @param headers: The headers of the response
+    @return: The delay in seconds or None if the header is missing or is not a number of seconds
+    """
+    try:
+        return max(0.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD limiter of the concurrent requests with the optional token bucket.
+    A request is sent inside the context: async with limiter: ...,
+    the result of the request is reported by record_success or record_failure
+    """
+
+    def __init__(self, initial_concurrency: int = 2, min_concurrency: int = 1,
+                 max_concurrency: int = 16, increase_step: float = 1,
+                 decrease_factor: float = 0.5, requests_per_second: float = None,
+                 burst: int = None, backoff: float = 1, max_backoff: float = 60):
+        """
+        @param initial_concurrency: The initial limit of the concurrent requests
+        @param min_concurrency: The min limit of the concurrent requests
+        @param max_concurrency: The max limit of the concurrent requests
+        @param increase_step: The additive increase of the limit
+        @param decrease_factor: The multiplicative decrease of the limit
+        @param requests_per_second: The rate of the token bucket, not limited if None
+        @param burst: The capacity of the token bucket, max_concurrency by default
+        @param backoff: The first cooldown in seconds after the failed request
+        @param max_backoff: The max cooldown in seconds, it is doubled on every failure in a row
+        """
+        self.__min_concurrency = max(1, min_concurrency)
+        self.__max_concurrency = max(self.__min_concurrency, max_concurrency)
+        self.__limit = float(min(max(initial_concurrency, self.__min_concurrency),
+                                 self.__max_concurrency))
+        self.__increase_step = increase_step
+        self.__decrease_factor = decrease_factor
+        self.__requests_per_second = requests_per_second
+        self.__burst = burst if burst is not None else self.__max_concurrency
+        self.__tokens = float(self.__burst)
+        self.__tokens_time = time.monotonic()
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__failures_in_row = 0
+        self.__successes = 0
+        self.__resume_time = 0.0
+        self.__active = 0
+        self.__slot_changed = None
+        self.__start_time = None
+        self.__requests_count = 0
+        self.__retries_count = 0
+        self.__failures_count = 0
+        self.__bytes_count = 0
+
+    @property
+    def concurrency(self) -> int:
+        """
+        The current limit of the concurrent requests
+        """
+        return int(self.__limit)
+
+    @property
+    def active_requests(self) -> int:
+        """
+        The number of the requests in progress
+        """
+        return self.__active
+
+    async def __aenter__(self) -> 'AdaptiveRateLimiter':
+        if self.__slot_changed is None:
+            self.__slot_changed = asyncio.Event()
+        while self.__active >= int(self.__limit):
+            self.__slot_changed.clear()
+            await self.__slot_changed.wait()
+        self.__active += 1
+        try:
+            await self.__wait_cooldown()
+            await self.__take_token()
+        except BaseException:
+            self.__release()
+            raise
+        if self.__start_time is None:
+            self.__start_time = time.monotonic()
+        self.__requests_count += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__release()
+
+    def record_success(self, bytes_count: int = 0) -> None:
+        """
+        Reports the healthy response, the limit is increased after `limit` healthy responses
+        @param bytes_count: The size of the downloaded content
+        """
+        self.__bytes_count += bytes_count
+        self.__failures_in_row = 0
+        self.__successes += 1
+        if self.__successes >= int(self.__limit):
+            self.__successes = 0
+            self.__limit = min(self.__max_concurrency, self.__limit + self.__increase_step)
+            self.__notify()
+
+    def record_failure(self, retry_after: float = None) -> None:
+        """
+        Reports the response 429 or 5xx or the timeout:
+        the limit is decreased and the new requests wait for the cooldown
+        @param retry_after: Retry-After of the response in seconds, the backoff if None
+        """
+        self.__failures_count += 1
+        self.__successes = 0
+        self.__limit = max(self.__min_concurrency, self.__limit * self.__decrease_factor)
+        cooldown = retry_after if retry_after is not None else \
+            min(self.__max_backoff, self.__backoff * 2 ** self.__failures_in_row)
+        self.__failures_in_row += 1
+        self.__resume_time = max(self.__resume_time, time.monotonic() + cooldown)
+
+    def record_retry(self) -> None:
+        """
+        Reports the repeated request of the failed url
+        """
+        self.__retries_count += 1
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the metrics of the requests since the first request
+        @return: Dictionary with requests, requests_per_second, retries, failures,
+        bytes, bytes_per_second and the current concurrency
+        """
+        elapsed = 0.0 if self.__start_time is None else time.monotonic() - self.__start_time
+        return {'requests': self.__requests_count,
+                'requests_per_second': self.__requests_count / elapsed if elapsed > 0 else 0.0,
+                'retries': self.__retries_count,
+                'failures': self.__failures_count,
+                'bytes': self.__bytes_count,
+                'bytes_per_second': self.__bytes_count / elapsed if elapsed > 0 else 0.0,
+                'concurrency': self.concurrency}
+
+    def print_metrics(self, name: str) -> None:
+        """
+        Prints the metrics of the requests
+        @param name: The name of the endpoint
+        """
+        metrics = self.get_metrics()
+        print(f'{name}: {metrics["requests"]} requests, '
+              f'{metrics["requests_per_second"]:.2f} requests/s, '
+              f'{metrics["retries"]} retries, {metrics["failures"]} failures, '
+              f'{metrics["bytes_per_second"] / 1024:.1f} KB/s, '
+              f'concurrency {metrics["concurrency"]}')
+
+    def __release(self):
+        self.__active -= 1
+        self.__notify()
+
+    def __notify(self):
+        if self.__slot_changed is not None:
+            self.__slot_changed.set()
+
+    async def __wait_cooldown(self):
+        while (delay := self.__resume_time - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    async def __take_token(self):
+        if self.__requests_per_second is None:
+            return
+        while True:
+            now = time.monotonic()
+            self.__tokens = min(self.__burst, self.__tokens
+                                + (now - self.__tokens_time) * self.__requests_per_second)
+            self.__tokens_time = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return
+            await asyncio.sleep((1 - self.__tokens) / self.__requests_per_second)
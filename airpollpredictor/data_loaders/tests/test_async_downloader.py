@@ -0,0 +1,275 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the asyncio downloader against the local stub HTTP server
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ..async_downloader import AsyncDownloader
+from ..download_manifest import DownloadManifest, get_file_hash
+
+
+class AsyncDownloaderTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the asyncio downloader against the local stub HTTP server
+    """
+    FILE_CONTENT = b'Countrycode,Concentration\n' + b'NL,12.5\n' * 50_000
+    FILE_ETAG = '"v1"'
+
+    async def asyncSetUp(self):
+        self.__active_requests = 0
+        self.__max_active_requests = 0
+        self.__failures_left = {}
+        self.__requests_count = 0
+        self.__requests_headers = []
+        app = web.Application()
+        app.router.add_get('/files/{name}', self.__handle_file)
+        app.router.add_get('/versioned/{name}', self.__handle_versioned_file)
+        self.__server = TestServer(app)
+        await self.__server.start_server()
+        self.__data_dir = tempfile.TemporaryDirectory()
+
+    async def asyncTearDown(self):
+        await self.__server.close()
+        self.__data_dir.cleanup()
+
+    async def __handle_file(self, request: web.Request) -> web.StreamResponse:
+        self.__requests_count += 1
+        self.__active_requests += 1
+        self.__max_active_requests = max(self.__max_active_requests, self.__active_requests)
+        try:
+            await asyncio.sleep(0.02)
+            name = request.match_info['name']
+            if name.startswith('missing'):
+                return web.Response(status=404, text='Not found')
+            if self.__failures_left.get(name, 0) > 0:
+                self.__failures_left[name] -= 1
+                return web.Response(status=503, text='Busy')
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for start in range(0, len(self.FILE_CONTENT), 100_000):
+                await response.write(self.FILE_CONTENT[start:start + 100_000])
+            await response.write_eof()
+            return response
+        finally:
+            self.__active_requests -= 1
+
+    async def __handle_versioned_file(self, request: web.Request) -> web.Response:
+        self.__requests_count += 1
+        self.__requests_headers.append(dict(request.headers))
+        headers = {'ETag': self.FILE_ETAG}
+        if request.headers.get('If-None-Match') == self.FILE_ETAG:
+            return web.Response(status=304, headers=headers)
+        if 'Range' in request.headers and request.headers.get('If-Range') == self.FILE_ETAG:
+            start = int(request.headers['Range'][len('bytes='):-1])
+            headers['Content-Range'] = \
+                f'bytes {start}-{len(self.FILE_CONTENT) - 1}/{len(self.FILE_CONTENT)}'
+            return web.Response(status=206, body=self.FILE_CONTENT[start:], headers=headers)
+        return web.Response(body=self.FILE_CONTENT, headers=headers)
+
+    def __url(self, name: str, route: str = 'files') -> str:
+        return str(self.__server.make_url(f'/{route}/{name}'))
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__data_dir.name, name)
+
+    @staticmethod
+    def __create_downloader(max_requests_per_host: int = 4, manifest: DownloadManifest = None,
+                            revalidate: bool = True) -> AsyncDownloader:
+        return AsyncDownloader(reload_counter=2, reload_repeating_counter=2,
+                               max_requests_per_host=max_requests_per_host,
+                               timeout=10, short_pause=0.01, long_pause=0.05,
+                               manifest=manifest, revalidate=revalidate)
+
+    async def test_download_files_streams_to_disk(self):
+        names = [f'{num}.csv' for num in range(5)]
+        async with self.__create_downloader() as downloader:
+            downloaded = await downloader.download_files(
+                [(self.__url(name), self.__path(name)) for name in names])
+
+        self.assertEqual(downloaded, [True] * len(names))
+        for name in names:
+            with open(self.__path(name), 'rb') as file_stream:
+                self.assertEqual(file_stream.read(), self.FILE_CONTENT)
+        self.assertEqual(sorted(os.listdir(self.__data_dir.name)), names)
+
+    async def test_concurrency_is_bounded_per_host(self):
+        names = [f'{num}.csv' for num in range(12)]
+        async with self.__create_downloader(max_requests_per_host=3) as downloader:
+            downloaded = await downloader.download_files(
+                [(self.__url(name), self.__path(name)) for name in names])
+
+        self.assertTrue(all(downloaded))
+        self.assertGreater(self.__max_active_requests, 1)
+        self.assertLessEqual(self.__max_active_requests, 3)
+
+    async def test_retry_after_failed_attempt(self):
+        self.__failures_left['busy.csv'] = 1
+        async with self.__create_downloader() as downloader:
+            downloaded = await downloader.download_file_with_retries(
+                self.__url('busy.csv'), self.__path('busy.csv'))
+            metrics = list(downloader.rate_limiters.values())[0].get_metrics()
+
+        self.assertTrue(downloaded)
+        self.assertEqual(self.__requests_count, 2)
+        self.assertEqual((metrics['requests'], metrics['retries'], metrics['failures']), (2, 1, 1))
+        self.assertEqual(metrics['bytes'], len(self.FILE_CONTENT))
+        with open(self.__path('busy.csv'), 'rb') as file_stream:
+            self.assertEqual(file_stream.read(), self.FILE_CONTENT)
+
+    async def test_failed_file_is_logged(self):
+        async with self.__create_downloader() as downloader:
+            with self.assertRaises(ConnectionError):
+                await downloader.download_file(self.__url('missing.csv'),
+                                               self.__path('missing.csv'))
+            downloaded = await downloader.download_file_with_retries(
+                self.__url('missing.csv'), self.__path('missing.csv'))
+            repeated_reloads = downloader.repeated_reloads
+
+        self.assertFalse(downloaded)
+        self.assertEqual(repeated_reloads, 1)
+        # one request without retries and reload_counter attempts
+        self.assertEqual(self.__requests_count, 3)
+        self.assertFalse(os.path.exists(self.__path('missing.csv')))
+        with open(self.__path('log.txt'), encoding='utf8') as file_stream:
+            log = file_stream.read()
+        self.assertIn('status_code=404', log)
+        self.assertIn('Not found', log)
+        self.assertIn('Reload attempt 1', log)
+
+    async def test_long_pause_resets_repeated_reloads(self):
+        names = [f'missing{num}.csv' for num in range(2)]
+        async with self.__create_downloader() as downloader:
+            downloaded = await downloader.download_files(
+                [(self.__url(name), self.__path(name)) for name in names])
+            repeated_reloads = downloader.repeated_reloads
+
+        self.assertEqual(downloaded, [False, False])
+        self.assertEqual(repeated_reloads, 0)
+
+    async def test_fetch_urls_passes_responses_to_handler(self):
+        self.__failures_left['busy.csv'] = 1
+        texts = {}
+
+        async def save_text(url, response):
+            texts[url] = await response.text()
+
+        urls = [self.__url(name) for name in ['1.csv', 'busy.csv', 'missing.csv']]
+        async with self.__create_downloader() as downloader:
+            fetched = await downloader.fetch_urls(urls, save_text, self.__data_dir.name)
+            metrics = list(downloader.rate_limiters.values())[0].get_metrics()
+
+        self.assertEqual(fetched, [True, True, False])
+        self.assertEqual(texts, {url: self.FILE_CONTENT.decode() for url in urls[:2]})
+        self.assertEqual(metrics['bytes'], 2 * len(self.FILE_CONTENT))
+        self.assertEqual(os.listdir(self.__data_dir.name), ['log.txt'])
+
+    async def test_handler_errors_are_retried(self):
+        attempts = []
+
+        async def parse_lines(url, response):
+            attempts.append(url)
+            async for _ in response.content:
+                if len(attempts) == 1:
+                    raise ValueError('Broken line')
+
+        async with self.__create_downloader() as downloader:
+            fetched = await downloader.fetch_url_with_retries(self.__url('1.csv'), parse_lines,
+                                                              self.__data_dir.name)
+
+        self.assertTrue(fetched)
+        self.assertEqual(len(attempts), 2)
+        self.assertFalse(os.path.exists(self.__path('log.txt')))
+
+    async def test_manifest_records_downloaded_files(self):
+        manifest_path = self.__path('manifest.jsonl')
+        url = self.__url('1.csv', route='versioned')
+        async with self.__create_downloader(manifest=DownloadManifest(manifest_path)) \
+                as downloader:
+            status = await downloader.download_file(url, self.__path('1.csv'))
+
+        entry = DownloadManifest(manifest_path).get_entry(url)
+        self.assertEqual(status, 200)
+        self.assertEqual(entry['file'], '1.csv')
+        self.assertEqual(entry['size'], len(self.FILE_CONTENT))
+        self.assertEqual(entry['etag'], self.FILE_ETAG)
+        self.assertEqual(entry['sha256'], get_file_hash(self.__path('1.csv')))
+        self.assertTrue(entry['complete'])
+        # the manifest is compacted to one record per url
+        with open(manifest_path, encoding='utf8') as file_stream:
+            self.assertEqual(len(file_stream.readlines()), 1)
+
+    async def test_unchanged_file_is_revalidated(self):
+        manifest_path = self.__path('manifest.jsonl')
+        url = self.__url('1.csv', route='versioned')
+        for _ in range(2):
+            async with self.__create_downloader(manifest=DownloadManifest(manifest_path)) \
+                    as downloader:
+                status = await downloader.download_file(url, self.__path('1.csv'))
+
+        self.assertEqual(status, 304)
+        self.assertEqual(self.__requests_count, 2)
+        self.assertEqual(self.__requests_headers[1]['If-None-Match'], self.FILE_ETAG)
+        with open(self.__path('1.csv'), 'rb') as file_stream:
+            self.assertEqual(file_stream.read(), self.FILE_CONTENT)
+
+    async def test_unchanged_file_is_skipped_without_revalidation(self):
+        manifest_path = self.__path('manifest.jsonl')
+        url = self.__url('1.csv', route='versioned')
+        for _ in range(2):
+            async with self.__create_downloader(manifest=DownloadManifest(manifest_path),
+                                                revalidate=False) as downloader:
+                status = await downloader.download_file(url, self.__path('1.csv'))
+
+        self.assertEqual(status, 304)
+        self.assertEqual(self.__requests_count, 1)
+
+    async def test_changed_file_is_downloaded_again(self):
+        manifest_path = self.__path('manifest.jsonl')
+        url = self.__url('1.csv', route='versioned')
+        async with self.__create_downloader(manifest=DownloadManifest(manifest_path)) \
+                as downloader:
+            await downloader.download_file(url, self.__path('1.csv'))
+        with open(self.__path('1.csv'), 'ab') as file_stream:
+            file_stream.write(b'corrupted')
+        async with self.__create_downloader(manifest=DownloadManifest(manifest_path)) \
+                as downloader:
+            status = await downloader.download_file(url, self.__path('1.csv'))
+
+        self.assertEqual(status, 200)
+        self.assertNotIn('If-None-Match', self.__requests_headers[1])
+        with open(self.__path('1.csv'), 'rb') as file_stream:
+            self.assertEqual(file_stream.read(), self.FILE_CONTENT)
+
+    async def test_interrupted_download_is_resumed(self):
+        manifest_path = self.__path('manifest.jsonl')
+        url = self.__url('1.csv', route='versioned')
+        part_size = len(self.FILE_CONTENT) // 3
+        # the state of the run interrupted after part_size bytes
+        DownloadManifest(manifest_path).add_entry(url, self.__path('1.csv'),
+                                                  etag=self.FILE_ETAG, complete=False)
+        with open(self.__path('1.csv.part'), 'wb') as file_stream:
+            file_stream.write(self.FILE_CONTENT[:part_size])
+
+        async with self.__create_downloader(manifest=DownloadManifest(manifest_path)) \
+                as downloader:
+            status = await downloader.download_file(url, self.__path('1.csv'))
+
+        entry = DownloadManifest(manifest_path).get_entry(url)
+        self.assertEqual(status, 206)
+        self.assertEqual(self.__requests_headers[0]['Range'], f'bytes={part_size}-')
+        with open(self.__path('1.csv'), 'rb') as file_stream:
+            self.assertEqual(file_stream.read(), self.FILE_CONTENT)
+        self.assertFalse(os.path.exists(self.__path('1.csv.part')))
+        self.assertTrue(entry['complete'])
+        self.assertEqual(entry['sha256'], get_file_hash(self.__path('1.csv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
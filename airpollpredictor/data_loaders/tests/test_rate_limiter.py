@@ -0,0 +1,90 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the adaptive rate limiter
+"""
+import asyncio
+import time
+import unittest
+
+from ..rate_limiter import AdaptiveRateLimiter, get_retry_after, is_throttling_status
+
+
+class AdaptiveRateLimiterTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the adaptive rate limiter
+    """
+    async def __send_requests(self, rate_limiter: AdaptiveRateLimiter, requests_count: int,
+                              bytes_count: int = 100) -> int:
+        max_active = 0
+
+        async def request():
+            nonlocal max_active
+            async with rate_limiter:
+                max_active = max(max_active, rate_limiter.active_requests)
+                await asyncio.sleep(0.01)
+            rate_limiter.record_success(bytes_count)
+
+        await asyncio.gather(*[request() for _ in range(requests_count)])
+        return max_active
+
+    async def test_concurrency_increases_on_healthy_responses(self):
+        rate_limiter = AdaptiveRateLimiter(initial_concurrency=1, max_concurrency=4)
+        max_active = await self.__send_requests(rate_limiter, 20)
+
+        self.assertEqual(rate_limiter.concurrency, 4)
+        self.assertEqual(max_active, 4)
+        self.assertEqual(rate_limiter.active_requests, 0)
+
+    async def test_concurrency_decreases_on_failures(self):
+        rate_limiter = AdaptiveRateLimiter(initial_concurrency=8, max_concurrency=8,
+                                           backoff=0.01)
+        rate_limiter.record_failure()
+        self.assertEqual(rate_limiter.concurrency, 4)
+        rate_limiter.record_failure()
+        rate_limiter.record_failure()
+        rate_limiter.record_failure()
+        self.assertEqual(rate_limiter.concurrency, 1)
+
+    async def test_requests_wait_for_cooldown(self):
+        rate_limiter = AdaptiveRateLimiter(backoff=0.01)
+        rate_limiter.record_failure(retry_after=0.2)
+        start_time = time.monotonic()
+        async with rate_limiter:
+            pass
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.19)
+
+    async def test_token_bucket_bounds_requests_per_second(self):
+        rate_limiter = AdaptiveRateLimiter(initial_concurrency=4, max_concurrency=4,
+                                           requests_per_second=50, burst=1)
+        start_time = time.monotonic()
+        await self.__send_requests(rate_limiter, 11)
+        # the first request takes the token of the burst
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.19)
+
+    async def test_metrics(self):
+        rate_limiter = AdaptiveRateLimiter()
+        await self.__send_requests(rate_limiter, 5, bytes_count=1000)
+        rate_limiter.record_retry()
+        rate_limiter.record_failure(retry_after=0)
+        metrics = rate_limiter.get_metrics()
+
+        self.assertEqual(metrics['requests'], 5)
+        self.assertEqual(metrics['retries'], 1)
+        self.assertEqual(metrics['failures'], 1)
+        self.assertEqual(metrics['bytes'], 5000)
+        self.assertGreater(metrics['requests_per_second'], 0)
+        self.assertGreater(metrics['bytes_per_second'], 0)
+
+    def test_response_helpers(self):
+        self.assertTrue(is_throttling_status(429))
+        self.assertTrue(is_throttling_status(503))
+        self.assertFalse(is_throttling_status(404))
+        self.assertFalse(is_throttling_status(200))
+        self.assertEqual(get_retry_after({'Retry-After': '120'}), 120)
+        self.assertIsNone(get_retry_after({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}))
+        self.assertIsNone(get_retry_after({}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the chunked loader of the weather against the local stub HTTP server
+"""
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pandas as pd
+
+from .. import weather_loader
+
+
+class WeatherLoaderTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the chunked loader of the weather against the local stub HTTP server
+    """
+    async def asyncSetUp(self):
+        self.__requests = []
+        app = web.Application()
+        app.router.add_get('/stations/daily', self.__handle_daily)
+        self.__server = TestServer(app)
+        await self.__server.start_server()
+        self.__data_dir = tempfile.TemporaryDirectory()
+        self.__url_patch = mock.patch.object(weather_loader, 'URL_DAILY_HIST',
+                                             str(self.__server.make_url('/stations/daily')))
+        self.__url_patch.start()
+
+    async def asyncTearDown(self):
+        self.__url_patch.stop()
+        await self.__server.close()
+        self.__data_dir.cleanup()
+
+    async def __handle_daily(self, request: web.Request) -> web.Response:
+        station, start, end = (request.query[key] for key in ['station', 'start', 'end'])
+        self.__requests.append((station, start, end))
+        if station == 'broken':
+            return web.json_response({'message': 'Internal error'})
+        dates = pd.date_range(start, end, freq='D')
+        return web.json_response({'data': [{'date': date.strftime('%Y-%m-%d'),
+                                            'tavg': float(date.dayofyear), 'station': station}
+                                           for date in dates]})
+
+    def __path(self, *names) -> str:
+        return os.path.join(self.__data_dir.name, *names)
+
+    def test_get_date_chunks(self):
+        self.assertEqual(weather_loader.get_date_chunks(datetime.date(2015, 3, 1),
+                                                        datetime.date(2017, 6, 30)),
+                         [(datetime.date(2015, 3, 1), datetime.date(2015, 12, 31)),
+                          (datetime.date(2016, 1, 1), datetime.date(2016, 12, 31)),
+                          (datetime.date(2017, 1, 1), datetime.date(2017, 6, 30))])
+        self.assertEqual(weather_loader.get_date_chunks(datetime.date(2015, 3, 1),
+                                                        datetime.date(2017, 6, 30), 2),
+                         [(datetime.date(2015, 3, 1), datetime.date(2016, 12, 31)),
+                          (datetime.date(2017, 1, 1), datetime.date(2017, 6, 30))])
+
+    async def test_stations_are_loaded_by_chunks(self):
+        stations = ['06344', '06348']
+        files = await weather_loader.load_weather_history_from_stations(
+            self.__data_dir.name, stations, datetime.date(2015, 3, 1), datetime.date(2017, 6, 30))
+
+        self.assertEqual(len(self.__requests), 6)
+        self.assertEqual(sorted(self.__requests)[:3],
+                         [('06344', '2015-03-01', '2015-12-31'),
+                          ('06344', '2016-01-01', '2016-12-31'),
+                          ('06344', '2017-01-01', '2017-06-30')])
+        self.assertEqual(files, {station: self.__path(f'{station}.parquet')
+                                 for station in stations})
+        for station in stations:
+            df_weather = pd.read_parquet(files[station])
+            expected_dates = pd.date_range('2015-03-01', '2017-06-30', freq='D', name='date')
+            pd.testing.assert_index_equal(df_weather.index, expected_dates)
+            self.assertTrue((df_weather['station'] == station).all())
+
+    async def test_cached_chunks_are_not_requested(self):
+        cache_path = self.__path('cache')
+        for _ in range(2):
+            await weather_loader.load_weather_history_from_station(
+                self.__path('weather.csv'), '06344', datetime.date(2016, 1, 1),
+                datetime.date(2017, 12, 31), chunk_years=1, cache_path=cache_path)
+
+        self.assertEqual(len(self.__requests), 2)
+        self.assertTrue(os.path.exists(self.__path('cache', '06344', '2016-01-01_2016-12-31.json')))
+        df_weather = pd.read_csv(self.__path('weather.csv'), index_col='date', parse_dates=True)
+        self.assertEqual(df_weather.shape[0], 366 + 365)
+
+    async def test_chunk_of_today_is_not_cached(self):
+        cache_path = self.__path('cache')
+        today = datetime.date.today()
+        for _ in range(2):
+            await weather_loader.load_weather_history_from_station(
+                self.__path('weather.parquet'), '06344', datetime.date(today.year - 1, 1, 1),
+                today, cache_path=cache_path)
+
+        self.assertEqual(len(self.__requests), 3)
+        self.assertEqual(len(os.listdir(self.__path('cache', '06344'))), 1)
+
+    async def test_response_without_data_is_not_cached(self):
+        cache_path = self.__path('cache')
+        for _ in range(2):
+            with self.assertRaises(AttributeError):
+                await weather_loader.load_weather_history_from_station(
+                    self.__path('weather.parquet'), 'broken', datetime.date(2016, 1, 1),
+                    datetime.date(2016, 12, 31), cache_path=cache_path)
+
+        self.assertEqual(len(self.__requests), 2)
+        self.assertFalse(os.path.exists(self.__path('cache', 'broken')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,56 +1,195 @@
 # pylint: disable=E0401, R0913, R0914, W0703
 
 """
-Async loader of historical data about weather in .json format via meteostat API
+Async loader of historical data about weather in .json format via meteostat API.
+The period is split into the chunks of years, the chunks of all the stations
+are requested concurrently and the responses of the complete chunks are cached on the disk
 """
 
+import asyncio
 import datetime
+import json
 import os
 
-import requests
+import aiohttp
 import pandas as pd
+from data_preprocessing import dataset_io
 from .logger import log_error
+from .rate_limiter import AdaptiveRateLimiter, get_retry_after, is_throttling_status
 
 URL_DAILY_HIST = "https://meteostat.p.rapidapi.com/stations/daily"
 RAPID_API_KEY = '636601abdamsheec399674665a87p1878bfjsnf16635dcc483'
 RAPID_API_HOST = 'meteostat.p.rapidapi.com'
+RELOAD_COUNTER = 3
+CHUNK_YEARS = 1
+MAX_CONCURRENCY = 4
 
 
-async def __get(station: str, date_from, date_end):
-    return requests.get(
-        URL_DAILY_HIST,
-        params={
-            'station': station,
-            'start': date_from,
-            'end': date_end
-        },
-        headers={
-            'X-RapidAPI-Key': RAPID_API_KEY,
-            'X-RapidAPI-Host': RAPID_API_HOST
-        }
-    )
+def get_date_chunks(date_from: datetime.date, date_end: datetime.date,
+                    chunk_years: int = CHUNK_YEARS) -> list[tuple[datetime.date, datetime.date]]:
+    """
+    Splits the period into the chunks of the calendar years
+    @param date_from: The first date of the period
+    @param date_end: The last date of the period
+    @param chunk_years: The number of the years in a chunk
+    @return: The list of the first and the last dates of the chunks
+    """
+    chunks = []
+    chunk_from = date_from
+    while chunk_from <= date_end:
+        chunk_end = min(date_end, datetime.date(chunk_from.year + chunk_years - 1, 12, 31))
+        chunks.append((chunk_from, chunk_end))
+        chunk_from = datetime.date(chunk_end.year + 1, 1, 1)
+    return chunks
+
+
+async def __get(session: aiohttp.ClientSession, rate_limiter: AdaptiveRateLimiter,
+                station: str, date_from, date_end, log_path: str) -> dict:
+    async with rate_limiter:
+        try:
+            async with session.get(
+                    URL_DAILY_HIST,
+                    params={
+                        'station': station,
+                        'start': str(date_from),
+                        'end': str(date_end)
+                    },
+                    headers={
+                        'X-RapidAPI-Key': RAPID_API_KEY,
+                        'X-RapidAPI-Host': RAPID_API_HOST
+                    }) as response:
+                if is_throttling_status(response.status):
+                    rate_limiter.record_failure(get_retry_after(response.headers))
+                if response.status != 200:
+                    print(response.url)
+                    log_error(log_path, text=await response.text(errors='replace'),
+                              error_reason=response.reason, station=station,
+                              date_from=date_from, date_end=date_end, url=response.url)
+                    raise ConnectionError()
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            rate_limiter.record_failure()
+            raise
+    rate_limiter.record_success(len(content))
+    return json.loads(content)
 
 
 async def load_weather_history_from_station(save_file_path: str,
                                             station: str,
                                             date_from: datetime.date,
-                                            date_end=datetime.datetime.now().date()):
+                                            date_end=datetime.datetime.now().date(),
+                                            rate_limiter: AdaptiveRateLimiter = None,
+                                            chunk_years: int = CHUNK_YEARS,
+                                            max_concurrency: int = MAX_CONCURRENCY,
+                                            cache_path: str = None):
     """
     Downloads historical weather data via Meteostat API
-    @param save_file_path: Path to file to save weather data
+    @param save_file_path: Path to file to save weather data, the format is chosen
+    by the extension (.parquet, .feather, .csv)
     @param station: The code of the station
     @param date_from: The first date of the historical period
     @param date_end: The last date of the historical period
+    @param rate_limiter: The limiter of the requests to Meteostat shared by the loads,
+    max_concurrency concurrent requests by default
+    @param chunk_years: The number of the years requested by one request
+    @param max_concurrency: The max number of the concurrent requests
+    @param cache_path: The folder of the cached responses (optional)
+    """
+    stations_weather = await __load_stations_history(
+        [station], date_from, date_end, os.path.dirname(save_file_path), rate_limiter,
+        chunk_years, max_concurrency, cache_path)
+    dataset_io.write_dataset(stations_weather[station], save_file_path)
+
+
+async def load_weather_history_from_stations(save_path: str,
+                                             stations: list[str],
+                                             date_from: datetime.date,
+                                             date_end=datetime.datetime.now().date(),
+                                             rate_limiter: AdaptiveRateLimiter = None,
+                                             chunk_years: int = CHUNK_YEARS,
+                                             max_concurrency: int = MAX_CONCURRENCY,
+                                             cache_path: str = None,
+                                             file_format: str = '.parquet') -> dict[str, str]:
+    """
+    Downloads historical weather data of the stations via Meteostat API,
+    the chunks of the period of all the stations are requested concurrently
+    @param save_path: The folder to save the file <station><file_format> per station
+    @param stations: The codes of the stations
+    @param date_from: The first date of the historical period
+    @param date_end: The last date of the historical period
+    @param rate_limiter: The limiter of the requests to Meteostat shared by the loads,
+    max_concurrency concurrent requests by default
+    @param chunk_years: The number of the years requested by one request
+    @param max_concurrency: The max number of the concurrent requests
+    @param cache_path: The folder of the cached responses (optional)
+    @param file_format: The extension of the files (.parquet, .feather, .csv)
+    @return: Dictionary station -> path to the file
     """
-    response = await __get(station, date_from, date_end)
-    if response.status_code != 200:
-        print(response.url)
-        log_error(os.path.dirname(save_file_path), text=response.text, error_reason=response.reason,
-                  station=station, date_from=date_from, date_end=date_end, url=response.url)
-        raise ConnectionError()
-
-    df_result = __convert_json_to_pandas(response.json())
-    df_result.to_csv(save_file_path)
+    stations_weather = await __load_stations_history(
+        stations, date_from, date_end, save_path, rate_limiter, chunk_years, max_concurrency,
+        cache_path)
+    files = {}
+    for station, df_weather in stations_weather.items():
+        files[station] = os.path.join(save_path, f'{station}{file_format}')
+        dataset_io.write_dataset(df_weather, files[station])
+    return files
+
+
+async def __load_stations_history(stations: list[str], date_from, date_end, log_path: str,
+                                  rate_limiter: AdaptiveRateLimiter, chunk_years: int,
+                                  max_concurrency: int, cache_path: str) -> dict:
+    if rate_limiter is None:
+        rate_limiter = AdaptiveRateLimiter(initial_concurrency=min(2, max_concurrency),
+                                           max_concurrency=max_concurrency)
+    chunks = get_date_chunks(date_from, date_end, chunk_years)
+    async with aiohttp.ClientSession() as session:
+        responses = await asyncio.gather(*[
+            __get_chunk(session, rate_limiter, station, chunk_from, chunk_end, log_path,
+                        cache_path)
+            for station in stations for chunk_from, chunk_end in chunks])
+    rate_limiter.print_metrics(RAPID_API_HOST)
+    return {station: __merge_chunks(responses[num * len(chunks):(num + 1) * len(chunks)])
+            for num, station in enumerate(stations)}
+
+
+async def __get_chunk(session: aiohttp.ClientSession, rate_limiter: AdaptiveRateLimiter,
+                      station: str, chunk_from: datetime.date, chunk_end: datetime.date,
+                      log_path: str, cache_path: str) -> dict:
+    cache_file_path = None
+    # only the chunks of the past are complete, the chunk with today is not cached
+    if cache_path is not None and chunk_end < datetime.date.today():
+        cache_file_path = os.path.join(cache_path, station, f'{chunk_from}_{chunk_end}.json')
+        if os.path.exists(cache_file_path):
+            with open(cache_file_path, 'r', encoding='utf8') as file_stream:
+                return json.load(file_stream)
+
+    for attempt in range(RELOAD_COUNTER):
+        if attempt > 0:
+            rate_limiter.record_retry()
+        try:
+            response_json = await __get(session, rate_limiter, station, chunk_from, chunk_end,
+                                        log_path)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError):
+            if attempt == RELOAD_COUNTER - 1:
+                raise
+
+    # the payload without data (i.e. an error message) is not cached
+    if cache_file_path is not None and 'data' in response_json:
+        os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+        with open(f'{cache_file_path}.tmp', 'w', encoding='utf8') as file_stream:
+            json.dump(response_json, file_stream)
+        os.replace(f'{cache_file_path}.tmp', cache_file_path)
+    return response_json
+
+
+def __merge_chunks(responses: list[dict]) -> pd.DataFrame:
+    df_chunks = [__convert_json_to_pandas(response_json) for response_json in responses
+                 if 'data' not in response_json or len(response_json['data']) > 0]
+    if not df_chunks:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='date'))
+    df_weather = pd.concat(df_chunks).sort_index()
+    return df_weather[~df_weather.index.duplicated(keep='last')]
 
 
 def __convert_json_to_pandas(response_json) -> pd.DataFrame:
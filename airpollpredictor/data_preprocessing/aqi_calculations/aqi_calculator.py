@@ -2,6 +2,7 @@
 """Module for calculating AQI by concentrations of pollutant."""
 
 
+import numpy as np
 import pandas as pd
 from . import aqi_dto as aqd
 from . import pollutant_dto as pld
@@ -43,8 +44,8 @@ _POLLUTANTS_INFO = \
                          hourly_intervals=[1, 24],
                          decimals_count=3,
                          breakpoints_by_intervals={
-                             1: [None, None, 185, 304, 604, 804, 1004],
-                             24: [None, None, 185, 304, 604, 804, 1004]},
+                             1: [35, 75, 185, 304, None, None, None],
+                             24: [None, None, None, None, 604, 804, 1004]},
                          measure='ppb'),
      8: pld.PollutantDto(pollutant_id=8,
                          pollutant_code="NO2",
@@ -67,6 +68,13 @@ _AQI_INFO = [aqd.AqiDto(category="Good", aqi_from=0, aqi_to=50, color=(0, 228, 0
 
 _AQI_INFO_SHORT = [50, 100, 150, 200, 300, 400, 500]
 
+# molar volume (l) at 25°C and 1 atm and molecular weights (g/mol) of the gases
+_MOLAR_VOLUME = 24.45
+_MOLECULAR_WEIGHTS = {7: 48, 10: 28.01, 1: 64.06, 8: 46.01}
+_MEASURES = ['µg/m3', 'mg/m3', 'ppm', 'ppb']
+_AQI_HIGH_NP = np.array(_AQI_INFO_SHORT, dtype=np.float64)
+_AQI_LOW_NP = np.array([0] + _AQI_INFO_SHORT[:-1], dtype=np.float64)
+
 
 def calc_aqi_for_day_pd(pollutant_id: int, df_concentrations: pd.DataFrame, measure: str):
     """
@@ -80,11 +88,105 @@ def calc_aqi_for_day_pd(pollutant_id: int, df_concentrations: pd.DataFrame, meas
 
     pollutant_info = _POLLUTANTS_INFO[pollutant_id]
     df_aqi = __recalculate_concentration_pd(pollutant_info, df_concentrations, measure)
-    df_aqi['AQI'] = df_aqi.apply(lambda x: __get_aqi_for_day(pollutant_info, x.values), axis=1)
+    df_aqi['AQI'] = calc_aqi_for_days_np(
+        pollutant_id, [df_aqi[col].to_numpy(dtype=np.float64) for col in df_aqi.columns])
     df_aqi.drop(columns=df_aqi.columns.values[:-1], inplace=True)
     return df_aqi
 
 
+def get_aqi_state_pd(pollutant_id: int, df_concentrations: pd.DataFrame,
+                     df_aqi: pd.DataFrame) -> dict:
+    """
+    Returns the state for the incremental AQI calculation: the last calculated day
+    and the hourly concentrations before it required by the rolling intervals (i.e. 8H for O3)
+    :param pollutant_id: Pollutant id in AQI data
+    :param df_concentrations: DataFrame with concentration by hours used for df_aqi.
+    Must have DateIndex and Concentration column
+    :param df_aqi: DataFrame with AQI by days calculated by calc_aqi_for_day_pd
+    :return: Dictionary with the state, can be saved to json.
+    The initial state (all the days are calculated) if df_aqi has no days
+    """
+    if df_aqi.shape[0] == 0:
+        return {'last_day': None, 'tail': []}
+    pollutant_info = _POLLUTANTS_INFO[pollutant_id]
+    last_day = df_aqi.index[-1]
+    tail_size = __get_rolling_tail_size(pollutant_info)
+    concentrations = df_concentrations.loc[df_concentrations.index < last_day, 'Concentration']
+    tail = concentrations.iloc[concentrations.shape[0] - tail_size:] if tail_size > 0 \
+        else concentrations.iloc[:0]
+    return {'last_day': last_day.isoformat(),
+            'tail': [[date.isoformat(), float(value)] for date, value in tail.items()]}
+
+
+def calc_aqi_for_new_days_pd(pollutant_id: int, df_concentrations: pd.DataFrame, measure: str,
+                             aqi_state: dict) -> tuple[pd.DataFrame, dict]:
+    """
+    Calculates AQI for 1 pollutant per day only for the days from the last calculated day
+    (it is recalculated, as it can be incomplete). Gives the same values as calc_aqi_for_day_pd
+    for all the hourly data
+    :param measure: units of measurement
+    :param pollutant_id: Pollutant id in AQI data
+    :param df_concentrations: DataFrame with concentration by hours (can have only new hours).
+    Must have DateIndex and Concentration column
+    :param aqi_state: The state from get_aqi_state_pd
+    :return: DataFrame with AQI by days from the last calculated day and the new state
+    """
+    if aqi_state['last_day'] is None:
+        df_aqi = calc_aqi_for_day_pd(pollutant_id, df_concentrations, measure)
+        return df_aqi, get_aqi_state_pd(pollutant_id, df_concentrations, df_aqi)
+    last_day = pd.Timestamp(aqi_state['last_day'])
+    df_new = df_concentrations.loc[df_concentrations.index >= last_day, ['Concentration']]
+    df_tail = df_new.iloc[:0]
+    if aqi_state['tail']:
+        tail_index = pd.DatetimeIndex([date for date, _ in aqi_state['tail']],
+                                      name=df_new.index.name)
+        if df_new.index.tz is not None:
+            tail_index = tail_index.tz_convert(df_new.index.tz)
+        df_tail = pd.DataFrame({'Concentration': [value for _, value in aqi_state['tail']]},
+                               index=tail_index)
+    df_hours = pd.concat([df_tail, df_new])
+    df_aqi = calc_aqi_for_day_pd(pollutant_id, df_hours, measure)
+    df_aqi = df_aqi[df_aqi.index >= last_day]
+    if df_aqi.shape[0] == 0:
+        return df_aqi, aqi_state
+    return df_aqi, get_aqi_state_pd(pollutant_id, df_hours, df_aqi)
+
+
+def calc_aqi_for_days_np(pollutant_id: int, concentrations: list[np.ndarray],
+                         fill_value=0) -> np.ndarray:
+    """
+    Calculates AQI for 1 pollutant for many days at once.
+    Gives the same values as the calculation per day, but without python loops per value
+    :param pollutant_id: Pollutant id in AQI data
+    :param concentrations: Arrays with daily concentrations (already converted
+    to the pollutant units of measurement), one array per hourly interval
+    in the order of the pollutant hourly intervals
+    :param fill_value: AQI for the concentrations out of the breakpoints or Nan.
+    With np.nan the result is float array
+    :return: Array with AQI by days
+    """
+    pollutant_info = _POLLUTANTS_INFO[pollutant_id]
+    concentrations = [np.asarray(x, dtype=np.float64) for x in concentrations]
+    tables = _BREAKPOINTS_NP[pollutant_id]
+    if pollutant_info.pollutant_code == "O3":
+        aqi = np.fmax(
+            __fill_aqi_np(__calc_aqi_by_table_np(tables[0], concentrations[:1]), fill_value),
+            __fill_aqi_np(__calc_aqi_by_table_np(tables[1], concentrations[1:2]), fill_value))
+    else:
+        aqi = __fill_aqi_np(__calc_aqi_by_table_np(tables[0], concentrations), fill_value)
+    return aqi if np.isnan(fill_value) else aqi.astype(np.int64)
+
+
+def get_pollutant_info(pollutant_id: int) -> pld.PollutantDto:
+    """
+    Returns the information for AQI calculation of the pollutant
+    (hourly intervals, breakpoints, units of measurement)
+    :param pollutant_id: Pollutant id in AQI data
+    :return: Pollutant information
+    """
+    return _POLLUTANTS_INFO[pollutant_id]
+
+
 def calculate_aqi_for_day_target(pollutant_id: int, target: [], measure: str):
     """
     Calculates AQI for 1 pollutant per day
@@ -95,42 +197,70 @@ def calculate_aqi_for_day_target(pollutant_id: int, target: [], measure: str):
     """
 
     pollutant_info = _POLLUTANTS_INFO[pollutant_id]
-    targ_conv_mes = [__convert_measure(concentration=x, measure_source=measure,
+    targ_conv_mes = convert_measure_np(concentrations=target, measure_source=measure,
                                        measure_target=pollutant_info.measure,
-                                       pollutant_id=pollutant_info.pollutant_id) for x in target]
+                                       pollutant_id=pollutant_info.pollutant_id)
 
-    target_res = [__get_aqi_for_day(pollutant_info, [x]) for x in targ_conv_mes]
-    return target_res
+    target_res = calc_aqi_for_days_np(pollutant_id, [targ_conv_mes])
+    return target_res.tolist()
 
 
 def __recalculate_concentration_pd(pollutant_info: pld.PollutantDto,
                                    df_concentrations: pd.DataFrame, measure: str):
-    df_result_concentrations = pd.DataFrame(
-        index=df_concentrations.groupby(pd.Grouper(freq="24H")).count().index)
+    # days are grouped once for all the intervals and the aggregations
+    # are written into the preallocated daily frame (24H - mean, 1H - max,
+    # other intervals - max of the rolling mean)
+    df_hourly = pd.DataFrame({'Concentration': df_concentrations['Concentration']})
     for i in pollutant_info.hourly_intervals:
+        if i not in (1, 24):
+            df_hourly[f'Concentration_{i}H'] = __rolling_mean_np(
+                df_hourly['Concentration'].to_numpy(dtype=np.float64), i)
+    daily_groups = df_hourly.groupby(pd.Grouper(freq="24H"))
+
+    daily_values = None
+    for col_num, i in enumerate(pollutant_info.hourly_intervals):
         if i == 24:
-            df_result_concentrations = df_result_concentrations.merge(
-                df_concentrations['Concentration'].groupby(
-                    pd.Grouper(freq="24H")).mean(), left_index=True, right_index=True)
+            daily_aggregated = daily_groups['Concentration'].mean()
         elif i == 1:
-            df_result_concentrations = df_result_concentrations.merge(
-                df_concentrations['Concentration'].groupby(
-                    pd.Grouper(freq="24H")).max(), left_index=True, right_index=True)
+            daily_aggregated = daily_groups['Concentration'].max()
         else:
-            df_result_concentrations = df_result_concentrations.merge(
-                (df_concentrations['Concentration'].rolling(window=i, min_periods=1).mean())
-                .groupby(pd.Grouper(freq="1D")).max(),
-                left_index=True, right_index=True)
-
-    for col in df_result_concentrations.columns:
-        df_result_concentrations[col] = \
-            df_result_concentrations[col].map(
-                lambda x: __convert_measure(concentration=x, measure_source=measure,
-                                            measure_target=pollutant_info.measure,
-                                            pollutant_id=pollutant_info.pollutant_id))
+            daily_aggregated = daily_groups[f'Concentration_{i}H'].max()
+        if daily_values is None:
+            daily_index = daily_aggregated.index
+            daily_values = np.empty((daily_index.shape[0], len(pollutant_info.hourly_intervals)),
+                                    dtype=np.float64)
+        daily_values[:, col_num] = daily_aggregated.to_numpy(dtype=np.float64)
+
+    df_result_concentrations = pd.DataFrame(
+        daily_values, index=daily_index,
+        columns=[f'Concentration_{i}H' for i in pollutant_info.hourly_intervals])
+    df_result_concentrations *= get_measure_factor(measure_source=measure,
+                                                   measure_target=pollutant_info.measure,
+                                                   pollutant_id=pollutant_info.pollutant_id)
     return df_result_concentrations
 
 
+def __rolling_mean_np(concentrations: np.ndarray, window: int) -> np.ndarray:
+    # mean of not NaN values in the window of the last rows (as rolling with min_periods=1),
+    # summed in the same order for every window, so the value depends only on the window rows
+    # and the incremental calculation gives the same values as the calculation for all rows
+    padded = np.concatenate([np.full(window - 1, np.nan), concentrations])
+    sums = np.zeros(concentrations.shape[0], dtype=np.float64)
+    counts = np.zeros(concentrations.shape[0], dtype=np.float64)
+    for shift in range(window):
+        window_values = padded[shift: shift + concentrations.shape[0]]
+        is_valid = ~np.isnan(window_values)
+        sums += np.where(is_valid, window_values, 0)
+        counts += is_valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def __get_rolling_tail_size(pollutant_info: pld.PollutantDto) -> int:
+    rolling_intervals = [i for i in pollutant_info.hourly_intervals if i not in (1, 24)]
+    return max(rolling_intervals) - 1 if rolling_intervals else 0
+
+
 def calculate_aqi_for_day(pollutant_id: int, concentrations_per_24: list, measure: str) -> int:
     """
     Calculates AQI for pollutant
@@ -170,30 +300,58 @@ def __get_aqi_for_day(pollutant_info: pld.PollutantDto, concentrations: []) -> i
 
 def __convert_measure(concentration: float, measure_source: str,
                       measure_target: str, pollutant_id: int) -> float:
+    return concentration * get_measure_factor(measure_source=measure_source,
+                                              measure_target=measure_target,
+                                              pollutant_id=pollutant_id)
+
+
+def convert_measure_np(concentrations, measure_source: str,
+                       measure_target: str, pollutant_id: int) -> np.ndarray:
+    """
+    Converts concentrations of the pollutant to another units of measurement
+    :param concentrations: Array with concentrations
+    :param measure_source: Units of measurement of the concentrations
+    :param measure_target: Required units of measurement
+    :param pollutant_id: Pollutant id in AQI data
+    :return: Array with converted concentrations
+    """
+    return np.asarray(concentrations, dtype=np.float64) * get_measure_factor(
+        measure_source=measure_source, measure_target=measure_target, pollutant_id=pollutant_id)
+
+
+def get_measure_factor(measure_source: str, measure_target: str, pollutant_id: int) -> float:
+    """
+    Returns the multiplier to convert concentrations of the pollutant
+    to another units of measurement
+    :param measure_source: Units of measurement of the concentrations
+    :param measure_target: Required units of measurement
+    :param pollutant_id: Pollutant id in AQI data
+    :return: The multiplier for concentrations
+    """
+    factor = _MEASURE_FACTORS.get((pollutant_id, measure_source, measure_target))
+    if factor is None:
+        factor = __calc_measure_factor(measure_source, measure_target, pollutant_id)
+    return factor
+
+
+def __calc_measure_factor(measure_source: str, measure_target: str, pollutant_id: int) -> float:
     if measure_source == measure_target:
-        return concentration
+        return 1.0
 
-    concentration_converted = concentration
+    factor = 1.0
     if measure_source == 'µg/m3':
-        concentration_converted = concentration / 1000
-    if measure_target in ('ppm', 'ppb'):
-        if pollutant_id == 7:
-            concentration_converted = concentration_converted * 24.45 / 48
-        elif pollutant_id == 10:
-            concentration_converted = concentration_converted * 24.45 / 28.01
-        elif pollutant_id == 1:
-            concentration_converted = concentration_converted * 24.45 / 64.06
-        elif pollutant_id == 8:
-            concentration_converted = concentration_converted * 24.45 / 46.01
+        factor = factor / 1000
+    if measure_target in ('ppm', 'ppb') and pollutant_id in _MOLECULAR_WEIGHTS:
+        factor = factor * _MOLAR_VOLUME / _MOLECULAR_WEIGHTS[pollutant_id]
 
     if measure_target == 'ppm':
-        return concentration_converted
+        return factor
     if measure_target == 'ppb':
-        return concentration_converted * 1000
+        return factor * 1000
     if measure_target == 'μg/m3':
-        return concentration_converted
+        return factor
 
-    return concentration
+    return 1.0
 
 
 def get_aqi_info_by_value(aqi_val: float) -> aqd.AqiDto:
@@ -225,12 +383,12 @@ def calc_aqi_for_day_target(pollutant_id: int, target: [], measure: str):
     """
 
     pollutant_info = _POLLUTANTS_INFO[pollutant_id]
-    targ_conv_mes = [__convert_measure(concentration=x, measure_source=measure,
+    targ_conv_mes = convert_measure_np(concentrations=target, measure_source=measure,
                                        measure_target=pollutant_info.measure,
-                                       pollutant_id=pollutant_info.pollutant_id) for x in target]
+                                       pollutant_id=pollutant_info.pollutant_id)
 
-    target_res = [__get_aqi_for_day(pollutant_info, [x]) for x in targ_conv_mes]
-    return target_res
+    target_res = calc_aqi_for_days_np(pollutant_id, [targ_conv_mes])
+    return target_res.tolist()
 
 
 def __recalc_concentration(pollutant_info: pld.PollutantDto,
@@ -346,3 +504,89 @@ def __calculate_aqi_by_formula(breakpoint_info: bpd.BreakpointDto) -> int:
                     / (breakpoint_info.high_border - breakpoint_info.low_border)
                     + aqi_lo, 0))
     return aqi
+
+
+def __get_breakpoints_table_np(pollutant_info: pld.PollutantDto, breakpoints: list,
+                               sources: list[int]) -> dict:
+    """
+    Converts the list of breakpoints to numpy arrays for the search by np.searchsorted.
+    Empty breakpoints at the beginning are skipped (the next one is only the low border),
+    an empty breakpoint after the filled ones finishes the table.
+    Consecutive breakpoints with the same source of concentration form one search run
+    """
+    highs = np.full(_BREAKPOINTS_COUNT, np.nan)
+    lows = np.full(_BREAKPOINTS_COUNT, np.nan)
+    valid = np.zeros(_BREAKPOINTS_COUNT, dtype=bool)
+    runs = []
+    breakpoint_low = 0
+    for i in range(_BREAKPOINTS_COUNT):
+        if breakpoints[i] is None:
+            if runs:
+                break
+            breakpoint_low = None
+            continue
+        highs[i] = breakpoints[i]
+        if breakpoint_low is not None:
+            lows[i] = breakpoint_low
+            valid[i] = True
+        if runs and runs[-1][2] == sources[i]:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1, sources[i]])
+        breakpoint_low = breakpoints[i] + pollutant_info.step
+    return {'highs': highs, 'lows': lows, 'valid': valid, 'runs': runs}
+
+
+def __get_breakpoints_tables_np(pollutant_info: pld.PollutantDto) -> list[dict]:
+    intervals = pollutant_info.hourly_intervals
+    breakpoints_by_intervals = pollutant_info.breakpoints_by_intervals
+    if pollutant_info.pollutant_code == "O3":
+        return [__get_breakpoints_table_np(pollutant_info, breakpoints_by_intervals[interval],
+                                           [0] * _BREAKPOINTS_COUNT)
+                for interval in intervals]
+    if pollutant_info.pollutant_code == "SO2":
+        breakpoints_1 = breakpoints_by_intervals[intervals[0]]
+        breakpoints_24 = breakpoints_by_intervals[intervals[1]]
+        switch_ind = breakpoints_1.index(None)
+        return [__get_breakpoints_table_np(
+            pollutant_info, breakpoints_1[:switch_ind] + breakpoints_24[switch_ind:],
+            [0] * switch_ind + [1] * (_BREAKPOINTS_COUNT - switch_ind))]
+    return [__get_breakpoints_table_np(pollutant_info, breakpoints_by_intervals[intervals[0]],
+                                       [0] * _BREAKPOINTS_COUNT)]
+
+
+def __calc_aqi_by_table_np(table: dict, concentrations: list[np.ndarray]) -> np.ndarray:
+    highs, lows = table['highs'], table['lows']
+    size = concentrations[0].shape[0]
+    breakpoint_ind = np.full(size, -1, dtype=np.int64)
+    concentration = np.full(size, np.nan)
+    unresolved = np.arange(size)
+    for run_start, run_end, source in table['runs']:
+        run_concentration = concentrations[source][unresolved]
+        pos = np.searchsorted(highs[run_start:run_end], run_concentration, side='right')
+        found = pos < run_end - run_start
+        breakpoint_ind[unresolved[found]] = pos[found] + run_start
+        concentration[unresolved[found]] = run_concentration[found]
+        unresolved = unresolved[~found]
+
+    found = breakpoint_ind > -1
+    found[found] = table['valid'][breakpoint_ind[found]]
+    ind = np.where(found, breakpoint_ind, 0)
+    aqi_lo, aqi_hi = _AQI_LOW_NP[ind], _AQI_HIGH_NP[ind]
+    with np.errstate(invalid='ignore'):
+        aqi = np.round((aqi_hi - aqi_lo) * (concentration - lows[ind])
+                       / (highs[ind] - lows[ind]) + aqi_lo, 0)
+    return np.where(found, aqi, np.nan)
+
+
+def __fill_aqi_np(aqi: np.ndarray, fill_value) -> np.ndarray:
+    return aqi if np.isnan(fill_value) else np.where(np.isnan(aqi), fill_value, aqi)
+
+
+_MEASURE_FACTORS = {(pollutant_id, measure_source, measure_target):
+                    __calc_measure_factor(measure_source, measure_target, pollutant_id)
+                    for pollutant_id in _POLLUTANTS_INFO
+                    for measure_source in _MEASURES for measure_target in _MEASURES}
+
+_BREAKPOINTS_NP = {pollutant_id: __get_breakpoints_tables_np(pollutant_info)
+                   for pollutant_id, pollutant_info in _POLLUTANTS_INFO.items()}
@@ -3,10 +3,14 @@
 """
 Unit tests for AQI calculations
 """
+import os
 import unittest
+import numpy as np
 import pandas as pd
 import data_preprocessing.aqi_calculations.aqi_calculator as aqc
 
+TESTS_FOLDER = os.path.dirname(__file__)
+
 
 class AqiCalculatorTestCase(unittest.TestCase):
     """
@@ -68,12 +72,78 @@ class AqiCalculatorTestCase(unittest.TestCase):
         aqi_info = aqc.get_aqi_info_by_value(aqi)
         self.assertEqual(aqi_info.value, 114)
 
+    def test_so2_moderate(self):
+        """Test SO2 AQI calculations for a day. Moderate level"""
+        pollutant_id = 1
+        concentrations_per_24 = [40.0] * 23 + [60.0]
+        aqi = aqc.calculate_aqi_for_day(pollutant_id, concentrations_per_24, 'ppb')
+        aqi_info = aqc.get_aqi_info_by_value(aqi)
+        self.assertEqual(aqi_info.value, 81)
+
+    def test_days_np_equals_day(self):
+        """Test vectorized AQI calculations for all pollutants give the same values
+        as calculations per day"""
+        for pollutant_id, pollutant_info in aqc._POLLUTANTS_INFO.items():
+            breakpoints = [x for values in pollutant_info.breakpoints_by_intervals.values()
+                           for x in values if x is not None]
+            concentrations = np.round(np.linspace(-1, max(breakpoints) * 1.2, 3001),
+                                      pollutant_info.decimals_count)
+            concentrations = np.append(concentrations, np.nan)
+            aqi_expected = [aqc.calculate_aqi_for_day(pollutant_id, [x] * 24,
+                                                      pollutant_info.measure)
+                            for x in concentrations]
+            aqi_res = aqc.calc_aqi_for_days_np(
+                pollutant_id, [concentrations] * len(pollutant_info.hourly_intervals))
+            self.assertListEqual(aqi_res.tolist(), aqi_expected)
+
+    def test_days_np_equals_day_mixed_intervals(self):
+        """Test vectorized AQI calculations give the same values as calculations per day
+        when the 1H, 8H and 24H concentrations differ: SO2 around the switch
+        from 1H to 24H (304 and 604 ppb), O3 around the 8H and 1H breakpoints"""
+        rng = np.random.default_rng(42)
+        levels_by_pollutants = {
+            1: ([0, 35, 150, 300, 590, 600, 603.9, 604, 605, 610, 800, 1004],
+                [34.9, 35, 303.9, 304, 304.5, 305, 310, 603.9, 604, 605, 700, 1004, 1010]),
+            7: ([0.03, 0.054, 0.055, 0.07, 0.071, 0.085, 0.1, 0.105, 0.106, 0.2, 0.21],
+                [0.124, 0.125, 0.126, 0.164, 0.165, 0.204, 0.404, 0.405, 0.604, 0.605])}
+        for pollutant_id, (bases, peaks) in levels_by_pollutants.items():
+            pollutant_info = aqc.get_pollutant_info(pollutant_id)
+            days = []
+            for base in bases:
+                for peak in peaks:
+                    if peak < base:
+                        continue
+                    for peak_hours in [1, 3, 8]:
+                        hours = [base] * 24
+                        hours[10:10 + peak_hours] = [peak] * peak_hours
+                        days.append(hours)
+            for _ in range(500):
+                base, peak = np.sort(rng.choice(bases + peaks, 2))
+                days.append(np.round(rng.uniform(base, peak, 24),
+                                     pollutant_info.decimals_count).tolist())
+
+            aqi_expected = [aqc.calculate_aqi_for_day(pollutant_id, hours, pollutant_info.measure)
+                            for hours in days]
+            concentrations = np.array([self.__get_interval_concentrations(pollutant_info, hours)
+                                       for hours in days])
+            self.assertTrue((concentrations[:, 0] != concentrations[:, 1]).any())
+            aqi_res = aqc.calc_aqi_for_days_np(
+                pollutant_id, [concentrations[:, col] for col in range(concentrations.shape[1])])
+            self.assertListEqual(aqi_res.tolist(), aqi_expected)
+
+    @staticmethod
+    def __get_interval_concentrations(pollutant_info, hours: list) -> list:
+        # the max of the means by the intervals of the day, as in the calculation per day
+        return [max(round(sum(hours[j * i:j * i + i]) / i, pollutant_info.decimals_count)
+                    for j in range(24 // i))
+                for i in pollutant_info.hourly_intervals]
+
     def test_pm10_pandas(self):
         """Test PM10 AQI calculations for period"""
         pollutant_id = 5
         measure = 'µg/m3'
-        df_source = pd.read_csv("PL_5_29754_2022_timeseries.csv", parse_dates=True,
-                                index_col='DatetimeEnd')
+        df_source = pd.read_csv(os.path.join(TESTS_FOLDER, "PL_5_29754_2022_timeseries.csv"),
+                                parse_dates=True, index_col='DatetimeEnd')
         df_result = aqc.calc_aqi_for_day_pd(pollutant_id, df_source, measure)
         self.assertEqual(df_result.iloc[0, -1], 10)
 
@@ -81,8 +151,8 @@ class AqiCalculatorTestCase(unittest.TestCase):
         """Test O3 AQI calculations for period"""
         pollutant_id = 7
         measure = 'µg/m3'
-        df_source = pd.read_csv("NL_7_28294_2021_timeseries.csv", parse_dates=True,
-                                index_col='DatetimeEnd')
+        df_source = pd.read_csv(os.path.join(TESTS_FOLDER, "NL_7_28294_2021_timeseries.csv"),
+                                parse_dates=True, index_col='DatetimeEnd')
         df_result = aqc.calc_aqi_for_day_pd(pollutant_id, df_source, measure)
         self.assertEqual(df_result.iloc[0, -1], 14)
 
@@ -94,3 +164,48 @@ class AqiCalculatorTestCase(unittest.TestCase):
         aqi_res = aqc.calculate_aqi_for_day_target(pollutant_id, concentrations_daily, 'µg/m3')
 
         self.assertEqual(aqi_res[0], 75)
+
+    def test_co_target_ppm(self):
+        """Test CO AQI calculations for a day with conversion from µg/m3 to ppm"""
+        pollutant_id = 10
+        concentrations_daily = [3200.0, 11500.0, np.nan]
+        aqi_res = aqc.calculate_aqi_for_day_target(pollutant_id, concentrations_daily, 'µg/m3')
+        expected = aqc.calc_aqi_for_days_np(
+            pollutant_id, [np.array(concentrations_daily) / 1000 * 24.45 / 28.01]).tolist()
+
+        self.assertEqual(aqi_res, expected)
+        self.assertEqual(aqi_res[2], 0)
+
+    def test_o3_pandas_incremental(self):
+        """Test O3 AQI calculations for new days equals to calculations for all the period"""
+        pollutant_id = 7
+        measure = 'µg/m3'
+        df_source = pd.read_csv(os.path.join(TESTS_FOLDER, "NL_7_28294_2021_timeseries.csv"),
+                                parse_dates=True, index_col='DatetimeEnd').sort_index()
+        df_full = aqc.calc_aqi_for_day_pd(pollutant_id, df_source, measure)
+
+        df_prev = df_source.iloc[:5000]
+        df_aqi = aqc.calc_aqi_for_day_pd(pollutant_id, df_prev, measure)
+        aqi_state = aqc.get_aqi_state_pd(pollutant_id, df_prev, df_aqi)
+        for end in [5005, 5030, 6000, df_source.shape[0]]:
+            df_aqi_new, aqi_state = aqc.calc_aqi_for_new_days_pd(
+                pollutant_id, df_source.iloc[:end], measure, aqi_state)
+            df_aqi = pd.concat([df_aqi[df_aqi.index < df_aqi_new.index[0]], df_aqi_new])
+
+        pd.testing.assert_frame_equal(df_aqi, df_full, check_freq=False)
+
+    def test_o3_pandas_incremental_from_empty_state(self):
+        """Test O3 AQI calculations for new days starting from the state without AQI days"""
+        pollutant_id = 7
+        measure = 'µg/m3'
+        df_source = pd.read_csv(os.path.join(TESTS_FOLDER, "NL_7_28294_2021_timeseries.csv"),
+                                parse_dates=True, index_col='DatetimeEnd').sort_index()
+        df_full = aqc.calc_aqi_for_day_pd(pollutant_id, df_source, measure)
+
+        aqi_state = aqc.get_aqi_state_pd(pollutant_id, df_source.iloc[:0], df_full.iloc[:0])
+        self.assertEqual(aqi_state, {'last_day': None, 'tail': []})
+        df_aqi, aqi_state = aqc.calc_aqi_for_new_days_pd(pollutant_id, df_source, measure,
+                                                         aqi_state)
+
+        pd.testing.assert_frame_equal(df_aqi, df_full, check_freq=False)
+        self.assertEqual(pd.Timestamp(aqi_state['last_day']), df_full.index[-1])
@@ -3,6 +3,7 @@
 """
 Module estimates AQI for cleaned pollutant data
 """
+import json
 import os
 import pandas as pd
 from settings import settings
@@ -38,3 +39,62 @@ def calculate_aqi(df_pol_list: list[pd.DataFrame], pollutants_codes: [int]):
         measure = settings.POL_MEASURES[pollutant_id]
         df_aqi_list.append(aqc.calc_aqi_for_day_pd(pollutant_id, df_pol_list[i], measure))
     return df_aqi_list
+
+
+def calculate_aqi_incremental(df_pol_list: list[pd.DataFrame], df_aqi_prev_list: list[pd.DataFrame],
+                              pollutants_codes: [int], aqi_states: dict):
+    """
+    Calculates AQI indices only for the new days and appends them to the calculated AQI
+    @param df_pol_list: List with concentration datasets per pollutant (can have only new hours)
+    @param df_aqi_prev_list: List with calculated AQI per pollutant
+    @param pollutants_codes: The list of pollutant codes
+    @param aqi_states: Dictionary with the incremental AQI states per pollutant code,
+    is updated for the new days
+    @return: List of dataframes with calculated AQI per pollutant
+    """
+    df_aqi_list = []
+    for i in range(len(pollutants_codes)):
+        pollutant_id = pollutants_codes[i]
+        measure = settings.POL_MEASURES[pollutant_id]
+        df_aqi_new, aqi_states[str(pollutant_id)] = aqc.calc_aqi_for_new_days_pd(
+            pollutant_id, df_pol_list[i], measure, aqi_states[str(pollutant_id)])
+        df_aqi_prev = df_aqi_prev_list[i]
+        if df_aqi_new.shape[0] > 0:
+            df_aqi_prev = df_aqi_prev[df_aqi_prev.index < df_aqi_new.index[0]]
+        df_aqi_list.append(pd.concat([df_aqi_prev, df_aqi_new]))
+    return df_aqi_list
+
+
+def get_aqi_states(pollutants_codes: [int], df_pol_list: list[pd.DataFrame],
+                   df_aqi_list: list[pd.DataFrame]) -> dict:
+    """
+    Returns the states for the incremental AQI calculation per pollutant code
+    @param pollutants_codes: The list of pollutant codes
+    @param df_pol_list: List with concentration datasets per pollutant used to calculate AQI
+    @param df_aqi_list: List of dataframes with calculated AQI per pollutant
+    @return: Dictionary with the incremental AQI states per pollutant code
+    """
+    return {str(pollutants_codes[i]): aqc.get_aqi_state_pd(
+        pollutants_codes[i], df_pol_list[i], df_aqi_list[i]) for i in range(len(pollutants_codes))}
+
+
+def read_aqi_states(file_path: str):
+    """
+    Reads the states for the incremental AQI calculation
+    @param file_path: The path to the states file
+    @return: Dictionary with the states per pollutant code or None if there is no file
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', encoding='UTF-8') as file_stream:
+        return json.load(file_stream)
+
+
+def save_aqi_states(file_path: str, aqi_states: dict):
+    """
+    Saves the states for the incremental AQI calculation
+    @param file_path: The path to the states file
+    @param aqi_states: Dictionary with the states per pollutant code
+    """
+    with open(file_path, 'w', encoding='UTF-8') as file_stream:
+        json.dump(aqi_states, file_stream, indent=2)
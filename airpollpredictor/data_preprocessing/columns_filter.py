@@ -63,13 +63,55 @@ def filter_data_frame(df_timeseries: pd.DataFrame,
     the features datasets_tests (!not tested yet)
     @return:
     """
+    cols = filter_columns(columns=df_timeseries.columns.values,
+                          pol_codes=pol_codes,
+                          weather_columns=weather_columns,
+                          date_columns=date_columns,
+                          target_column_name=target_column_name,
+                          use_aqi_cols=use_aqi_cols,
+                          use_c_mean_cols=use_c_mean_cols,
+                          use_c_median_cols=use_c_median_cols,
+                          use_c_max_cols=use_c_max_cols,
+                          use_c_min_cols=use_c_min_cols,
+                          use_lag_cols=use_lag_cols,
+                          use_gen_lags_cols=use_gen_lags_cols,
+                          use_pol_cols=use_pol_cols,
+                          use_weather_cols=use_weather_cols,
+                          pol_id=pol_id)
+    df_use = df_timeseries[cols]
+    return df_use
+
+
+def filter_columns(columns: list,
+                   pol_codes: [],
+                   weather_columns: [],
+                   date_columns: [],
+                   target_column_name: str,
+                   use_aqi_cols: bool,
+                   use_c_mean_cols: bool,
+                   use_c_median_cols: bool,
+                   use_c_max_cols: bool,
+                   use_c_min_cols: bool,
+                   use_lag_cols: bool,
+                   use_gen_lags_cols: bool,
+                   use_pol_cols: bool,
+                   use_weather_cols: bool,
+                   pol_id: int = -1
+                   ) -> list:
+    """
+    Returns the names of the columns filtered by requirements, the same as filter_data_frame
+    does for the dataframe columns. Allows to read only the required columns of the dataset
+    @param columns: The names of the timeseries columns
+    The other params are the same as in filter_data_frame
+    @return: The list of the filtered columns
+    """
     if pol_id > 0:
-        cols = [x for x in df_timeseries.columns.values if x.find(settings.POL_NAMES[pol_id]) > 0]
+        cols = [x for x in columns if x.find(settings.POL_NAMES[pol_id]) > 0]
     else:
-        cols = [x for x in df_timeseries.columns.values
+        cols = [x for x in columns
                 if [p for p in pol_codes if x.find(settings.POL_NAMES[p]) > 0]]
 
-    all_values_columns = [x for x in df_timeseries.columns.values if
+    all_values_columns = [x for x in columns if
                           [p for p in pol_codes if x.endswith(settings.POL_NAMES[p])]] + [
                              'AQI'] + ['Pollutant']
     cols = [x for x in cols if x not in all_values_columns]
@@ -103,6 +145,4 @@ def filter_data_frame(df_timeseries: pd.DataFrame,
     cols = date_columns + cols
     if target_column_name not in cols:
         cols = [target_column_name] + cols
-
-    df_use = df_timeseries[cols]
-    return df_use
+    return cols
@@ -0,0 +1,129 @@
+"""
+Module for reading many small CSV files (i.e. EEA files per station and year) into one dataframe.
+The files are parsed in batches on a thread or process pool and the batches are
+concatenated once, keeping the categorical columns categorical.
+The categorical columns are converted once per batch: concatenation of thousands
+of small dataframes with different categories is much slower than of the strings.
+The files that do not fit in memory together are streamed by iter_csv_files
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+from typing import Iterator
+import pandas as pd
+from data_preprocessing import dtypes_schema
+
+_BATCHES_PER_WORKER = 4
+_MAX_BATCH_SIZE = 100
+
+
+def read_csv_files(files: list[str], workers_count: int = 1, use_processes: bool = False,
+                   source_column: str = None, **read_csv_args) -> pd.DataFrame:
+    """
+    Reads the CSV files into one dataframe in the order of the files
+    @param files: The paths to the files
+    @param workers_count: The number of threads or processes to parse the files in parallel
+    @param use_processes: Flag if the process pool should be used instead of the thread pool.
+    Processes do not share GIL, but the parsed batches are pickled to the main process
+    @param source_column: The name of the column for the name of the source file (optional)
+    @param read_csv_args: Other arguments of pd.read_csv (usecols, dtype, ...)
+    @return: The concatenated dataframe
+    """
+    files = list(files)
+    workers_count = max(1, min(workers_count, len(files)))
+    batch_size = max(1, min(_MAX_BATCH_SIZE,
+                            -(-len(files) // (workers_count * _BATCHES_PER_WORKER))))
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    if workers_count == 1:
+        df_batches = [__read_files_batch(batch, source_column, read_csv_args)
+                      for batch in batches]
+    else:
+        executor_type = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_type(max_workers=workers_count) as executor:
+            df_batches = list(executor.map(__read_files_batch, batches,
+                                           [source_column] * len(batches),
+                                           [read_csv_args] * len(batches)))
+    return dtypes_schema.concat_frames(df_batches, ignore_index=True)
+
+
+def iter_csv_files(files: list[str], workers_count: int = 1, source_column: str = None,
+                   chunksize: int = None, **read_csv_args) -> Iterator[pd.DataFrame]:
+    """
+    Reads the CSV files one by one in the order of the files without concatenating them,
+    i.e. to append them to one file. The files are parsed on a thread pool,
+    at most 2 * workers_count files are parsed ahead, so the memory does not depend
+    on the number of files. With chunksize a file is returned in chunks: the first chunk
+    is parsed on the pool, the next ones while iterating
+    @param files: The paths to the files
+    @param workers_count: The number of threads to parse the files in parallel
+    @param source_column: The name of the column for the name of the source file (optional)
+    @param chunksize: The max number of the lines of a returned dataframe,
+    the file is returned at once if None
+    @param read_csv_args: Other arguments of pd.read_csv (usecols, dtype, ...)
+    @return: Iterator of the dataframes of the files or of their chunks
+    """
+    workers_count = max(1, workers_count)
+    with ThreadPoolExecutor(max_workers=workers_count) as executor:
+        futures = deque()
+        try:
+            for file_path in files:
+                futures.append(executor.submit(__read_file_head, file_path, source_column,
+                                               chunksize, read_csv_args))
+                if len(futures) >= 2 * workers_count:
+                    yield from __iter_file_tail(*futures.popleft().result(), source_column)
+            while futures:
+                yield from __iter_file_tail(*futures.popleft().result(), source_column)
+        finally:
+            # the readers of the files parsed ahead are closed if the iteration is stopped
+            for future in futures:
+                if future.exception() is None and future.result()[2] is not None:
+                    future.result()[2].close()
+
+
+def __read_file_head(file_path: str, source_column: str, chunksize: int, read_csv_args: dict):
+    if chunksize is None:
+        return file_path, __assign_source(pd.read_csv(file_path, **read_csv_args),
+                                          file_path, source_column), None
+    reader = pd.read_csv(file_path, chunksize=chunksize, **read_csv_args)
+    df_chunk = next(reader, None)
+    return file_path, __assign_source(df_chunk, file_path, source_column), reader
+
+
+def __iter_file_tail(file_path: str, df_head: pd.DataFrame, reader, source_column: str) \
+        -> Iterator[pd.DataFrame]:
+    if reader is None:
+        if df_head is not None:
+            yield df_head
+        return
+    with reader:
+        if df_head is not None:
+            yield df_head
+        for df_chunk in reader:
+            yield __assign_source(df_chunk, file_path, source_column)
+
+
+def __assign_source(df_file: pd.DataFrame, file_path: str, source_column: str) -> pd.DataFrame:
+    if df_file is not None and source_column is not None:
+        df_file[source_column] = os.path.basename(file_path)
+    return df_file
+
+
+def __read_files_batch(files: list[str], source_column: str, read_csv_args: dict) \
+        -> pd.DataFrame:
+    dtypes = read_csv_args.get('dtype')
+    categorical_dtypes = {}
+    if isinstance(dtypes, dict):
+        categorical_dtypes = {col: dtype for col, dtype in dtypes.items()
+                              if str(dtype) == 'category'}
+        read_csv_args = {**read_csv_args,
+                         'dtype': {col: dtype for col, dtype in dtypes.items()
+                                   if col not in categorical_dtypes}}
+    df_files = []
+    for file_path in files:
+        df_file = pd.read_csv(file_path, **read_csv_args)
+        if source_column is not None:
+            df_file[source_column] = os.path.basename(file_path)
+        df_files.append(df_file)
+    df_batch = pd.concat(df_files, ignore_index=True)
+    return df_batch.astype(categorical_dtypes) if categorical_dtypes else df_batch
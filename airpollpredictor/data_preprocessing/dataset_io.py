@@ -0,0 +1,137 @@
+# pylint: disable=E0401
+"""
+Module for reading and writing the datasets passed between the pipeline stages.
+The format is chosen by the file extension: Parquet and Feather keep the dtypes
+and the timezone of the index, CSV is kept for compatibility
+"""
+
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from settings import settings
+
+
+def __read_csv(file_path: str, index_col: str, columns: list) -> pd.DataFrame:
+    usecols = None if columns is None else __get_columns_with_index(columns, index_col)
+    return pd.read_csv(file_path, parse_dates=True, index_col=index_col, usecols=usecols)
+
+
+def __read_csv_columns(file_path: str, index_col: str) -> list:
+    return [col for col in pd.read_csv(file_path, nrows=0).columns.values if col != index_col]
+
+
+def __write_csv(df_dataset: pd.DataFrame, file_path: str):
+    df_dataset.to_csv(file_path)
+
+
+def __read_parquet(file_path: str, index_col: str, columns: list) -> pd.DataFrame:
+    # the index saved by pandas is read with any columns
+    return __set_index(pd.read_parquet(file_path, columns=columns), index_col)
+
+
+def __read_parquet_columns(file_path: str, index_col: str) -> list:
+    schema = pq.read_schema(file_path)
+    index_columns = schema.pandas_metadata['index_columns'] if schema.pandas_metadata else []
+    return [col for col in schema.names if col not in index_columns and col != index_col]
+
+
+def __write_parquet(df_dataset: pd.DataFrame, file_path: str):
+    df_dataset.to_parquet(file_path)
+
+
+def __read_feather(file_path: str, index_col: str, columns: list) -> pd.DataFrame:
+    read_columns = None if columns is None else __get_columns_with_index(columns, index_col)
+    return __set_index(pd.read_feather(file_path, columns=read_columns), index_col)
+
+
+def __read_feather_columns(file_path: str, index_col: str) -> list:
+    with pa.memory_map(file_path) as source:
+        names = pa.ipc.open_file(source).schema.names
+    return [col for col in names if col != index_col]
+
+
+def __write_feather(df_dataset: pd.DataFrame, file_path: str):
+    # feather keeps only the default index
+    df_dataset.reset_index().to_feather(file_path)
+
+
+def __get_columns_with_index(columns: list, index_col: str) -> list:
+    return list(columns) if index_col is None or index_col in columns \
+        else [index_col] + list(columns)
+
+
+def __set_index(df_dataset: pd.DataFrame, index_col: str) -> pd.DataFrame:
+    if index_col is not None and index_col in df_dataset.columns:
+        df_dataset.set_index(index_col, inplace=True)
+    return df_dataset
+
+
+_FORMATS = {
+    '.csv': (__read_csv, __write_csv, __read_csv_columns),
+    '.parquet': (__read_parquet, __write_parquet, __read_parquet_columns),
+    '.feather': (__read_feather, __write_feather, __read_feather_columns),
+}
+
+
+def register_format(extension: str, reader, writer, columns_reader):
+    """
+    Adds the format of the datasets files
+    @param extension: The extension of the files, e.g. '.parquet'
+    @param reader: Function (file_path, index_col, columns) -> Dataframe,
+    columns are None to read all the columns
+    @param writer: Function (dataframe, file_path)
+    @param columns_reader: Function (file_path, index_col) -> list of the columns except index
+    """
+    _FORMATS[extension.lower()] = (reader, writer, columns_reader)
+
+
+def get_format(file_path: str) -> str:
+    """
+    Returns the format of the dataset file
+    @param file_path: The path to the file
+    @return: The extension of the file
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in _FORMATS:
+        raise ValueError(f'Unknown dataset format {extension}, '
+                         f'expected one of {list(_FORMATS.keys())}')
+    return extension
+
+
+def read_dataset(file_path: str, index_col: str = settings.DATE_COLUMN_NAME,
+                 columns: list = None) -> pd.DataFrame:
+    """
+    Reads the dataset in the format of the file extension
+    @param file_path: The path to the file
+    @param index_col: The name of the index column
+    @param columns: The columns to read (except the index) in the required order,
+    other columns are not read from the file. None to read all the columns
+    @return: Dataframe with the index
+    """
+    reader, _, _ = _FORMATS[get_format(file_path)]
+    df_dataset = reader(file_path, index_col, columns)
+    if columns is not None and df_dataset.columns.tolist() != list(columns):
+        df_dataset = df_dataset[list(columns)]
+    return df_dataset
+
+
+def read_dataset_columns(file_path: str, index_col: str = settings.DATE_COLUMN_NAME) -> list:
+    """
+    Reads only the names of the dataset columns to choose the columns to read
+    @param file_path: The path to the file
+    @param index_col: The name of the index column
+    @return: The names of the columns except the index
+    """
+    _, _, columns_reader = _FORMATS[get_format(file_path)]
+    return columns_reader(file_path, index_col)
+
+
+def write_dataset(df_dataset: pd.DataFrame, file_path: str):
+    """
+    Writes the dataset in the format of the file extension
+    @param df_dataset: The dataset
+    @param file_path: The path to the file
+    """
+    _, writer, _ = _FORMATS[get_format(file_path)]
+    writer(df_dataset, file_path)
@@ -0,0 +1,72 @@
+# pylint: disable=E0401
+"""
+Module for applying the dtypes schema of the pollutants data (settings.POL_COLUMNS_DTYPES)
+and reporting the memory used by the dataframes of a stage
+"""
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from settings import settings
+
+_BYTES_IN_MB = 1024 * 1024
+
+
+def get_pol_dtypes(columns: list) -> dict:
+    """
+    Returns the dtypes of the schema for the columns to read
+    @param columns: The names of the columns to read
+    @return: Dictionary column -> dtype for read_csv, columns out of the schema are skipped
+    """
+    return {col: settings.POL_COLUMNS_DTYPES[col] for col in columns
+            if col in settings.POL_COLUMNS_DTYPES}
+
+
+def concat_frames(df_list: list[pd.DataFrame], **kwargs) -> pd.DataFrame:
+    """
+    Concatenates the rows of dataframes keeping the categorical columns categorical:
+    the categories of every column are unified by union_categoricals,
+    pd.concat converts the columns with different categories to object
+    @param df_list: The list of dataframes with the same columns
+    @param kwargs: Other arguments of pd.concat
+    @return: The concatenated dataframe
+    """
+    df_list = list(df_list)
+    if len(df_list) <= 1:
+        return pd.concat(df_list, **kwargs)
+    categorical_cols = [col for col in df_list[0].columns
+                        if all(isinstance(df_part[col].dtype, pd.CategoricalDtype)
+                               for df_part in df_list)]
+    if not categorical_cols:
+        return pd.concat(df_list, **kwargs)
+    df_result = pd.concat([df_part.drop(columns=categorical_cols) for df_part in df_list],
+                          **kwargs)
+    for col in categorical_cols:
+        df_result[col] = union_categoricals([df_part[col] for df_part in df_list],
+                                             sort_categories=True)
+    return df_result[df_list[0].columns]
+
+
+def get_memory_usage_mb(df_data: pd.DataFrame) -> float:
+    """
+    Returns the memory used by the dataframe including the strings of the object columns
+    @param df_data: The dataframe
+    @return: The memory in MB
+    """
+    return df_data.memory_usage(index=True, deep=True).sum() / _BYTES_IN_MB
+
+
+def print_memory_report(stage: str, df_list: list[pd.DataFrame], names: list = None):
+    """
+    Prints the memory used by the dataframes of the stage
+    @param stage: The name of the stage or the step of the stage
+    @param df_list: The list of dataframes
+    @param names: The names of the dataframes (i.e. pollutant codes), the positions by default
+    """
+    if names is None:
+        names = list(range(len(df_list)))
+    total_mb = 0
+    for name, df_data in zip(names, df_list):
+        memory_mb = get_memory_usage_mb(df_data)
+        total_mb += memory_mb
+        print(f'{stage} memory: {str(name):10} rows: {df_data.shape[0]:10} {memory_mb:10.1f} MB')
+    print(f'{stage} memory: {"total":10} {"":16} {total_mb:10.1f} MB')
@@ -0,0 +1,258 @@
+"""
+On-disk cache of the lag features blocks.
+A block is split into the segments of the rows by the periods of the dates (years by default).
+A segment is saved to a Parquet or Feather file keyed by the hash of the input data
+of the dynamic filter the segment depends on (the rows of the segment and the lookback
+of the lags and the window, all the previous rows for ewm) and the spec of the block
+(filter, lag, preagg, window, method, ewm span), so the appended days change only
+the keys of the last segments.
+The sizes, the last use and the specs of the blocks are kept in memory and saved
+to one index file by flush, the folder is scanned only once when the cache is opened.
+The total size of the cache is bounded, the least recently used blocks are evicted by flush
+once per generation of the features.
+Run from the airpollpredictor folder to inspect or purge the cache:
+python -m data_preprocessing.features_generations.features_cache --cache_path <path> info
+"""
+
+from argparse import ArgumentParser
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+_FILE_FORMATS = ('parquet', 'feather')
+_INDEX_FILE_NAME = 'index.json'
+_BYTES_IN_MB = 1024 * 1024
+
+
+class FeaturesCache:
+    """
+    Cache of the lag features blocks with the size-bounded LRU eviction
+    """
+
+    def __init__(self, cache_path: str, max_size_mb: float, file_format: str = 'parquet',
+                 segment_freq: str = 'Y'):
+        """
+        @param cache_path: The folder of the cache, created if not exists
+        @param max_size_mb: The max size of the blocks files in MB
+        @param file_format: 'parquet' or 'feather'
+        @param segment_freq: The period of the dates of the blocks segments, i.e. 'Y' or 'M'.
+        Every segment of every block is a file, short periods make many small files
+        """
+        if file_format not in _FILE_FORMATS:
+            raise ValueError(f'Unknown file format {file_format}, expected one of {_FILE_FORMATS}')
+        self.__cache_path = cache_path
+        self.__max_size = max_size_mb * _BYTES_IN_MB
+        self.__file_format = file_format
+        self.__segment_freq = segment_freq
+        os.makedirs(cache_path, exist_ok=True)
+        self.__entries = self.__read_entries()
+        self.__size = sum(entry['size'] for entry in self.__entries.values())
+
+    @property
+    def cache_path(self) -> str:
+        """
+        The folder of the cache
+        """
+        return self.__cache_path
+
+    def get_segments(self, dates: pd.DatetimeIndex) -> list[tuple[int, int]]:
+        """
+        Splits the rows sorted by the dates into the segments by the periods of segment_freq
+        @param dates: The sorted dates of the rows
+        @return: List of the segments as the ranges of the rows [start, end)
+        """
+        if dates.shape[0] == 0:
+            return []
+        periods = pd.PeriodIndex(dates, freq=self.__segment_freq).asi8
+        bounds = [0] + (np.flatnonzero(periods[1:] != periods[:-1]) + 1).tolist() \
+            + [dates.shape[0]]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    @staticmethod
+    def get_rows_hashes(df_input: pd.DataFrame) -> np.ndarray:
+        """
+        Calculates the hashes of the rows of the input data, the hash of a range of the rows
+        is calculated from them by get_input_hash without hashing the values again
+        @param df_input: Dataframe with the columns required to generate the blocks
+        @return: Array with the hashes of the values and the index per row
+        """
+        return pd.util.hash_pandas_object(df_input, index=True).to_numpy()
+
+    @staticmethod
+    def get_input_hash(df_input: pd.DataFrame, rows_hashes: np.ndarray = None) -> str:
+        """
+        Calculates the hash of the input data of the blocks
+        @param df_input: Dataframe with the columns required to generate the blocks
+        (the rows the segment depends on)
+        @param rows_hashes: The hashes of the rows of df_input from get_rows_hashes,
+        calculated if None
+        @return: Hex digest of the values, index, columns and dtypes
+        """
+        if rows_hashes is None:
+            rows_hashes = FeaturesCache.get_rows_hashes(df_input)
+        hash_obj = hashlib.sha256()
+        hash_obj.update(rows_hashes.tobytes())
+        hash_obj.update(json.dumps([[str(col), str(dtype)] for col, dtype
+                                    in df_input.dtypes.items()]).encode('UTF-8'))
+        return hash_obj.hexdigest()
+
+    @staticmethod
+    def get_block_key(input_hash: str, block: dict, target_cols: list, id_cols: list) -> str:
+        """
+        Calculates the key of the block
+        @param input_hash: The hash of the input data from get_input_hash
+        @param block: The spec of the block from ts_lag_features_generator.get_features_blocks
+        with the dates of the segment
+        @param target_cols: Column names for lags calculation
+        @param id_cols: Key columns to identify unique values
+        @return: Hex digest of the input hash and the spec
+        """
+        spec = {'input': input_hash, 'target_cols': target_cols, 'id_cols': id_cols, **block}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str)
+                              .encode('UTF-8')).hexdigest()
+
+    def load_block(self, key: str) -> np.ndarray | None:
+        """
+        Loads the values of the block and marks it as recently used
+        @param key: The key of the block
+        @return: Array of the block values or None if the block is not cached
+        """
+        if key not in self.__entries:
+            return None
+        file_path = self.__get_block_file(key)
+        if self.__file_format == 'parquet':
+            df_block = pd.read_parquet(file_path)
+        else:
+            df_block = pd.read_feather(file_path)
+        self.__touch(key)
+        return df_block.to_numpy(dtype=np.float64)
+
+    def save_block(self, key: str, values: np.ndarray, columns: list, spec: dict = None):
+        """
+        Saves the values of the block, the cache can exceed the max size until flush
+        @param key: The key of the block
+        @param values: Array of the block values
+        @param columns: The names of the block columns
+        @param spec: The spec of the block to show in the cache info
+        """
+        file_path = self.__get_block_file(key)
+        tmp_file_path = f'{file_path}.tmp'
+        df_block = pd.DataFrame(values, columns=columns)
+        if self.__file_format == 'parquet':
+            df_block.to_parquet(tmp_file_path, index=False)
+        else:
+            df_block.to_feather(tmp_file_path)
+        os.replace(tmp_file_path, file_path)
+        if key in self.__entries:
+            self.__size -= self.__entries[key]['size']
+        self.__entries[key] = {'size': os.path.getsize(file_path), 'last_used': 0.0,
+                               'spec': json.loads(json.dumps(
+                                   spec if spec is not None else {'columns': columns},
+                                   default=str))}
+        self.__size += self.__entries[key]['size']
+        self.__touch(key)
+
+    def flush(self) -> int:
+        """
+        Evicts the least recently used blocks if the size of the cache exceeds the max size
+        and saves the index of the cache
+        @return: The number of removed blocks
+        """
+        return self.purge(self.__max_size / _BYTES_IN_MB)
+
+    def get_info(self) -> pd.DataFrame:
+        """
+        Returns the cached blocks ordered from the most recently used
+        @return: Dataframe with key, size in MB, last used time and the spec of the blocks
+        """
+        rows = [{'key': key,
+                 'size_mb': entry['size'] / _BYTES_IN_MB,
+                 'last_used': pd.Timestamp(entry['last_used'], unit='s'),
+                 **{name: value for name, value in entry['spec'].items() if name != 'columns'}}
+                for key, entry in reversed(self.__entries.items())]
+        return pd.DataFrame(rows, columns=None if rows else ['key', 'size_mb', 'last_used'])
+
+    def purge(self, max_size_mb: float = 0) -> int:
+        """
+        Removes the least recently used blocks until the size of the cache fits max_size_mb
+        and saves the index of the cache
+        @param max_size_mb: The size of the cache to keep in MB, 0 removes all the blocks
+        @return: The number of removed blocks
+        """
+        removed_count = 0
+        # the entries are ordered from the least recently used
+        for key in list(self.__entries):
+            if self.__size <= max_size_mb * _BYTES_IN_MB:
+                break
+            file_path = self.__get_block_file(key)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            self.__size -= self.__entries.pop(key)['size']
+            removed_count += 1
+        self.__save_index()
+        return removed_count
+
+    def __touch(self, key: str):
+        # moving the entry to the end keeps the entries in the order of the use
+        entry = self.__entries.pop(key)
+        entry['last_used'] = time.time()
+        self.__entries[key] = entry
+
+    def __read_entries(self) -> dict:
+        index_path = os.path.join(self.__cache_path, _INDEX_FILE_NAME)
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='UTF-8') as file_stream:
+                index = json.load(file_stream)
+        # the files are listed once: the blocks saved by the interrupted run without the index
+        # are added as the least recently used, the removed files are dropped from the index
+        extension = f'.{self.__file_format}'
+        entries = {}
+        for file_name in os.listdir(self.__cache_path):
+            if not file_name.endswith(extension):
+                continue
+            key = file_name[:-len(extension)]
+            file_stat = os.stat(os.path.join(self.__cache_path, file_name))
+            entries[key] = index.get(key, {'last_used': file_stat.st_mtime, 'spec': {}})
+            entries[key]['size'] = file_stat.st_size
+        return dict(sorted(entries.items(), key=lambda item: item[1]['last_used']))
+
+    def __save_index(self):
+        index_path = os.path.join(self.__cache_path, _INDEX_FILE_NAME)
+        tmp_index_path = f'{index_path}.tmp'
+        with open(tmp_index_path, 'w', encoding='UTF-8') as file_stream:
+            json.dump(self.__entries, file_stream)
+        os.replace(tmp_index_path, index_path)
+
+    def __get_block_file(self, key: str) -> str:
+        return os.path.join(self.__cache_path, f'{key}.{self.__file_format}')
+
+
+def __parse_args():
+    parser = ArgumentParser('features-cache')
+    parser.add_argument('--cache_path', required=True, help='Path to the features cache')
+    parser.add_argument('--file_format', default='parquet', choices=_FILE_FORMATS,
+                        help='Format of the cached blocks')
+    actions = parser.add_subparsers(dest='action', required=True)
+    actions.add_parser('info', help='Show the cached blocks')
+    purge_parser = actions.add_parser('purge', help='Remove the least recently used blocks')
+    purge_parser.add_argument('--max_size_mb', type=float, default=0,
+                              help='Size of the cache to keep in MB, 0 to remove all')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    cache_args = __parse_args()
+    features_cache = FeaturesCache(cache_args.cache_path, max_size_mb=np.inf,
+                                   file_format=cache_args.file_format)
+    if cache_args.action == 'info':
+        df_cache_info = features_cache.get_info()
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None,
+                               'display.width', 200):
+            print(df_cache_info)
+        print(f'Blocks: {df_cache_info.shape[0]}, size: {df_cache_info["size_mb"].sum():.2f} MB')
+    else:
+        print(f'Removed blocks: {features_cache.purge(cache_args.max_size_mb)}')
@@ -2,11 +2,10 @@
 """Module for features calculation using aggregation by
 rolling windows and Exponential Moving Average"""
 
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 import numpy as np
 import pandas as pd
-import datetime
 import re
 from progress.bar import Bar
 
@@ -15,6 +14,8 @@ from progress.bar import Bar
 
 warnings.filterwarnings('ignore')
 
+_DAY_NANOS = pd.Timedelta(days=1).value
+
 
 def percentile(n_percent):
     """
@@ -39,19 +40,52 @@ def fill_missing_dates(df_source, date_col):
     @return: Processed dataframe with fixed dates
     """
     min_date, max_date = df_source[date_col].min(), df_source[date_col].max()
-    groupby_day = df_source.groupby(pd.PeriodIndex(df_source[date_col], freq='D'))
+    groupby_day = df_source.drop(columns=[date_col]).groupby(
+        pd.PeriodIndex(df_source[date_col], freq='D'))
     results = groupby_day.sum(min_count=1)
 
-    idx = pd.period_range(min_date, max_date)
+    idx = pd.period_range(min_date, max_date, freq='D')
     results = results.reindex(idx, fill_value=np.nan)
-    if date_col in results.columns.values:
-        results.drop([date_col], axis=1, inplace=True)
 
+    results.index = results.index.to_timestamp()
     results.index.rename(date_col, inplace=True)
 
     return results
 
 
+def fill_missing_dates_groups(df_source: pd.DataFrame, group_col: [], date_col: str):
+    """
+    Add missing dates to all the groups at once. Gives the same result as fill_missing_dates
+    applied per group: every group gets all the dates from its first to its last date
+    @param df_source: Source dataframe with one row per group and date
+    @param group_col: Names of the columns for grouping, the last one is the date column
+    @param date_col: The name of the columns with dates
+    @return: Processed dataframe with fixed dates
+    """
+    days = __get_day_ordinals(df_source[date_col])
+    group_codes, _ = pd.MultiIndex.from_frame(df_source[group_col[:-1]]).factorize(sort=True)
+    # keys of the groups from the source rows to keep the types of the columns
+    df_groups = df_source[group_col[:-1]].iloc[
+        np.unique(group_codes, return_index=True)[1]].reset_index(drop=True)
+    value_cols = [col for col in df_source.columns.values if col not in group_col]
+
+    # one reindex of all the groups to all the dates, then dates out of the group range are cut
+    all_index = pd.MultiIndex.from_product(
+        [np.arange(df_groups.shape[0]), np.arange(days.min(), days.max() + 1)])
+    df_values = df_source[value_cols].set_index([group_codes, days]).reindex(all_index)
+    all_codes = all_index.codes[0]
+    all_days = all_index.get_level_values(1).to_numpy()
+    group_days = pd.Series(days).groupby(group_codes)
+    in_group_range = (all_days >= group_days.min().to_numpy()[all_codes]) \
+        & (all_days <= group_days.max().to_numpy()[all_codes])
+
+    results = df_groups.iloc[all_codes[in_group_range]].reset_index(drop=True)
+    results[date_col] = (all_days[in_group_range] * _DAY_NANOS).astype('datetime64[ns]')
+    for col in value_cols:
+        results[col] = df_values[col].to_numpy()[in_group_range]
+    return results
+
+
 def calc_preag_fill(df_source, group_col, date_col, target_cols, preagg_method):
     """
     Calculate aggregation functions for the columns from group_col list, except the first one.
@@ -67,9 +101,7 @@ def calc_preag_fill(df_source, group_col, date_col, target_cols, preagg_method):
         preagg_method)[target_cols].reset_index()
 
     # fill missing dates
-    data_preag_filled = data_preag.groupby(group_col[:-1]).apply(
-        fill_missing_dates, date_col=date_col).drop(group_col[:-1],
-                                                    axis=1).reset_index()
+    data_preag_filled = fill_missing_dates_groups(data_preag, group_col, date_col)
 
     # return DataFrame with calculated preaggregation and filled missing dates
     return data_preag_filled
@@ -86,19 +118,88 @@ def calc_rolling(data_preag_filled: pd.DataFrame, group_col: [], date_col: str,
     @param rolling_window: Rolling window
     @return: Dataframe with aggregates calculated on rolling window
     """
-    # calc rolling stats
-    if method_param is None:
-        lf_df_filled = data_preag_filled.groupby(group_col[:-1]). \
-            apply(lambda x: x.set_index(date_col).rolling(window=rolling_window, min_periods=1)
-                  .agg(method)).drop(group_col[:-1], axis=1)
-    else:
-        lf_df_filled = data_preag_filled.groupby(group_col[:-1]). \
-            apply(lambda x: x.set_index(date_col).rolling(window=rolling_window, min_periods=1)
-                  .agg(method(method_param))).drop(group_col[:-1], axis=1)
+    # percentiles are calculated for all the windows at once instead of the call per window
+    if method is percentile:
+        return calc_rolling_percentiles(data_preag_filled, group_col, date_col,
+                                        [method_param], rolling_window)[0]
+    return __calc_rolling_agg(data_preag_filled, group_col, date_col, method, rolling_window)
+
+
+def calc_rolling_percentiles(data_preag_filled: pd.DataFrame, group_col: [], date_col: str,
+                             percents: list, rolling_window) -> list[pd.DataFrame]:
+    """
+    Calculates several percentiles for rolling windows in one pass.
+    Gives the same values as rolling aggregation with percentile function
+    (Nan for windows with missing values)
+    @param data_preag_filled: Dataframe with aggregates
+    @param group_col: Names of the columns for grouping
+    @param date_col: Name of the date column
+    @param percents: Percentile percents for calculation
+    @param rolling_window: Rolling window
+    @return: List of dataframes with percentiles calculated on rolling window, one per percent
+    """
+    window_size = get_window_size(rolling_window)
+    if window_size is None:
+        return [__calc_rolling_agg(data_preag_filled, group_col, date_col,
+                                   percentile(n_percent), rolling_window)
+                for n_percent in percents]
+
+    # rows are ordered by groups as in grouped rolling, the filled data has a row per day,
+    # so the time window is the same number of the previous rows of the group
+    group_codes = data_preag_filled.groupby(group_col[:-1]).ngroup().to_numpy()
+    rows_order = np.argsort(group_codes, kind='stable')
+    group_codes = group_codes[rows_order]
+    group_starts = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1]])
+    group_ends = np.r_[group_starts[1:], group_codes.shape[0]]
+    row_positions = np.arange(group_codes.shape[0]) \
+        - np.repeat(group_starts, group_ends - group_starts)
+
+    df_ordered = data_preag_filled.iloc[rows_order].set_index(group_col)
+    value_cols = [col for col in df_ordered.columns.values if col not in group_col]
+    percentiles = np.full((len(percents), df_ordered.shape[0], len(value_cols)), np.nan)
+    for col_num, col in enumerate(value_cols):
+        values = df_ordered[col].to_numpy(dtype=np.float64)
+        # full windows
+        full_rows = np.flatnonzero(row_positions >= window_size - 1)
+        if full_rows.shape[0] > 0:
+            windows_values = np.lib.stride_tricks.sliding_window_view(values, window_size)
+            percentiles[:, full_rows, col_num] = np.percentile(
+                windows_values[full_rows - window_size + 1], percents, axis=1)
+        # the first rows of the groups with shorter windows
+        for window_len in range(1, window_size):
+            short_rows = np.flatnonzero(row_positions == window_len - 1)
+            if short_rows.shape[0] > 0:
+                windows_rows = short_rows[:, None] - np.arange(window_len - 1, -1, -1)
+                percentiles[:, short_rows, col_num] = np.percentile(
+                    values[windows_rows], percents, axis=1)
+
+    return [pd.DataFrame(percentiles[i], index=df_ordered.index, columns=value_cols)
+            for i in range(len(percents))]
+
+
+def __calc_rolling_agg(data_preag_filled: pd.DataFrame, group_col: [], date_col: str,
+                       method, rolling_window) -> pd.DataFrame:
+    # calc rolling stats for all the groups at once
+    lf_df_filled = __group_by_filter(data_preag_filled, group_col, date_col) \
+        .rolling(window=rolling_window, min_periods=1).agg(method)
     # return DataFrame with rolled columns from target_vars
     return lf_df_filled
 
 
+def get_window_size(rolling_window):
+    """
+    Returns the number of days in the rolling window
+    @param rolling_window: Rolling window, number of days or offset like '7D'
+    @return: Number of days or None if the window is not fixed number of days
+    """
+    if isinstance(rolling_window, (int, np.integer)):
+        return int(rolling_window)
+    offset = pd.tseries.frequencies.to_offset(rolling_window)
+    if isinstance(offset, pd.offsets.Tick) and offset.nanos % _DAY_NANOS == 0:
+        return offset.nanos // _DAY_NANOS
+    return None
+
+
 def calc_ewm(data_preag_filled: pd.DataFrame, group_col: [], date_col: str, span: float):
     """
     Calculates Exponential Moving Average for the data frame
@@ -108,13 +209,18 @@ def calc_ewm(data_preag_filled: pd.DataFrame, group_col: [], date_col: str, span
     @param span: Span value for Exponential Moving Average calculation
     @return: Dataframe with calculated Exponential Moving Average
     """
-    lf_df_filled = data_preag_filled.groupby(group_col[:-1]). \
-        apply(lambda x: x.set_index(date_col).ewm(span=span).mean()).drop(group_col[:-1], axis=1)
+    lf_df_filled = __group_by_filter(data_preag_filled, group_col, date_col) \
+        .ewm(span=span).mean()
 
     # return DataFrame with rolled columns from target_vars
     return lf_df_filled
 
 
+def __group_by_filter(data_preag_filled: pd.DataFrame, group_col: [], date_col: str):
+    value_cols = [col for col in data_preag_filled.columns.values if col not in group_col]
+    return data_preag_filled.set_index(date_col).groupby(group_col[:-1])[value_cols]
+
+
 def shift(lf_df_filled: pd.DataFrame, group_col: [], date_col: str, lag: int):
     """
     Shifts the dataframe by lag days
@@ -124,21 +230,32 @@ def shift(lf_df_filled: pd.DataFrame, group_col: [], date_col: str, lag: int):
     @param lag: Value of the lag to shift back
     @return: Shifted by lag days dataframe
     """
-    lf_df = lf_df_filled.apply(lambda x: x.shift(lag)).reset_index()
-    lf_df[date_col] = pd.to_datetime(lf_df[date_col].astype(str)).map(datetime.datetime.date)
+    lf_df = lf_df_filled.shift(lag).reset_index()
     return lf_df
 
 
-def __adjust_datetime_indices(data: pd.DataFrame, date_col: str) -> pd.DataFrame:
-    data = data.sort_values(date_col)
-    data_cl = deepcopy(data)
+def adjust_datetime_indices(data: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """
+    Sorts the data by dates and sets the dates without time and timezone as index
+    @param data: Dataframe with dates in the index or in the date column
+    @param date_col: Name of the date column
+    @return: Sorted dataframe with DateIndex
+    """
+    # sorting is the only copy of the data, dates are kept as datetime64 days
+    data_cl = data.sort_values(date_col)
     data_cl.reset_index(inplace=True)
-    data_cl[date_col] = data_cl[date_col].map(datetime.datetime.date)
+    dates = pd.DatetimeIndex(data_cl[date_col])
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    data_cl[date_col] = dates.normalize()
     data_cl.set_index(date_col, inplace=True)
-    data_cl.sort_values(date_col, inplace=True)
     return data_cl
 
 
+def __get_day_ordinals(dates) -> np.ndarray:
+    return pd.DatetimeIndex(dates).asi8 // _DAY_NANOS
+
+
 def get_agg_function(method: str):
     if method in ('mean', 'median'):
         return method, None
@@ -147,6 +264,96 @@ def get_agg_function(method: str):
         return percentile, int(value_params[0])
 
 
+def get_features_blocks(
+        target_cols: list,
+        id_cols: list,
+        lags: list,
+        windows: dict,
+        preagg_methods: list,
+        agg_methods: list,
+        dynamic_filters: list,
+        ewm_params: dict) -> list[dict]:
+    """
+    Returns the specs of the lag features blocks in the order of the generated columns.
+    A block is the lagged ewm or rolling aggregation of all the target columns
+    @param target_cols: Column names for lags calculation
+    @param id_cols: Key columns to identify unique values
+    @param lags: Lag values(days)
+    @param windows: Windows for each dynamic_filter
+    @param preagg_methods: Applied methods before rolling
+    @param agg_methods: Methods of rolling aggregation
+    @param dynamic_filters: Column names to use as filter
+    @param ewm_params: Span values(days) for each dynamic_filter
+    @return: List of dicts with filter, lag, preagg, ewm_span or window and method,
+    and the names of the block columns
+    """
+    key_str = f'key{"|".join(id_cols)}_' if len(id_cols) > 1 else ''
+    filter_count = len(dynamic_filters)
+    preagg_methods_count = len(preagg_methods)
+    blocks = []
+    for filter_col in dynamic_filters:
+        filter_col_str = f'filt{filter_col}' if filter_count > 1 else ''
+        for lag in lags:
+            for preagg in preagg_methods:
+                preagg_str = f'preag{preagg}_' if preagg_methods_count > 1 else ''
+                for alpha in ewm_params.get(filter_col, []):
+                    blocks.append(__get_block(
+                        target_cols, filter_col, lag, preagg,
+                        f'ewm{alpha}_{key_str}{preagg_str}{filter_col_str}', ewm_span=alpha))
+                for window in windows.get(filter_col, []):
+                    for method in agg_methods:
+                        blocks.append(__get_block(
+                            target_cols, filter_col, lag, preagg,
+                            f'win{window}_{key_str}{preagg_str}ag{method}_{filter_col_str}',
+                            window=window, method=method))
+    return blocks
+
+
+def plan_features_blocks(
+        required_columns: list,
+        target_cols: list,
+        id_cols: list,
+        lags: list,
+        windows: dict,
+        preagg_methods: list,
+        agg_methods: list,
+        dynamic_filters: list,
+        ewm_params: dict) -> tuple[list, list[dict]]:
+    """
+    Finds the lag features blocks required for the columns, e.g. for the best features list
+    or the inputs of the model, other blocks are not generated
+    @param required_columns: The names of the required columns, other names are ignored
+    @param target_cols: Column names for lags calculation
+    @param id_cols: Key columns to identify unique values
+    @param lags: Lag values(days)
+    @param windows: Windows for each dynamic_filter
+    @param preagg_methods: Applied methods before rolling
+    @param agg_methods: Methods of rolling aggregation
+    @param dynamic_filters: Column names to use as filter
+    @param ewm_params: Span values(days) for each dynamic_filter
+    @return: The required target columns and the specs of the blocks with the required columns
+    """
+    required_columns = set(required_columns)
+    blocks = get_features_blocks(target_cols, id_cols, lags, windows, preagg_methods,
+                                 agg_methods, dynamic_filters, ewm_params)
+    # the names of the blocks do not depend on the target columns, so targets are pruned first
+    required_targets = [target_col for target_num, target_col in enumerate(target_cols)
+                        if any(block['columns'][target_num] in required_columns
+                               for block in blocks)]
+    blocks = [block for block in get_features_blocks(required_targets, id_cols, lags, windows,
+                                                      preagg_methods, agg_methods,
+                                                      dynamic_filters, ewm_params)
+              if required_columns.intersection(block['columns'])]
+    return required_targets, blocks
+
+
+def __get_block(target_cols: list, filter_col: str, lag: int, preagg: str, name_suffix: str,
+                ewm_span=None, window=None, method: str = None) -> dict:
+    return {'filter': filter_col, 'lag': lag, 'preagg': preagg,
+            'ewm_span': ewm_span, 'window': window, 'method': method,
+            'columns': [f'{x}_lag{lag}d_{name_suffix}' for x in target_cols]}
+
+
 def generate_lagged_features(
         data: pd.DataFrame,
         target_cols: list,
@@ -157,7 +364,10 @@ def generate_lagged_features(
         preagg_methods: list,
         agg_methods: list,
         dynamic_filters: list,
-        ewm_params: dict) -> pd.DataFrame:
+        ewm_params: dict,
+        workers_count: int = 1,
+        features_cache=None,
+        required_columns: list = None) -> pd.DataFrame:
     """
     data - dataframe with default index
     target_cols - column names for lags calculation
@@ -171,63 +381,267 @@ def generate_lagged_features(
     agg_methods - method of aggregation('mean', 'median', percentile, etc.)
     dynamic_filters - column names to use as filter
     ewm_params - span values(days) for each dynamic_filter
+    workers_count - number of processes to generate features for dynamic filters in parallel
+    features_cache - FeaturesCache to load the blocks generated before and to save the new ones
+    required_columns - names of the required features (e.g. the best features list),
+        only the blocks with them are generated
     """
+    data_adj = adjust_datetime_indices(data, date_col)
+    if required_columns is None:
+        blocks = get_features_blocks(target_cols, id_cols, lags, windows, preagg_methods,
+                                     agg_methods, dynamic_filters, ewm_params)
+    else:
+        target_cols, blocks = plan_features_blocks(required_columns, target_cols, id_cols, lags,
+                                                   windows, preagg_methods, agg_methods,
+                                                   dynamic_filters, ewm_params)
+    data_features = __generate_blocks(data_adj, target_cols, id_cols, date_col, blocks,
+                                      workers_count, features_cache)
+    return pd.concat([data_adj, data_features], axis=1)
 
-    data_adj = __adjust_datetime_indices(data, date_col)
-    data_gen = deepcopy(data_adj)
-
-    total = len(dynamic_filters) * len(lags) * len(preagg_methods) \
-            * (len(ewm_params) + len(windows) * len(agg_methods))
-    # progress = IntProgress(min=0, max=total)
-    # display(progress)
-
-    preagg_methods_count = len(preagg_methods)
-    filter_count = len(dynamic_filters)
-    key_str = f'key{"|".join(id_cols)}_' if len(id_cols) > 1 else ''
 
+def generate_lagged_features_blocks(
+        data: pd.DataFrame,
+        target_cols: list,
+        id_cols: list,
+        date_col: str,
+        blocks: list[dict],
+        workers_count: int = 1,
+        features_cache=None) -> pd.DataFrame:
+    """
+    Generates only the given lag features blocks
+    @param data: Dataframe with default index
+    @param target_cols: Column names for lags calculation
+    @param id_cols: Key columns to identify unique values
+    @param date_col: Column with datetime format values
+    @param blocks: Specs of the blocks from get_features_blocks
+    @param workers_count: Number of processes to generate features for dynamic filters in parallel
+    @param features_cache: FeaturesCache to load the blocks generated before and to save the new ones
+    @return: Dataframe with the columns of the blocks and DateIndex sorted like in
+    generate_lagged_features
+    """
+    data_adj = adjust_datetime_indices(data, date_col)
+    return __generate_blocks(data_adj, target_cols, id_cols, date_col, blocks,
+                             workers_count, features_cache)
+
+
+def __generate_blocks(data_adj: pd.DataFrame, target_cols: list, id_cols: list, date_col: str,
+                      blocks: list[dict], workers_count: int, features_cache) -> pd.DataFrame:
+    # without the cache a block is one segment of all the rows, with the cache the segments
+    # are loaded by the keys of their inputs and the missing ones are generated from the rows
+    # of their lookback, i.e. only the last segments after the appended days
+    segments = features_cache.get_segments(data_adj.index) if features_cache is not None \
+        else [(0, data_adj.shape[0])]
+    days = __get_day_ordinals(data_adj.index)
+    blocks_keys = None
+    blocks_segments = [[None] * len(segments) for _ in blocks]
+    if features_cache is not None:
+        blocks_keys = __get_blocks_keys(data_adj, target_cols, id_cols, blocks, segments, days,
+                                        features_cache)
+        blocks_segments = [[features_cache.load_block(key) for key in keys]
+                           for keys in blocks_keys]
+
+    # features blocks of the filters do not depend on each other, in parallel mode workers get
+    # only the columns and the rows required for the filter, blocks are assembled
+    # in the order of the specs
+    filters_indices = {}
+    filters_starts = {}
+    for i, block in enumerate(blocks):
+        missing = [num for num, values in enumerate(blocks_segments[i]) if values is None]
+        if missing:
+            filters_indices.setdefault(block['filter'], []).append(i)
+            filters_starts[block['filter']] = min(
+                filters_starts.get(block['filter'], data_adj.shape[0]),
+                __get_input_start(days, segments[missing[0]][0], __get_block_lookback(block)))
+    filters_args = [{'data_filter': data_adj[__get_filter_columns(filter_col, id_cols, target_cols)]
+                     .iloc[filters_starts[filter_col]:],
+                     'target_cols': target_cols,
+                     'id_cols': id_cols,
+                     'date_col': date_col,
+                     'filter_col': filter_col,
+                     'blocks': [blocks[i] for i in indices]}
+                    for filter_col, indices in filters_indices.items()]
+
+    total = sum(len(__get_filled_keys(filter_args['blocks'])) for filter_args in filters_args)
+    filter_count = len(filters_args)
+    filters_values = []
     with Bar(f'Lags features for [{", ".join(target_cols)}] generation ...', max=total) as bar:
-        for filter_col in dynamic_filters:
-            group_col = [filter_col] + id_cols + [date_col]
-            for lag in lags:
-                for preagg in preagg_methods:
-                    preagg_str = f'preag{preagg}_' if preagg_methods_count > 1 else ''
-                    filter_col_str = f'filt{filter_col}' if filter_count > 1 else ''
-
-                    data_preag_filled = calc_preag_fill(data_adj, group_col, date_col, target_cols, preagg)
-                    # add ewm features
-                    for alpha in ewm_params.get(filter_col, []):
-                        ewm_filled = calc_ewm(data_preag_filled, group_col, date_col, alpha)
-                        ewm = shift(ewm_filled, group_col, date_col, lag)
-                        new_names = \
-                            {x: f"{x}_lag{lag}d_ewm{alpha}_{key_str}{preagg_str}{filter_col_str}"
-                             for x in target_cols}
-                        data_gen = pd.merge(data_gen, ewm.rename(columns=new_names),
-                                            how='left', on=group_col)
-                        bar.next()
-                        # progress.value += 1
-
-                    # add rolling features
-                    for window in windows.get(filter_col, []):
-                        for method in agg_methods:
-                            method_func, method_param = get_agg_function(method)
-                            rolling_filled = calc_rolling(data_preag_filled, group_col,
-                                                          date_col, method_func, method_param, window)
-
-                            rolling = shift(rolling_filled, group_col, date_col, lag)
-                            # pylint: disable=E1101,C0123
-                            method_name = method.__name__ if type(method) != str else method
-                            # method_name = method.__name__ if method.isinstance(str) else method
-
-                            new_name = f"lag{lag}d_win{window}_{key_str}"
-                            new_name += f"{preagg_str}ag{method_name}_{filter_col_str}"
-                            new_names = {x: f"{x}_{new_name}" for x in target_cols}
-
-                            data_gen = pd.merge(data_gen, rolling.rename(columns=new_names),
-                                                how='left', on=group_col)
-                            bar.next()
-                            # progress.value += 1
-
-    data_gen.reset_index(inplace=True, drop=True)
-    data_gen[date_col] = pd.DatetimeIndex(data_gen[date_col])
-    data_gen.set_index(date_col, inplace=True, drop=True)
-    return data_gen
+        if workers_count > 1 and filter_count > 1:
+            with ProcessPoolExecutor(max_workers=min(workers_count, filter_count)) as executor:
+                futures = [executor.submit(__generate_filter_features, **filter_args)
+                           for filter_args in filters_args]
+                for future in futures:
+                    filters_values.append(future.result())
+                    bar.next(filters_values[-1][1])
+        else:
+            for filter_args in filters_args:
+                filters_values.append(__generate_filter_features(**filter_args, bar=bar))
+
+    for (filter_col, indices), (values, _) in zip(filters_indices.items(), filters_values):
+        rows_start = filters_starts[filter_col]
+        for i, block_values in zip(indices, values):
+            for num, (start, end) in enumerate(segments):
+                if blocks_segments[i][num] is not None:
+                    continue
+                blocks_segments[i][num] = block_values[start - rows_start:end - rows_start]
+                if features_cache is not None:
+                    features_cache.save_block(blocks_keys[i][num], blocks_segments[i][num],
+                                              blocks[i]['columns'],
+                                              spec=__get_segment_block(blocks[i], data_adj.index,
+                                                                       start, end))
+    if features_cache is not None:
+        # the eviction and the index of the cache once per generation, not per saved block
+        features_cache.flush()
+
+    features_names = [name for block in blocks for name in block['columns']]
+    blocks_values = [np.vstack(block_segments) if block_segments
+                     else np.empty((0, len(blocks[i]['columns'])))
+                     for i, block_segments in enumerate(blocks_segments)]
+    return pd.DataFrame(np.hstack(blocks_values) if blocks_values else None,
+                        index=data_adj.index, columns=features_names)
+
+
+def __get_blocks_keys(data_adj: pd.DataFrame, target_cols: list, id_cols: list,
+                      blocks: list[dict], segments: list[tuple[int, int]], days: np.ndarray,
+                      features_cache) -> list[list[str]]:
+    # the key of the segment is the hash of the rows it depends on, the rows are hashed once
+    # per filter and the hashes of the ranges are shared by the blocks with the same lookback
+    filters_data = {}
+    inputs_hashes = {}
+    blocks_keys = []
+    for block in blocks:
+        filter_col = block['filter']
+        if filter_col not in filters_data:
+            data_filter = data_adj[__get_filter_columns(filter_col, id_cols, target_cols)]
+            filters_data[filter_col] = (data_filter, features_cache.get_rows_hashes(data_filter))
+        data_filter, rows_hashes = filters_data[filter_col]
+        lookback = __get_block_lookback(block)
+        keys = []
+        for start, end in segments:
+            input_start = __get_input_start(days, start, lookback)
+            if (filter_col, input_start, end) not in inputs_hashes:
+                inputs_hashes[(filter_col, input_start, end)] = features_cache.get_input_hash(
+                    data_filter.iloc[input_start:end], rows_hashes[input_start:end])
+            keys.append(features_cache.get_block_key(
+                inputs_hashes[(filter_col, input_start, end)],
+                __get_segment_block(block, data_adj.index, start, end), target_cols, id_cols))
+        blocks_keys.append(keys)
+    return blocks_keys
+
+
+def __get_segment_block(block: dict, dates: pd.DatetimeIndex, start: int, end: int) -> dict:
+    return {**block, 'segment': [dates[start].strftime('%Y-%m-%d'),
+                                 dates[end - 1].strftime('%Y-%m-%d')]}
+
+
+def __get_block_lookback(block: dict) -> int | None:
+    # days before the row the lagged value depends on, None - all the previous days (ewm)
+    if block['ewm_span'] is not None:
+        return None
+    window_size = get_window_size(block['window'])
+    return None if window_size is None else block['lag'] + window_size
+
+
+def __get_input_start(days: np.ndarray, start: int, lookback: int | None) -> int:
+    # the first row of the input required for the rows from start
+    if lookback is None:
+        return 0
+    return int(np.searchsorted(days, days[start] - lookback, side='left'))
+
+
+def __get_filled_key(block: dict) -> tuple:
+    # the pre-aggregation with the ewm or rolling result the block is lagged from
+    if block['ewm_span'] is not None:
+        return block['preagg'], ('ewm', block['ewm_span'])
+    return block['preagg'], ('win', block['window'], block['method'])
+
+
+def __get_filled_keys(blocks: list[dict]) -> list[tuple]:
+    return list(dict.fromkeys(__get_filled_key(block) for block in blocks))
+
+
+def __generate_filter_features(data_filter: pd.DataFrame, target_cols: list, id_cols: list,
+                               date_col: str, filter_col: str, blocks: list[dict],
+                               bar: Bar = None):
+    # every (filter, preagg) pre-aggregation and every rolling or ewm result is calculated once,
+    # lags are taken from them by positions
+    group_col = [filter_col] + id_cols + [date_col]
+    filled_keys = __get_filled_keys(blocks)
+
+    values_filled = {}
+    preags_positions = {}
+    for preagg in dict.fromkeys(preagg for preagg, _ in filled_keys):
+        data_preag_filled = calc_preag_fill(data_filter, group_col, date_col,
+                                            target_cols, preagg)
+        preags_positions[preagg] = (
+            __get_preag_positions(data_filter, data_preag_filled, group_col),
+            __get_group_offsets(data_preag_filled, group_col))
+        preagg_keys = [key for key_preagg, key in filled_keys if key_preagg == preagg]
+
+        # ewm features
+        for key in preagg_keys:
+            if key[0] == 'ewm':
+                ewm_filled = calc_ewm(data_preag_filled, group_col, date_col, key[1])
+                values_filled[(preagg, key)] = ewm_filled[target_cols].to_numpy(dtype=np.float64)
+                if bar is not None:
+                    bar.next()
+
+        # rolling features, all the percentiles of the window are calculated at once
+        for window in dict.fromkeys(key[1] for key in preagg_keys if key[0] == 'win'):
+            agg_methods = [key[2] for key in preagg_keys if key[0] == 'win' and key[1] == window]
+            percents = [method_param for method_func, method_param
+                        in map(get_agg_function, agg_methods) if method_func is percentile]
+            percentiles_filled = dict(zip(percents, calc_rolling_percentiles(
+                data_preag_filled, group_col, date_col, percents, window))) \
+                if percents else {}
+            for method in agg_methods:
+                method_func, method_param = get_agg_function(method)
+                if method_func is percentile:
+                    rolling_filled = percentiles_filled[method_param]
+                else:
+                    rolling_filled = calc_rolling(data_preag_filled, group_col, date_col,
+                                                  method_func, method_param, window)
+                values_filled[(preagg, ('win', window, method))] = \
+                    rolling_filled[target_cols].to_numpy(dtype=np.float64)
+                if bar is not None:
+                    bar.next()
+
+    features_values = [__shift_by_positions(values_filled[__get_filled_key(block)],
+                                            *preags_positions[block['preagg']], block['lag'])
+                       for block in blocks]
+    return features_values, len(filled_keys)
+
+
+def __get_filter_columns(filter_col: str, id_cols: list, target_cols: list) -> list:
+    return list(dict.fromkeys([filter_col] + id_cols + target_cols))
+
+
+def __get_preag_positions(data_adj: pd.DataFrame, data_preag_filled: pd.DataFrame,
+                          group_col: []) -> np.ndarray:
+    # positions of the data rows in the pre-aggregation (-1 for missing), joined on day ordinals
+    preag_keys = pd.MultiIndex.from_arrays(
+        [data_preag_filled[col] for col in group_col[:-1]]
+        + [__get_day_ordinals(data_preag_filled[group_col[-1]])])
+    data_keys = pd.MultiIndex.from_arrays(
+        [data_adj[col] for col in group_col[:-1]] + [__get_day_ordinals(data_adj.index)])
+    return preag_keys.get_indexer(data_keys)
+
+
+def __get_group_offsets(data_preag_filled: pd.DataFrame, group_col: []) -> np.ndarray:
+    # days from the first day of the group for the rows of the pre-aggregation,
+    # the rows of a group are consecutive days
+    group_codes, _ = pd.MultiIndex.from_frame(data_preag_filled[group_col[:-1]]).factorize()
+    rows = np.arange(group_codes.shape[0])
+    is_group_start = np.ones(group_codes.shape[0], dtype=bool)
+    is_group_start[1:] = group_codes[1:] != group_codes[:-1]
+    return rows - np.maximum.accumulate(np.where(is_group_start, rows, 0))
+
+
+def __shift_by_positions(values_filled: np.ndarray, preag_positions: np.ndarray,
+                         group_offsets: np.ndarray, lag: int) -> np.ndarray:
+    # the same as shift of the pre-aggregation by lag within the group and merge to the data rows,
+    # the first lag days of the group have no values (the lags are not taken from another group)
+    shifted_positions = preag_positions - lag
+    is_valid = (preag_positions >= 0) & (group_offsets[preag_positions] >= lag)
+    values = np.full((preag_positions.shape[0], values_filled.shape[1]), np.nan)
+    values[is_valid] = values_filled[shifted_positions[is_valid]]
+    return values
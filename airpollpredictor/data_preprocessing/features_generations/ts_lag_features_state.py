@@ -0,0 +1,306 @@
+# pylint: disable=E0401, R0913, R0914
+"""Module for online calculation of the lag features for the appended days.
+Keeps rolling windows buffers and Exponential Moving Average accumulators
+per filter group and gives the same features as ts_lag_features_generator"""
+
+import json
+import numpy as np
+import pandas as pd
+from . import ts_lag_features_generator as lag_gen
+
+_DAY_NANOS = pd.Timedelta(days=1).value
+
+
+class LagFeaturesState:
+    """
+    Online state of the lag features blocks.
+    update accepts the new daily rows and returns only their features, every day of a filter
+    group is processed in O(window) time. The features are the same as generated
+    by ts_lag_features_generator for the whole data.
+    The state is saved to json between the runs
+    """
+
+    def __init__(self, target_cols: list, id_cols: list, date_col: str, blocks: list[dict]):
+        """
+        @param target_cols: Column names for lags calculation
+        @param id_cols: Key columns to identify unique values
+        @param date_col: Column with datetime format values
+        @param blocks: Specs of the blocks from ts_lag_features_generator.get_features_blocks,
+        windows must be fixed number of days, methods are mean, median and percentiles
+        """
+        for block in blocks:
+            if block['window'] is not None:
+                if lag_gen.get_window_size(block['window']) is None:
+                    raise ValueError(f'Window {block["window"]} is not fixed number of days')
+                if lag_gen.get_agg_function(block['method']) is None:
+                    raise ValueError(f'Unknown aggregation method {block["method"]}')
+        self.__target_cols = target_cols
+        self.__id_cols = id_cols
+        self.__date_col = date_col
+        self.__blocks = blocks
+        self.__groups = {}
+
+    @classmethod
+    def from_params(cls, target_cols: list, id_cols: list, date_col: str, lags: list,
+                    windows: dict, preagg_methods: list, agg_methods: list,
+                    dynamic_filters: list, ewm_params: dict):
+        """
+        Creates the empty state for the params of ts_lag_features_generator.generate_lagged_features
+        """
+        return cls(target_cols, id_cols, date_col,
+                   lag_gen.get_features_blocks(target_cols, id_cols, lags, windows,
+                                               preagg_methods, agg_methods, dynamic_filters,
+                                               ewm_params))
+
+    @property
+    def features_names(self) -> list:
+        """
+        The names of the generated features
+        """
+        return [name for block in self.__blocks for name in block['columns']]
+
+    @property
+    def last_date(self) -> pd.Timestamp | None:
+        """
+        The last added day of all the groups, None for the empty state
+        """
+        days = [group_state.last_day for groups in self.__groups.values()
+                for group_state in groups.values()]
+        return pd.Timestamp(max(days) * _DAY_NANOS) if days else None
+
+    def update(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds the new days to the state and calculates their features.
+        The days of every filter group must be later than the days added before
+        @param data: Dataframe with the new rows, the dates in the index or in date_col
+        @return: Dataframe with the features of the new rows and DateIndex sorted like in
+        ts_lag_features_generator.generate_lagged_features
+        """
+        data_adj = lag_gen.adjust_datetime_indices(data, self.__date_col)
+        features_values = np.full((data_adj.shape[0], len(self.features_names)), np.nan)
+        target_count = len(self.__target_cols)
+        for (filter_col, preagg), blocks_nums in self.__get_filters_preaggs().items():
+            group_col = [filter_col] + self.__id_cols + [self.__date_col]
+            data_preag = data_adj[list(dict.fromkeys(group_col[:-1] + self.__target_cols))] \
+                .reset_index().groupby(group_col).agg(preagg)[self.__target_cols].reset_index()
+            preag_days = pd.DatetimeIndex(data_preag[self.__date_col]).asi8 // _DAY_NANOS
+            preag_values = data_preag[self.__target_cols].to_numpy(dtype=np.float64)
+            preag_keys = list(zip(*[data_preag[col].tolist() for col in group_col[:-1]]))
+
+            stats_specs = list(dict.fromkeys(self.__get_stat_spec(self.__blocks[block_num])
+                                             for block_num in blocks_nums))
+            lags = [self.__blocks[block_num]['lag'] for block_num in blocks_nums]
+            stats_nums = [stats_specs.index(self.__get_stat_spec(self.__blocks[block_num]))
+                          for block_num in blocks_nums]
+            groups = self.__groups.setdefault((filter_col, preagg), {})
+
+            # groupby rows are ordered by the groups and the dates
+            preag_features = np.full((data_preag.shape[0], len(blocks_nums) * target_count),
+                                     np.nan)
+            for row_num, (group_key, day) in enumerate(zip(preag_keys, preag_days)):
+                if group_key not in groups:
+                    groups[group_key] = _GroupState(stats_specs, max(lags), target_count)
+                group_state = groups[group_key]
+                group_state.advance(int(day), preag_values[row_num])
+                for num, (lag, stat_num) in enumerate(zip(lags, stats_nums)):
+                    preag_features[row_num, num * target_count:(num + 1) * target_count] = \
+                        group_state.get_stat(stat_num, lag)
+
+            preag_positions = pd.MultiIndex.from_arrays(
+                [data_preag[col] for col in group_col[:-1]] + [preag_days]).get_indexer(
+                pd.MultiIndex.from_arrays([data_adj[col] for col in group_col[:-1]]
+                                          + [data_adj.index.asi8 // _DAY_NANOS]))
+            for num, block_num in enumerate(blocks_nums):
+                features_values[:, block_num * target_count:(block_num + 1) * target_count] = \
+                    preag_features[preag_positions, num * target_count:(num + 1) * target_count]
+        return pd.DataFrame(features_values, index=data_adj.index, columns=self.features_names)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the json serializable state
+        """
+        return {'target_cols': self.__target_cols,
+                'id_cols': self.__id_cols,
+                'date_col': self.__date_col,
+                'blocks': self.__blocks,
+                'groups': [{'filter': filter_col, 'preagg': preagg, 'key': list(group_key),
+                            **group_state.to_dict()}
+                           for (filter_col, preagg), groups in self.__groups.items()
+                           for group_key, group_state in groups.items()]}
+
+    @classmethod
+    def from_dict(cls, state_dict: dict):
+        """
+        Restores the state from to_dict result
+        """
+        state = cls(state_dict['target_cols'], state_dict['id_cols'], state_dict['date_col'],
+                    state_dict['blocks'])
+        filters_preaggs = state.__get_filters_preaggs()
+        for group_dict in state_dict['groups']:
+            blocks_nums = filters_preaggs[(group_dict['filter'], group_dict['preagg'])]
+            stats_specs = list(dict.fromkeys(state.__get_stat_spec(state.__blocks[block_num])
+                                             for block_num in blocks_nums))
+            max_lag = max(state.__blocks[block_num]['lag'] for block_num in blocks_nums)
+            state.__groups.setdefault((group_dict['filter'], group_dict['preagg']), {})[
+                tuple(group_dict['key'])] = _GroupState.from_dict(
+                group_dict, stats_specs, max_lag, len(state.__target_cols))
+        return state
+
+    def save(self, file_path: str):
+        """
+        Saves the state to json file
+        @param file_path: Path to the file
+        """
+        with open(file_path, 'w', encoding='UTF-8') as file_stream:
+            json.dump(self.to_dict(), file_stream)
+
+    @classmethod
+    def load(cls, file_path: str):
+        """
+        Loads the state from json file
+        @param file_path: Path to the file
+        """
+        with open(file_path, 'r', encoding='UTF-8') as file_stream:
+            return cls.from_dict(json.load(file_stream))
+
+    def __get_filters_preaggs(self) -> dict:
+        filters_preaggs = {}
+        for block_num, block in enumerate(self.__blocks):
+            filters_preaggs.setdefault((block['filter'], block['preagg']), []).append(block_num)
+        return filters_preaggs
+
+    @staticmethod
+    def __get_stat_spec(block: dict) -> tuple:
+        if block['ewm_span'] is not None:
+            return 'ewm', block['ewm_span']
+        return 'win', block['window'], block['method']
+
+
+class _GroupState:
+    """
+    Buffers of the pre-aggregated values and accumulators of a filter group
+    """
+
+    def __init__(self, stats_specs: list, max_lag: int, target_count: int):
+        self.__stats_specs = stats_specs
+        self.__max_lag = max_lag
+        self.__windows_sizes = [lag_gen.get_window_size(spec[1]) if spec[0] == 'win' else None
+                                for spec in stats_specs]
+        self.__max_window_size = max([size for size in self.__windows_sizes if size is not None],
+                                     default=1)
+        self.__ewm_nums = [stat_num for stat_num, spec in enumerate(stats_specs)
+                           if spec[0] == 'ewm']
+        # stats of a window are calculated together: mean, median, percentiles at once
+        self.__windows_stats = {}
+        for stat_num, spec in enumerate(stats_specs):
+            if spec[0] != 'win':
+                continue
+            window_stats = self.__windows_stats.setdefault(self.__windows_sizes[stat_num],
+                                                           ([], [], [], []))
+            method_func, method_param = lag_gen.get_agg_function(spec[2])
+            if method_func is lag_gen.percentile:
+                window_stats[2].append(method_param)
+                window_stats[3].append(stat_num)
+            else:
+                window_stats[0 if method_func == 'mean' else 1].append(stat_num)
+        # pandas ewm with adjust=True and ignore_na=False is calculated by the same steps
+        self.__ewm_factors = [1. - 1. / (1. + (spec[1] - 1) / 2.) if spec[0] == 'ewm' else None
+                              for spec in stats_specs]
+        self.last_day = None
+        self.values = np.empty((0, target_count))
+        self.ewm_weighted = np.full((len(stats_specs), target_count), np.nan)
+        self.ewm_old_weights = np.ones((len(stats_specs), target_count))
+        # stats of the last max_lag + 1 days, the last one is last_day
+        self.stats = np.empty((0, len(stats_specs), target_count))
+
+    def advance(self, day: int, day_values: np.ndarray):
+        """
+        Adds the day to the group, the missing days before it are added with NaN values
+        """
+        if self.last_day is not None and day <= self.last_day:
+            raise ValueError(f'Day {day} is already added to the group')
+        first_day = day if self.last_day is None else self.last_day + 1
+        missing_values = np.full(day_values.shape, np.nan)
+        for cur_day in range(first_day, day + 1):
+            cur_values = day_values if cur_day == day else missing_values
+            self.values = np.vstack([self.values, cur_values])[-self.__max_window_size:]
+            self.__update_ewm(cur_values)
+            # stats of the days older than the max lag are never used
+            if cur_day >= day - self.__max_lag:
+                self.stats = np.concatenate([self.stats, self.__calc_stats()[None]])[
+                    -(self.__max_lag + 1):]
+        self.last_day = day
+
+    def get_stat(self, stat_num: int, lag: int) -> np.ndarray:
+        """
+        Returns the stat of the day lag days before the last day
+        """
+        if lag >= self.stats.shape[0]:
+            return np.full(self.stats.shape[2], np.nan)
+        return self.stats[-1 - lag, stat_num]
+
+    def to_dict(self) -> dict:
+        """
+        Returns the json serializable state of the group
+        """
+        return {'last_day': self.last_day,
+                'values': self.values.tolist(),
+                'ewm_weighted': self.ewm_weighted.tolist(),
+                'ewm_old_weights': self.ewm_old_weights.tolist(),
+                'stats': self.stats.tolist()}
+
+    @classmethod
+    def from_dict(cls, group_dict: dict, stats_specs: list, max_lag: int, target_count: int):
+        """
+        Restores the state of the group from to_dict result
+        """
+        group_state = cls(stats_specs, max_lag, target_count)
+        group_state.last_day = group_dict['last_day']
+        group_state.values = np.array(group_dict['values'],
+                                      dtype=np.float64).reshape(-1, target_count)
+        group_state.ewm_weighted = np.array(group_dict['ewm_weighted'], dtype=np.float64)
+        group_state.ewm_old_weights = np.array(group_dict['ewm_old_weights'], dtype=np.float64)
+        group_state.stats = np.array(group_dict['stats'], dtype=np.float64) \
+            .reshape(-1, len(stats_specs), target_count)
+        return group_state
+
+    def __update_ewm(self, cur_values: np.ndarray):
+        is_observation = ~np.isnan(cur_values)
+        for stat_num, factor in enumerate(self.__ewm_factors):
+            if factor is None:
+                continue
+            weighted = self.ewm_weighted[stat_num]
+            old_weights = self.ewm_old_weights[stat_num]
+            is_started = ~np.isnan(weighted)
+            old_weights[is_started] *= factor
+            is_changed = is_started & is_observation & (weighted != cur_values)
+            weighted[is_changed] = (old_weights[is_changed] * weighted[is_changed]
+                                    + cur_values[is_changed]) / (old_weights[is_changed] + 1.)
+            old_weights[is_started & is_observation] += 1.
+            is_first = ~is_started & is_observation
+            weighted[is_first] = cur_values[is_first]
+
+    def __calc_stats(self) -> np.ndarray:
+        stats = np.full(self.ewm_weighted.shape, np.nan)
+        for stat_num in self.__ewm_nums:
+            stats[stat_num] = self.ewm_weighted[stat_num]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for window_size, (mean_nums, median_nums, percents, percent_nums) \
+                    in self.__windows_stats.items():
+                window_values = self.values[-window_size:]
+                counts = (~np.isnan(window_values)).sum(axis=0)
+                if mean_nums:
+                    stats[mean_nums] = np.nansum(window_values, axis=0) / counts
+                if median_nums:
+                    # NaN values are sorted to the end, the median of the first counts values
+                    values_sorted = np.sort(window_values, axis=0)
+                    columns = np.arange(values_sorted.shape[1])
+                    middle_low = np.maximum(counts - 1, 0) // 2
+                    stats[median_nums] = np.where(
+                        counts > 0, (values_sorted[middle_low, columns]
+                                     + values_sorted[counts // 2 - (counts == 0), columns]) / 2,
+                        np.nan)
+                if percents:
+                    # like the rolling percentile, a window with missing values gives NaN
+                    stats[percent_nums] = np.percentile(window_values, percents, axis=0)
+        return stats
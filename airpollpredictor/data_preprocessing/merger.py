@@ -8,6 +8,7 @@ import os
 import pandas as pd
 from settings import settings
 from data_preprocessing.features_generations import ts_date_features_generator as date_gen
+from data_preprocessing import csv_files_reader, dataset_io, dtypes_schema
 
 
 def read_and_merge_prev_and_cur(pollutants_codes: [int],
@@ -30,8 +31,7 @@ def read_and_merge_prev_and_cur(pollutants_codes: [int],
     df_list_prev = []
     for i in range(len(pollutants_codes)):
         path = os.path.join(source_data_path_prev, f'{str(pollutants_codes[i])}.csv')
-        df_list_prev.append(pd.read_csv(
-            path, parse_dates=True, index_col=settings.DATE_COLUMN_NAME))
+        df_list_prev.append(dataset_io.read_dataset(path))
 
     if not source_data_path_cur:
         return df_list_prev
@@ -40,9 +40,7 @@ def read_and_merge_prev_and_cur(pollutants_codes: [int],
     df_list_all = []
     for i in range(len(pollutants_codes)):
         path = os.path.join(source_data_path_cur, f'{str(pollutants_codes[i])}.csv')
-        df_cur = pd.read_csv(path,
-                             parse_dates=True,
-                             index_col=settings.DATE_COLUMN_NAME)
+        df_cur = dataset_io.read_dataset(path)
         df_f = pd.concat([df_list_prev[i], df_cur])
         df_f.reset_index(inplace=True)
         df_f.set_index(settings.DATE_COLUMN_NAME, inplace=True)
@@ -67,19 +65,21 @@ def cut_dataset_from_date(pollutants_codes: [int],
         df_list[i].sort_index(inplace=True)
 
 
-def merge_dataframes_per_pollutant(source_data_path: str, pollutants_codes: [int]):
+def merge_dataframes_per_pollutant(source_data_path: str, pollutants_codes: [int],
+                                   workers_count: int = 1):
     """
     Merges files for pollutants (mergers all years to one file for every pollutant)
     @param source_data_path: The path to the source pollutant data
     @param pollutants_codes: The list of pollutant codes
+    @param workers_count: The number of threads to parse the files in parallel
     @return: List of dataframes with merged for every pollutant data
     """
     df_list = []
+    dtypes = dtypes_schema.get_pol_dtypes(settings.POL_USE_COLUMNS)
     for pol_id in pollutants_codes:
-        print("FFFFF")
-        print(settings.POL_USE_COLUMNS)
-        df_pol = pd.concat(map(lambda p: pd.read_csv(p, usecols=settings.POL_USE_COLUMNS),
-                               glob.glob(os.path.join(source_data_path, str(pol_id), "*.csv"))))
+        df_pol = csv_files_reader.read_csv_files(
+            glob.glob(os.path.join(source_data_path, str(pol_id), "*.csv")),
+            workers_count=workers_count, usecols=settings.POL_USE_COLUMNS, dtype=dtypes)
         # print(f'Pollutant: {settings.POL_NAMES[pol_id] :10} Lines count: {df.shape[0]}')
         df_list.append(df_pol)
     return df_list
@@ -108,7 +108,7 @@ def save_datasets_per_pollutant(pollutants_codes: list[int],
     # pylint: disable=C0200
     for i in range(len(pollutants_codes)):
         file_path = os.path.join(output_path, f'{pollutants_codes[i]}.csv')
-        df_list[i].to_csv(file_path)
+        dataset_io.write_dataset(df_list[i], file_path)
 
 
 def __merge_column_by_index(pollutant_id: int, df_gen: pd.DataFrame, df_to_merge: pd.DataFrame,
@@ -138,8 +138,8 @@ def __read_and_merge_pollutants(
                             inclusive="both", name=settings.DATE_COLUMN_NAME))
 
     for pollutant_id in pollutants_codes:
-        df_pollutant = pd.read_csv(os.path.join(source_data_path, f'{pollutant_id}.csv'),
-                                   parse_dates=True, index_col=settings.DATE_COLUMN_NAME)
+        df_pollutant = dataset_io.read_dataset(
+            os.path.join(source_data_path, f'{pollutant_id}.csv'))
         df_pollutant = df_pollutant.tz_localize(None)
         df_gen = __merge_column_by_index(pollutant_id, df_gen, df_pollutant,
                                          settings.AQI_COLUMN_NAME)
@@ -178,16 +178,14 @@ def merge_and_save_aqi_per_pollutants_and_weather(
                                              date_cur_from, date_cur_end)
 
     df_aqi = pd.concat([df_aqi_prev, df_aqi_cur])
-    df_weather_prev_years = pd.read_csv(weather_prev_years_file_path,
-                                        index_col=settings.DATE_WEATHER_COLUMN_NAME,
-                                        parse_dates=True)
-    df_weather_cur_year = pd.read_csv(weather_cur_year_file_path,
-                                      index_col=settings.DATE_WEATHER_COLUMN_NAME,
-                                      parse_dates=True)
+    df_weather_prev_years = dataset_io.read_dataset(
+        weather_prev_years_file_path, index_col=settings.DATE_WEATHER_COLUMN_NAME)
+    df_weather_cur_year = dataset_io.read_dataset(
+        weather_cur_year_file_path, index_col=settings.DATE_WEATHER_COLUMN_NAME)
     df_weather = pd.concat([df_weather_prev_years, df_weather_cur_year])
     df_all = df_aqi.merge(df_weather, how='left', left_index=True,
                           right_index=True)
-    df_all.to_csv(output_file_path)
+    dataset_io.write_dataset(df_all, output_file_path)
 
 
 def merge_and_save_aqi_enriched_and_weather(
@@ -204,22 +202,16 @@ def merge_and_save_aqi_enriched_and_weather(
     @param weather_cur_year_file_path: The path to clean weather data with cur_year
     @param output_file_path: The output file path
     """
-    df_aqi_prev_years = pd.read_csv(aqi_prev_years_file_path,
-                                    index_col=settings.DATE_COLUMN_NAME,
-                                    parse_dates=True)
-    df_aqi_cur_year = pd.read_csv(aqi_cur_year_file_path,
-                                  index_col=settings.DATE_COLUMN_NAME,
-                                  parse_dates=True)
+    df_aqi_prev_years = dataset_io.read_dataset(aqi_prev_years_file_path)
+    df_aqi_cur_year = dataset_io.read_dataset(aqi_cur_year_file_path)
     df_aqi = pd.concat([df_aqi_prev_years, df_aqi_cur_year])
-    df_weather_prev_years = pd.read_csv(weather_prev_years_file_path,
-                                        index_col=settings.DATE_WEATHER_COLUMN_NAME,
-                                        parse_dates=True)
-    df_weather_cur_year = pd.read_csv(weather_cur_year_file_path,
-                                      index_col=settings.DATE_WEATHER_COLUMN_NAME,
-                                      parse_dates=True)
+    df_weather_prev_years = dataset_io.read_dataset(
+        weather_prev_years_file_path, index_col=settings.DATE_WEATHER_COLUMN_NAME)
+    df_weather_cur_year = dataset_io.read_dataset(
+        weather_cur_year_file_path, index_col=settings.DATE_WEATHER_COLUMN_NAME)
     df_weather = pd.concat([df_weather_prev_years, df_weather_cur_year])
     df_all = df_weather.merge(df_aqi, how='left', left_index=True,
                               right_index=True)
     # df_all = date_gen.add_date_info(df_all)
     df_all.index.name = settings.DATE_COLUMN_NAME
-    df_all.to_csv(output_file_path)
+    dataset_io.write_dataset(df_all, output_file_path)
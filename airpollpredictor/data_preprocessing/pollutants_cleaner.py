@@ -7,6 +7,7 @@ import warnings
 import numpy as np
 import pandas as pd
 from settings import settings
+from data_preprocessing import dtypes_schema
 
 
 def drop_sampling_unverified_duplicates(pollutants_codes: [int],
@@ -45,8 +46,8 @@ def fix_non_hour_intervals(pollutants_codes: list[int],
     for i in range(len(pollutants_codes)):
         if df_df_days[i] is None:
             continue
-        df_list[i] = pd.concat([df_list[i], __get_hour_columns(df_df_days[i])],
-                               axis=0, ignore_index=True)
+        df_list[i] = dtypes_schema.concat_frames([df_list[i], __get_hour_columns(df_df_days[i])],
+                                                 axis=0, ignore_index=True)
 
 
 def remove_unused_columns(pollutants_codes: list[int],
@@ -8,7 +8,10 @@ import pandas as pd
 from settings import settings
 from .features_generations import ts_lag_features_generator as lag_gen
 from .features_generations import ts_date_features_generator as date_gen
+from .features_generations.features_cache import FeaturesCache
+from .features_generations.ts_lag_features_state import LagFeaturesState
 from .aqi_calculations import aqi_calculator as aqc
+from . import dataset_io
 
 CONCENTRATION_AGGREGATES = ['mean']
 CONCENTRATION_AGGREGATES_FOR_LAGS = ['mean']
@@ -23,7 +26,10 @@ def generate_features(df_aqi_mean: pd.DataFrame,
                       windows_filters_aqi: dict,
                       methods_agg_aqi: list[str],
                       lags_agg_aqi: list[int],
-                      ewm_filters_aqi: dict):
+                      ewm_filters_aqi: dict,
+                      workers_count: int = 1,
+                      features_cache: FeaturesCache = None,
+                      required_columns: list = None):
     """
     Generates lag and data features for pollutants and saves the result to one file
     @param df_aqi_mean: Merged dataframe
@@ -39,6 +45,12 @@ def generate_features(df_aqi_mean: pd.DataFrame,
     (for AQI columns)
     @param ewm_filters_aqi: The dictionary of lags for Exponential Moving Average
     per filter (for AQI columns)
+    @param workers_count: The number of processes to generate lag features
+    for the filters in parallel
+    @param features_cache: The cache of the lag features blocks, cached blocks are loaded
+    and only the missing ones are generated
+    @param required_columns: The names of the required columns (e.g. the features of the model),
+    only the lag features blocks with them are generated
     @return:
     """
     df_gen = date_gen.add_date_info(df_aqi_mean)
@@ -57,11 +69,90 @@ def generate_features(df_aqi_mean: pd.DataFrame,
                                   preagg_methods=CONCENTRATION_AGGREGATES,
                                   agg_methods=methods_agg_aqi,
                                   dynamic_filters=filters_aqi + [NO_FILTER],
-                                  ewm_params=ewm_filters_aqi
+                                  ewm_params=ewm_filters_aqi,
+                                  workers_count=workers_count,
+                                  features_cache=features_cache,
+                                  required_columns=required_columns
                                   )
     return df_gen
 
 
+def generate_features_online(df_aqi_mean: pd.DataFrame,
+                             pollutants_codes: list[int],
+                             lags_shift: list[int],
+                             filters_aqi: list[str],
+                             windows_filters_aqi: dict,
+                             methods_agg_aqi: list[str],
+                             lags_agg_aqi: list[int],
+                             ewm_filters_aqi: dict,
+                             features_state: LagFeaturesState = None,
+                             df_prev: pd.DataFrame = None,
+                             required_columns: list = None) \
+        -> tuple[pd.DataFrame, LagFeaturesState]:
+    """
+    Generates lag and data features like generate_features, but the lag features are calculated
+    by the state only for the days after the last day of the state, the rows of the previous days
+    are taken from the result of the previous run. The last day can be incomplete,
+    so it is not added to the state and is calculated again in the next run
+    @param df_aqi_mean: Merged dataframe
+    @param pollutants_codes: The list of pollutant codes
+    @param lags_shift: The list of lags for the shift
+    @param filters_aqi: The list of columns for the lags filtering
+    (for AQI columns)
+    @param windows_filters_aqi: The dictionary of windows for rolling calculations
+    per filter (for AQI columns)
+    @param methods_agg_aqi: The list of aggregation methods for rolling calculations
+    (for AQI columns)
+    @param lags_agg_aqi: The list of lags for the shift for calculated aggregates
+    (for AQI columns)
+    @param ewm_filters_aqi: The dictionary of lags for Exponential Moving Average
+    per filter (for AQI columns)
+    @param features_state: The state of the previous run, all the days are calculated if None
+    or if the state has other features
+    @param df_prev: The result of the previous run
+    @param required_columns: The names of the required columns (e.g. the features of the model),
+    only the lag features blocks with them are generated
+    @return: Dataframe with the features and the state with all the days except the last one
+    """
+    df_gen = date_gen.add_date_info(df_aqi_mean)
+    df_gen = __get_lag_data_shift(pollutants_codes=pollutants_codes,
+                                  df_gen=df_gen,
+                                  lags=lags_shift)
+    df_gen[NO_FILTER] = 1
+    target_cols = __get_aqi_columns(pollutants_codes, df_gen)
+    blocks_params = {'target_cols': target_cols, 'id_cols': ID_COLS, 'lags': lags_agg_aqi,
+                     'windows': windows_filters_aqi, 'preagg_methods': CONCENTRATION_AGGREGATES,
+                     'agg_methods': methods_agg_aqi, 'dynamic_filters': filters_aqi + [NO_FILTER],
+                     'ewm_params': ewm_filters_aqi}
+    if required_columns is None:
+        blocks = lag_gen.get_features_blocks(**blocks_params)
+    else:
+        target_cols, blocks = lag_gen.plan_features_blocks(required_columns, **blocks_params)
+
+    features_names = [name for block in blocks for name in block['columns']]
+    if features_state is None or df_prev is None or features_state.last_date is None \
+            or features_state.features_names != features_names \
+            or df_prev.index.max() < features_state.last_date:
+        features_state = LagFeaturesState(target_cols, ID_COLS, settings.DATE_COLUMN_NAME, blocks)
+        df_prev = None
+
+    df_new = lag_gen.adjust_datetime_indices(df_gen, settings.DATE_COLUMN_NAME)
+    if df_prev is not None:
+        df_prev = df_prev[df_prev.index <= features_state.last_date]
+        df_new = df_new[df_new.index > features_state.last_date]
+    if df_new.shape[0] == 0:
+        return df_prev, features_state
+    last_day = df_new.index.max()
+    df_features = [features_state.update(df_new[df_new.index < last_day])] \
+        if (df_new.index < last_day).any() else []
+    df_features.append(LagFeaturesState.from_dict(features_state.to_dict())
+                       .update(df_new[df_new.index == last_day]))
+    df_new = pd.concat([df_new, pd.concat(df_features)], axis=1)
+    if df_prev is not None:
+        df_new = pd.concat([df_prev, df_new])
+    return df_new, features_state
+
+
 def calc_aqi_and_mean_concentration_and_merge(
         source_data_path: str, pollutants_codes: list[int],
         date_from: str, date_end: str) -> pd.DataFrame:
@@ -98,8 +189,8 @@ def __merge_column_by_index(pollutant_id: int, df_gen: pd.DataFrame, df_to_merge
 def __merge_pollutants(
         source_data_path: str, pollutants_codes: list[int], df_gen: pd.DataFrame) -> pd.DataFrame:
     for pollutant_id in pollutants_codes:
-        df_pollutant = pd.read_csv(os.path.join(source_data_path, f'{pollutant_id}.csv'),
-                                   parse_dates=True, index_col=settings.DATE_COLUMN_NAME)
+        df_pollutant = dataset_io.read_dataset(
+            os.path.join(source_data_path, f'{pollutant_id}.csv'))
         df_pollutant = df_pollutant.tz_localize(None)
         df_gen = __merge_column_by_index(pollutant_id, df_gen, df_pollutant,
                                          settings.AQI_COLUMN_NAME)
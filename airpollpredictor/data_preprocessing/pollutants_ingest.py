@@ -0,0 +1,174 @@
+# pylint: disable=E0401, R0913, R0914
+"""
+Module for the streaming ingest of the raw EEA files of the pollutants.
+The files are read in chunks. The cleaning steps of pollutants_cleaner that need only
+the rows of a chunk (negative values, non-hour intervals) are applied per chunk, then
+the chunks are appended to a staging Parquet dataset partitioned by pollutant, year
+and bucket of the station. The unverified duplicates (the same station and time)
+are dropped per partition, so the raw columns of only one partition are kept in memory
+whatever the number of stations. The result is saved as the dataset partitioned
+by pollutant, year and bucket: <output_path>/<pollutant_id>/<year>/<bucket>.parquet,
+the buckets of a year are read in the order of the dates by the k-way merge of their batches
+"""
+
+import glob
+import os
+from typing import Iterator
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from settings import settings
+from data_preprocessing import csv_files_reader, dataset_io, dtypes_schema
+from data_preprocessing import pollutants_cleaner as pol_cleaner
+
+_STATION_COLUMN_NAME = 'AirQualityStation'
+_VERIFICATION_COLUMN_NAME = 'Verification'
+_STAGING_COLUMNS = [_STATION_COLUMN_NAME, settings.DATE_COLUMN_NAME,
+                    settings.CONCENTRATION_COLUMN_NAME, _VERIFICATION_COLUMN_NAME]
+_STAGING_FOLDER = '_staging'
+_OUTPUT_EXTENSION = '.parquet'
+_BATCH_SIZE = 100_000
+
+
+def ingest_pollutants(source_data_path: str, pollutants_codes: list[int], output_path: str,
+                      chunk_size: int = 100_000, buckets_count: int = 16,
+                      workers_count: int = 1):
+    """
+    Reads the raw files of the pollutants in chunks, cleans them
+    and saves the dataset partitioned by pollutant, year and bucket
+    @param source_data_path: The path to the source pollutant data
+    (<source_data_path>/<pollutant_id>/*.csv)
+    @param pollutants_codes: The list of pollutant codes
+    @param output_path: The path to the output dataset
+    @param chunk_size: The max number of the lines read from a file at once
+    @param buckets_count: The number of the partitions of the stations per year,
+    the more buckets the less data is kept in memory to drop the duplicates
+    @param workers_count: The number of threads to parse the files in parallel,
+    the chunks are cleaned and written in the order of the files
+    """
+    staging_path = os.path.join(output_path, _STAGING_FOLDER)
+    shutil.rmtree(staging_path, ignore_errors=True)
+    for pol_id in pollutants_codes:
+        pol_staging_path = os.path.join(staging_path, str(pol_id))
+        __stage_pollutant(glob.glob(os.path.join(source_data_path, str(pol_id), "*.csv")),
+                          pol_id, pol_staging_path, chunk_size, buckets_count, workers_count)
+        pol_output_path = os.path.join(output_path, str(pol_id))
+        shutil.rmtree(pol_output_path, ignore_errors=True)
+        os.makedirs(pol_output_path)
+        for year in sorted(os.listdir(pol_staging_path)) \
+                if os.path.exists(pol_staging_path) else []:
+            __drop_duplicates_per_year(pol_id, os.path.join(pol_staging_path, year),
+                                       os.path.join(pol_output_path, year))
+    shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def get_ingested_years(output_path: str, pol_id: int) -> list[int]:
+    """
+    Returns the years of the ingested pollutant
+    @param output_path: The path to the dataset saved by ingest_pollutants
+    @param pol_id: The pollutant code
+    @return: The sorted list of the years
+    """
+    pol_output_path = os.path.join(output_path, str(pol_id))
+    return sorted(int(year) for year in os.listdir(pol_output_path)
+                  if os.path.isdir(os.path.join(pol_output_path, year)))
+
+
+def read_ingested_pollutant(output_path: str, pol_id: int, year: int) -> pd.DataFrame:
+    """
+    Reads the clean data of the pollutant for the year, all the buckets at once
+    @param output_path: The path to the dataset saved by ingest_pollutants
+    @param pol_id: The pollutant code
+    @param year: The year
+    @return: Dataframe with DatetimeEnd index and Concentration column
+    """
+    return pd.concat(iter_ingested_pollutant(output_path, pol_id, year))
+
+
+def iter_ingested_pollutant(output_path: str, pol_id: int, year: int,
+                            batch_size: int = _BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Reads the clean data of the pollutant for the year in batches ordered by the dates.
+    The buckets are sorted by the dates, the batches are merged so only one batch
+    per bucket is kept in memory
+    @param output_path: The path to the dataset saved by ingest_pollutants
+    @param pol_id: The pollutant code
+    @param year: The year
+    @param batch_size: The max number of the rows read from a bucket at once
+    @return: Iterator of dataframes with DatetimeEnd index and Concentration column
+    """
+    year_path = os.path.join(output_path, str(pol_id), str(year))
+    batches = [__iter_bucket(os.path.join(year_path, file_name), batch_size)
+               for file_name in sorted(os.listdir(year_path))
+               if file_name.endswith(_OUTPUT_EXTENSION)]
+    buffers = [next(bucket_batches, None) for bucket_batches in batches]
+    while any(df_buffer is not None for df_buffer in buffers):
+        # rows up to the min of the last dates of the buffers can't be preceded
+        # by the rows of the next batches
+        date_cut = min(df_buffer.index[-1] for df_buffer in buffers if df_buffer is not None)
+        df_parts = []
+        for num, df_buffer in enumerate(buffers):
+            if df_buffer is None:
+                continue
+            rows_count = df_buffer.index.searchsorted(date_cut, side='right')
+            df_parts.append(df_buffer.iloc[:rows_count])
+            buffers[num] = df_buffer.iloc[rows_count:] if rows_count < df_buffer.shape[0] \
+                else next(batches[num], None)
+        yield pd.concat(df_parts).sort_index(kind='stable')
+
+
+def __stage_pollutant(files: list[str], pol_id: int, pol_staging_path: str,
+                      chunk_size: int, buckets_count: int, workers_count: int):
+    writers = {}
+    try:
+        for df_chunk in csv_files_reader.iter_csv_files(
+                files, workers_count=workers_count, chunksize=chunk_size,
+                usecols=settings.POL_USE_COLUMNS,
+                dtype=dtypes_schema.get_pol_dtypes(settings.POL_USE_COLUMNS)):
+            df_chunk = __clean_chunk(pol_id, df_chunk)
+            years = df_chunk[settings.DATE_COLUMN_NAME].dt.year
+            buckets = pd.util.hash_pandas_object(df_chunk[_STATION_COLUMN_NAME],
+                                                 index=False) % buckets_count
+            for (year, bucket), df_part in df_chunk.groupby([years, buckets], sort=False):
+                __write_part(writers, pol_staging_path, year, bucket, df_part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def __clean_chunk(pol_id: int, df_chunk: pd.DataFrame) -> pd.DataFrame:
+    df_list = [df_chunk]
+    pol_cleaner.convert_negative_values_to_nan([pol_id], df_list)
+    pol_cleaner.fix_non_hour_intervals([pol_id], df_list)
+    df_chunk = df_list[0][_STAGING_COLUMNS]
+    # the categories differ between the chunks, the staging files keep the strings
+    return df_chunk.astype({_STATION_COLUMN_NAME: str})
+
+
+def __write_part(writers: dict, pol_staging_path: str, year: int, bucket: int,
+                 df_part: pd.DataFrame):
+    table = pa.Table.from_pandas(df_part, preserve_index=False)
+    if (year, bucket) not in writers:
+        part_path = os.path.join(pol_staging_path, str(year))
+        os.makedirs(part_path, exist_ok=True)
+        writers[(year, bucket)] = pq.ParquetWriter(
+            os.path.join(part_path, f'{bucket}.parquet'), table.schema)
+    writers[(year, bucket)].write_table(table)
+
+
+def __drop_duplicates_per_year(pol_id: int, year_staging_path: str, year_output_path: str):
+    os.makedirs(year_output_path)
+    for file_name in sorted(os.listdir(year_staging_path)):
+        df_list = [pd.read_parquet(os.path.join(year_staging_path, file_name))]
+        pol_cleaner.drop_sampling_unverified_duplicates([pol_id], df_list)
+        df_bucket = df_list[0][[settings.DATE_COLUMN_NAME, settings.CONCENTRATION_COLUMN_NAME]]
+        df_bucket = df_bucket.set_index(settings.DATE_COLUMN_NAME).sort_index()
+        dataset_io.write_dataset(df_bucket, os.path.join(year_output_path, file_name))
+
+
+def __iter_bucket(file_path: str, batch_size: int) -> Iterator[pd.DataFrame]:
+    for batch in pq.ParquetFile(file_path).iter_batches(batch_size=batch_size):
+        df_batch = batch.to_pandas()
+        if df_batch.shape[0] > 0:
+            yield df_batch
@@ -0,0 +1,66 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the reader of many CSV files
+"""
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from .. import csv_files_reader
+
+
+class CsvFilesReaderTestCase(unittest.TestCase):
+    """
+    Unit tests for the reader of many CSV files
+    """
+    def setUp(self):
+        self.__data_dir = tempfile.TemporaryDirectory()
+        self.__files = []
+        for num in range(7):
+            file_path = os.path.join(self.__data_dir.name, f'NL_5_{num}_2023_timeseries.csv')
+            pd.DataFrame({'AirQualityStation': f'STA-{num % 3}',
+                          'Concentration': [num * 100 + row for row in range(num * 3)]}) \
+                .to_csv(file_path, index=False)
+            self.__files.append(file_path)
+
+    def tearDown(self):
+        self.__data_dir.cleanup()
+
+    def __read_expected(self) -> pd.DataFrame:
+        return pd.concat([pd.read_csv(file_path).assign(source=os.path.basename(file_path))
+                          for file_path in self.__files], ignore_index=True)
+
+    def test_read_csv_files(self):
+        df_files = csv_files_reader.read_csv_files(
+            self.__files, workers_count=3, source_column='source',
+            dtype={'AirQualityStation': 'category'})
+
+        self.assertIsInstance(df_files['AirQualityStation'].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(df_files.astype({'AirQualityStation': str}),
+                                      self.__read_expected())
+
+    def test_iter_csv_files_in_chunks(self):
+        df_chunks = list(csv_files_reader.iter_csv_files(
+            self.__files, workers_count=2, source_column='source', chunksize=4))
+
+        # the first file without rows gives one empty chunk, the files of 3 - 18 rows
+        # give 1 - 5 chunks
+        self.assertEqual(len(df_chunks), 1 + 1 + 2 + 3 + 3 + 4 + 5)
+        self.assertTrue(all(df_chunk.shape[0] <= 4 for df_chunk in df_chunks))
+        pd.testing.assert_frame_equal(pd.concat(df_chunks, ignore_index=True),
+                                      self.__read_expected())
+
+    def test_iter_csv_files_stopped(self):
+        files_chunks = csv_files_reader.iter_csv_files(self.__files[1:], workers_count=2,
+                                                       chunksize=2)
+        df_first = next(files_chunks)
+        files_chunks.close()
+
+        pd.testing.assert_frame_equal(df_first, pd.read_csv(self.__files[1]).iloc[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for reading and writing the datasets
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from .. import dataset_io
+
+
+class DatasetIoTestCase(unittest.TestCase):
+    """
+    Unit tests for reading and writing the datasets
+    """
+    def test_write_read_dataset(self):
+        index = pd.date_range('2022-01-01', periods=48, freq='H', tz='Etc/GMT-1',
+                              name='DatetimeEnd')
+        df_dataset = pd.DataFrame({'AQI': np.arange(48, dtype=np.float32),
+                                   'Pollutant': np.arange(48) % 3,
+                                   'weekday': index.weekday.astype(np.int8)}, index=index)
+        with tempfile.TemporaryDirectory() as datasets_path:
+            for extension in ['.parquet', '.feather']:
+                file_path = os.path.join(datasets_path, f'dataset{extension}')
+                dataset_io.write_dataset(df_dataset, file_path)
+                pd.testing.assert_frame_equal(dataset_io.read_dataset(file_path), df_dataset,
+                                              check_freq=False)
+
+            # csv keeps the values and the timezone offset, but not the dtypes
+            file_path = os.path.join(datasets_path, 'dataset.csv')
+            dataset_io.write_dataset(df_dataset, file_path)
+            pd.testing.assert_frame_equal(dataset_io.read_dataset(file_path), df_dataset,
+                                          check_dtype=False, check_freq=False,
+                                          check_index_type=False)
+
+            with self.assertRaises(ValueError):
+                dataset_io.write_dataset(df_dataset, os.path.join(datasets_path, 'dataset.xlsx'))
+
+    def test_read_dataset_columns(self):
+        index = pd.date_range('2022-01-01', periods=10, freq='D', name='DatetimeEnd')
+        df_dataset = pd.DataFrame(np.arange(40, dtype=np.float64).reshape(10, 4),
+                                  columns=['AQI', 'AQI_PM25', 'temp', 'AQI_lag7'], index=index)
+        with tempfile.TemporaryDirectory() as datasets_path:
+            for extension in ['.parquet', '.feather', '.csv']:
+                file_path = os.path.join(datasets_path, f'dataset{extension}')
+                dataset_io.write_dataset(df_dataset, file_path)
+                self.assertEqual(dataset_io.read_dataset_columns(file_path),
+                                 df_dataset.columns.tolist())
+                pd.testing.assert_frame_equal(
+                    dataset_io.read_dataset(file_path, columns=['temp', 'AQI']),
+                    df_dataset[['temp', 'AQI']], check_freq=False)
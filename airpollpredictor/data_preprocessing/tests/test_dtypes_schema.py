@@ -0,0 +1,51 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the dtypes schema of the pollutants data
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from settings import settings
+from .. import merger
+from .. import pollutants_cleaner as pol_cleaner
+
+
+class DtypesSchemaTestCase(unittest.TestCase):
+    """
+    Unit tests for the dtypes schema of the pollutants data
+    """
+    @staticmethod
+    def __write_source_file(file_path: str, station: str, averaging_time: str):
+        index = pd.date_range('2022-01-01 01:00', periods=24, freq='H', tz='Etc/GMT-1')
+        pd.DataFrame({'Countrycode': 'NL', 'Namespace': 'NL.RIVM.AQ',
+                      'AirQualityStation': station, 'SamplingPoint': f'SPO-{station}',
+                      'SamplingProcess': 'SPP-1', 'UnitOfMeasurement': 'µg/m3',
+                      'Concentration': np.linspace(-1, 40, 24),
+                      'AveragingTime': averaging_time,
+                      'DatetimeEnd': index.strftime('%Y-%m-%d %H:%M:%S %z'),
+                      'Validity': 1, 'Verification': 2}).to_csv(file_path, index=False)
+
+    def test_read_with_schema(self):
+        with tempfile.TemporaryDirectory() as source_path:
+            os.makedirs(os.path.join(source_path, '7'))
+            self.__write_source_file(os.path.join(source_path, '7', '1.csv'), 'STA-1', 'hour')
+            self.__write_source_file(os.path.join(source_path, '7', '2.csv'), 'STA-2', 'day')
+            df_list = merger.merge_dataframes_per_pollutant(source_path, [7])
+
+        df_pol = df_list[0]
+        self.assertEqual(df_pol.shape[0], 48)
+        for col, dtype in settings.POL_COLUMNS_DTYPES.items():
+            if col in df_pol.columns:
+                self.assertEqual(str(df_pol[col].dtype), dtype, col)
+        self.assertEqual(df_pol['AirQualityStation'].cat.categories.tolist(), ['STA-1', 'STA-2'])
+
+        pol_cleaner.convert_negative_values_to_nan([7], df_list)
+        pol_cleaner.fix_non_hour_intervals([7], df_list)
+        self.assertEqual(str(df_list[0]['AveragingTime'].dtype), 'category')
+        self.assertEqual(str(df_list[0][settings.CONCENTRATION_COLUMN_NAME].dtype), 'float32')
+        self.assertEqual(df_list[0].shape[0], 48 + 24 * 23)
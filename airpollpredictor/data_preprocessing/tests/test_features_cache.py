@@ -0,0 +1,117 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the lag features cache
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ..features_generations import ts_lag_features_generator as lag_gen
+from ..features_generations.features_cache import FeaturesCache
+
+SOURCE_FILE = os.path.join(os.path.dirname(__file__), 'datasets_tests',
+                           'pollutants-merged-data', 'pol_merged.csv')
+
+
+class FeaturesCacheTestCase(unittest.TestCase):
+    """
+    Unit tests for the lag features cache
+    """
+    def setUp(self):
+        date_col = 'DatetimeEnd'
+        self.__data = pd.read_csv(SOURCE_FILE, parse_dates=True, index_col=date_col)
+        self.__data['weekday'] = self.__data.index.weekday
+        self.__data['NoFilter'] = 1
+        self.__params = {'target_cols': ['AQI', 'AQI_O3'], 'id_cols': [], 'date_col': date_col,
+                         'lags': [1, 7], 'windows': {'NoFilter': ['3D'], 'weekday': ['14D']},
+                         'preagg_methods': ['mean'], 'agg_methods': ['mean', 'percentile(90)'],
+                         'dynamic_filters': ['weekday', 'NoFilter'],
+                         'ewm_params': {'NoFilter': [7]}}
+
+    def test_generate_lagged_features_cached(self):
+        data, params = self.__data, self.__params
+        expected = lag_gen.generate_lagged_features(data, **params)
+
+        with tempfile.TemporaryDirectory() as cache_path:
+            features_cache = FeaturesCache(cache_path, max_size_mb=10, segment_freq='M')
+            data_gen = lag_gen.generate_lagged_features(data, **params,
+                                                        features_cache=features_cache)
+            pd.testing.assert_frame_equal(data_gen, expected)
+            # 10 blocks by 4 months segments
+            self.assertEqual(features_cache.get_info().shape[0], 40)
+
+            # the second run loads all the blocks, a new lag adds only its blocks
+            data_gen = lag_gen.generate_lagged_features(data, **params,
+                                                        features_cache=features_cache)
+            pd.testing.assert_frame_equal(data_gen, expected)
+            params['lags'] = [1, 7, 14]
+            data_gen = lag_gen.generate_lagged_features(data, **params,
+                                                        features_cache=features_cache)
+            pd.testing.assert_frame_equal(data_gen,
+                                          lag_gen.generate_lagged_features(data, **params))
+            self.assertEqual(features_cache.get_info().shape[0], 60)
+
+            # changed input data gets new keys of the segments depending on it
+            data.iloc[-1, data.columns.get_loc('AQI')] += 1
+            lag_gen.generate_lagged_features(data, **params, features_cache=features_cache)
+            self.assertEqual(features_cache.get_info().shape[0], 75)
+
+            # the reopened cache reads the index instead of the files specs
+            pd.testing.assert_frame_equal(FeaturesCache(cache_path, max_size_mb=10).get_info(),
+                                          features_cache.get_info())
+
+    def test_appended_day_loads_history_segments(self):
+        data, params = self.__data, self.__params
+
+        with tempfile.TemporaryDirectory() as cache_path:
+            features_cache = FeaturesCache(cache_path, max_size_mb=10, segment_freq='M')
+            lag_gen.generate_lagged_features(data.iloc[:-1], **params,
+                                             features_cache=features_cache)
+            saved_keys = set(features_cache.get_info()['key'])
+
+            with mock.patch.object(features_cache, 'save_block',
+                                   wraps=features_cache.save_block) as save_block, \
+                    mock.patch.object(features_cache, 'flush',
+                                      wraps=features_cache.flush) as flush:
+                data_gen = lag_gen.generate_lagged_features(data, **params,
+                                                            features_cache=features_cache)
+
+            pd.testing.assert_frame_equal(data_gen,
+                                          lag_gen.generate_lagged_features(data, **params))
+            # only the April segments of the 10 blocks are generated, January - March are loaded
+            saved_segments = [call.kwargs['spec']['segment']
+                              for call in save_block.call_args_list]
+            self.assertEqual(saved_segments, [['2023-04-01', '2023-04-07']] * 10)
+            # the cache is purged once per generation
+            self.assertEqual(flush.call_count, 1)
+            df_info = features_cache.get_info()
+            history_keys = set(df_info.loc[df_info['segment'].str[0] < '2023-04-01', 'key'])
+            self.assertEqual(len(history_keys), 30)
+            self.assertTrue(history_keys <= saved_keys)
+
+    def test_purge_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            features_cache = FeaturesCache(cache_path, max_size_mb=10, file_format='feather')
+            values = np.arange(200000, dtype=np.float64).reshape(-1, 2)
+            for key in ['a', 'b', 'c']:
+                features_cache.save_block(key, values, ['x', 'y'])
+            np.testing.assert_array_equal(features_cache.load_block('a'), values)
+            self.assertEqual(features_cache.get_info()['key'].tolist(), ['a', 'c', 'b'])
+
+            block_size_mb = features_cache.get_info()['size_mb'].iloc[0]
+            self.assertEqual(features_cache.purge(block_size_mb * 2), 1)
+            self.assertIsNone(features_cache.load_block('b'))
+            self.assertFalse(os.path.exists(os.path.join(cache_path, 'b.feather')))
+            reopened_cache = FeaturesCache(cache_path, max_size_mb=10, file_format='feather')
+            self.assertEqual(reopened_cache.get_info()['key'].tolist(), ['a', 'c'])
+            self.assertEqual(reopened_cache.purge(), 2)
+            self.assertEqual(reopened_cache.get_info().shape[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
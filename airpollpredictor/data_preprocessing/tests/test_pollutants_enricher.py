@@ -5,8 +5,13 @@ Unit tests for AQI calculations
 """
 import datetime
 import os
+import tempfile
 import unittest
+
+import pandas as pd
+
 from .. import pollutants_enricher as pol_enrich
+from ..features_generations.ts_lag_features_state import LagFeaturesState
 
 
 class PollutantsEnricherTestCase(unittest.TestCase):
@@ -77,3 +82,38 @@ class PollutantsEnricherTestCase(unittest.TestCase):
             ewm_filters_aqi=ewm_filters_aqi
         )
         self.assertTrue(os.path.exists(output_file))
+
+    def test_generate_features_online(self):
+        """Test the lag features of the appended days calculated by the state equal to
+        the features generated for all the days"""
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        df_aqi_mean = pd.read_csv(source_file, parse_dates=True, index_col='DatetimeEnd') \
+            .drop(columns=['AQI', 'Pollutant'])
+        params = {'pollutants_codes': [7, 6001], 'lags_shift': [7],
+                  'filters_aqi': ['weekday'],
+                  'windows_filters_aqi': {'NoFilter': ['3D', '14D'], 'weekday': ['28D']},
+                  'methods_agg_aqi': ['mean', 'percentile(10)'], 'lags_agg_aqi': [1, 7],
+                  'ewm_filters_aqi': {'NoFilter': [21], 'weekday': [28]}}
+        df_expected = pol_enrich.generate_features(df_aqi_mean, **params)
+
+        # the last day of the runs is incomplete, only the last run gets the complete data
+        df_enriched, features_state = pol_enrich.generate_features_online(
+            self.__get_incomplete_last_day(df_aqi_mean.iloc[:60]), **params)
+        self.assertEqual(features_state.last_date, df_aqi_mean.index[58])
+        with tempfile.TemporaryDirectory() as state_path:
+            state_file = os.path.join(state_path, 'lag_features_state.json')
+            for end in [61, 62, 80, df_aqi_mean.shape[0]]:
+                features_state.save(state_file)
+                df_aqi_cur = df_aqi_mean.iloc[:end] if end == df_aqi_mean.shape[0] \
+                    else self.__get_incomplete_last_day(df_aqi_mean.iloc[:end])
+                df_enriched, features_state = pol_enrich.generate_features_online(
+                    df_aqi_cur, **params, features_state=LagFeaturesState.load(state_file),
+                    df_prev=df_enriched)
+
+        pd.testing.assert_frame_equal(df_enriched, df_expected, check_freq=False)
+
+    @staticmethod
+    def __get_incomplete_last_day(df_aqi_mean: pd.DataFrame) -> pd.DataFrame:
+        df_aqi_mean = df_aqi_mean.copy()
+        df_aqi_mean.iloc[-1] -= 10
+        return df_aqi_mean
@@ -0,0 +1,87 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the streaming ingest of the pollutants
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from settings import settings
+from .. import merger
+from .. import pollutants_cleaner as pol_cleaner
+from .. import pollutants_ingest
+
+
+class PollutantsIngestTestCase(unittest.TestCase):
+    """
+    Unit tests for the streaming ingest of the pollutants
+    """
+    @staticmethod
+    def __write_source_file(file_path: str, station: str, sampling_point: str,
+                            date_start: str, periods: int, freq: str, verification: int,
+                            seed: int):
+        rng = np.random.default_rng(seed)
+        index = pd.date_range(date_start, periods=periods, freq=freq, tz='Etc/GMT-1')
+        pd.DataFrame({'Countrycode': 'NL', 'Namespace': 'NL.RIVM.AQ',
+                      'AirQualityStation': station, 'SamplingPoint': sampling_point,
+                      'SamplingProcess': 'SPP-1', 'UnitOfMeasurement': 'µg/m3',
+                      'Concentration': rng.normal(20, 15, periods).round(2),
+                      'AveragingTime': 'hour' if freq == 'H' else 'day',
+                      'DatetimeEnd': index.strftime('%Y-%m-%d %H:%M:%S %z'),
+                      'Validity': 1, 'Verification': verification}).to_csv(file_path,
+                                                                            index=False)
+
+    def test_ingest_equals_in_memory_cleaning(self):
+        pol_id = 6001
+        with tempfile.TemporaryDirectory() as data_path:
+            source_path = os.path.join(data_path, 'source')
+            os.makedirs(os.path.join(source_path, str(pol_id)))
+            files = [('STA-1', 'SPO-1', '2021-12-30 01:00', 24 * 5, 'H', 1),
+                     # the duplicates of STA-1 from the unverified sampling point
+                     ('STA-1', 'SPO-2', '2021-12-31 01:00', 24 * 2, 'H', 3),
+                     ('STA-2', 'SPO-3', '2021-12-29 01:00', 24 * 4, 'H', 1),
+                     ('STA-3', 'SPO-4', '2022-01-01 00:00', 3, 'D', 1)]
+            for num, file_params in enumerate(files):
+                self.__write_source_file(os.path.join(source_path, str(pol_id), f'{num}.csv'),
+                                         *file_params, seed=num)
+
+            df_list = merger.merge_dataframes_per_pollutant(source_path, [pol_id])
+            pol_cleaner.drop_sampling_unverified_duplicates([pol_id], df_list)
+            pol_cleaner.convert_negative_values_to_nan([pol_id], df_list)
+            pol_cleaner.fix_non_hour_intervals([pol_id], df_list)
+            pol_cleaner.remove_unused_columns([pol_id], df_list)
+            merger.set_index_per_pollutant([pol_id], df_list)
+
+            ingest_path = os.path.join(data_path, 'ingest')
+            pollutants_ingest.ingest_pollutants(source_path, [pol_id], ingest_path,
+                                                chunk_size=7, buckets_count=2,
+                                                workers_count=2)
+            years = pollutants_ingest.get_ingested_years(ingest_path, pol_id)
+            df_ingested = pd.concat([pollutants_ingest.read_ingested_pollutant(
+                ingest_path, pol_id, year) for year in years])
+            self.assertEqual(os.listdir(ingest_path), [str(pol_id)])
+            self.assertEqual(sorted(os.listdir(os.path.join(ingest_path, str(pol_id), '2021'))),
+                             ['0.parquet', '1.parquet'])
+            # the buckets are merged by the dates with one small batch per bucket in memory
+            df_batches = [df_batch for year in years for df_batch
+                          in pollutants_ingest.iter_ingested_pollutant(ingest_path, pol_id, year,
+                                                                       batch_size=5)]
+
+        self.assertEqual(years, [2021, 2022])
+        self.assertGreater(len(df_batches), 2)
+        df_merged = pd.concat(df_batches)
+        self.assertTrue(df_merged.index.is_monotonic_increasing)
+        self.assertEqual(df_merged.shape, df_ingested.shape)
+        self.assertTrue(df_ingested.index.is_monotonic_increasing)
+        # the fixed offset of the dates is read from parquet as pytz.FixedOffset
+        df_ingested.index = df_ingested.index.tz_convert(df_list[0].index.tz)
+        df_expected = df_list[0].reset_index() \
+            .sort_values([settings.DATE_COLUMN_NAME, settings.CONCENTRATION_COLUMN_NAME])
+        df_ingested = df_ingested.reset_index() \
+            .sort_values([settings.DATE_COLUMN_NAME, settings.CONCENTRATION_COLUMN_NAME])
+        pd.testing.assert_frame_equal(df_ingested.reset_index(drop=True),
+                                      df_expected.reset_index(drop=True))
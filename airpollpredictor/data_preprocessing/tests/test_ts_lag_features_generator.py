@@ -27,4 +27,89 @@ class TsLagFeaturesGeneratorTestCase(unittest.TestCase):
         group_col = [filter_col] + [] + [date_col]
         preagg = 'mean'
         data_preag_filled = lag_gen.calc_preag_fill(data, group_col, date_col, target_cols, preagg)
-        self.assertTrue(data_preag_filled.shape == (97, 5))
\ No newline at end of file
+        self.assertTrue(data_preag_filled.shape == (97, 5))
+
+    def test_generate_lagged_features(self):
+        date_col = 'DatetimeEnd'
+        target_cols = ['AQI', 'AQI_O3']
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        data = pd.read_csv(source_file, parse_dates=True, index_col=date_col)
+        data['weekday'] = data.index.weekday
+        data['NoFilter'] = 1
+        data_gen = lag_gen.generate_lagged_features(
+            data, target_cols=target_cols, id_cols=[], date_col=date_col, lags=[1, 7],
+            windows={'NoFilter': ['3D'], 'weekday': ['14D']}, preagg_methods=['mean'],
+            agg_methods=['mean', 'median'], dynamic_filters=['weekday', 'NoFilter'],
+            ewm_params={'NoFilter': [7]})
+
+        self.assertTrue(data_gen.shape == (97, len(data.columns) + 2 * 2 * 5))
+        self.assertTrue('AQI_lag7d_win14D_agmedian_filtweekday' in data_gen.columns.values)
+        expected = data['AQI'].rolling(window=3, min_periods=1).mean().shift(1)
+        pd.testing.assert_series_equal(data_gen['AQI_lag1d_win3D_agmean_filtNoFilter'],
+                                       expected, check_names=False, check_freq=False)
+        expected = data['AQI_O3'].ewm(span=7).mean().shift(7)
+        pd.testing.assert_series_equal(data_gen['AQI_O3_lag7d_ewm7_filtNoFilter'],
+                                       expected, check_names=False, check_freq=False)
+
+    def test_calc_rolling_percentiles(self):
+        date_col = 'DatetimeEnd'
+        filter_col = 'weekday'
+        target_cols = ['AQI', 'AQI_O3']
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        data = pd.read_csv(source_file)
+        data[filter_col] = pd.DatetimeIndex(data[date_col]).weekday
+        data.loc[data.index[::10], 'AQI_O3'] = None
+        group_col = [filter_col] + [date_col]
+        data_preag_filled = lag_gen.calc_preag_fill(data, group_col, date_col, target_cols, 'mean')
+        percentiles = lag_gen.calc_rolling_percentiles(data_preag_filled, group_col, date_col,
+                                                      [10, 90], '28D')
+        for n_percent, df_percentile in zip([10, 90], percentiles):
+            expected = data_preag_filled.set_index(date_col).groupby(filter_col)[target_cols] \
+                .rolling(window='28D', min_periods=1).agg(lag_gen.percentile(n_percent))
+            pd.testing.assert_frame_equal(df_percentile, expected, check_exact=True)
+
+    def test_generate_lagged_features_parallel(self):
+        date_col = 'DatetimeEnd'
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        data = pd.read_csv(source_file, parse_dates=True, index_col=date_col)
+        data['weekday'] = data.index.weekday
+        data['month'] = data.index.month
+        data['NoFilter'] = 1
+        generation_params = {
+            'target_cols': ['AQI', 'AQI_O3'], 'id_cols': [], 'date_col': date_col, 'lags': [1, 7],
+            'windows': {'NoFilter': ['3D'], 'weekday': ['14D'], 'month': ['28D']},
+            'preagg_methods': ['mean'], 'agg_methods': ['mean', 'percentile(10)'],
+            'dynamic_filters': ['weekday', 'month', 'NoFilter'],
+            'ewm_params': {'NoFilter': [7], 'month': [28]}}
+        data_gen = lag_gen.generate_lagged_features(data.copy(), **generation_params)
+        data_gen_parallel = lag_gen.generate_lagged_features(data.copy(), **generation_params,
+                                                             workers_count=2)
+        pd.testing.assert_frame_equal(data_gen_parallel, data_gen, check_exact=True)
+
+    def test_generate_lagged_features_required_columns(self):
+        date_col = 'DatetimeEnd'
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        data = pd.read_csv(source_file, parse_dates=True, index_col=date_col)
+        data['weekday'] = data.index.weekday
+        data['NoFilter'] = 1
+        generation_params = {
+            'target_cols': ['AQI', 'AQI_O3'], 'id_cols': [], 'date_col': date_col,
+            'lags': [1, 7], 'windows': {'NoFilter': ['3D'], 'weekday': ['14D']},
+            'preagg_methods': ['mean'], 'agg_methods': ['mean', 'percentile(10)'],
+            'dynamic_filters': ['weekday', 'NoFilter'], 'ewm_params': {'NoFilter': [7]}}
+        required_columns = ['AQI_O3_lag7d_win14D_agpercentile(10)_filtweekday',
+                            'AQI_O3_lag1d_ewm7_filtNoFilter', 'AQI', 'Unknown_lag1d']
+
+        target_cols, blocks = lag_gen.plan_features_blocks(
+            required_columns, **{name: value for name, value in generation_params.items()
+                                 if name != 'date_col'})
+        self.assertEqual(target_cols, ['AQI_O3'])
+        self.assertEqual([block['columns'] for block in blocks], [[required_columns[0]],
+                                                                  [required_columns[1]]])
+
+        data_gen = lag_gen.generate_lagged_features(data.copy(), **generation_params)
+        data_gen_required = lag_gen.generate_lagged_features(
+            data.copy(), **generation_params, required_columns=required_columns)
+        self.assertEqual(data_gen_required.shape[1], data.shape[1] + 2)
+        pd.testing.assert_frame_equal(data_gen_required, data_gen[data_gen_required.columns],
+                                      check_exact=True)
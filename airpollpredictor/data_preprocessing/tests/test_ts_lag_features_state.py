@@ -0,0 +1,52 @@
+# pylint: disable=E0401, R0913, R0914, W0703, R0902
+
+"""
+Unit tests for the online lag features state
+"""
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from ..features_generations import ts_lag_features_generator as lag_gen
+from ..features_generations.ts_lag_features_state import LagFeaturesState
+
+
+class LagFeaturesStateTestCase(unittest.TestCase):
+    """
+    Unit tests for the online lag features state
+    """
+    def test_update_daily_equals_batch(self):
+        date_col = 'DatetimeEnd'
+        source_file = "data_preprocessing/tests/datasets_tests/pollutants-merged-data/pol_merged.csv"
+        data = pd.read_csv(source_file, parse_dates=True, index_col=date_col)
+        data['weekday'] = data.index.weekday
+        data['NoFilter'] = 1
+        params = {'target_cols': ['AQI', 'AQI_O3', 'AQI_PM25'], 'id_cols': [],
+                  'date_col': date_col, 'lags': [1, 7],
+                  'windows': {'NoFilter': ['3D', '7D'], 'weekday': ['14D']},
+                  'preagg_methods': ['mean'],
+                  'agg_methods': ['mean', 'median', 'percentile(10)', 'percentile(90)'],
+                  'dynamic_filters': ['weekday', 'NoFilter'],
+                  'ewm_params': {'NoFilter': [7, 14], 'weekday': [28]}}
+        data_batch = lag_gen.generate_lagged_features(data, **params)
+
+        history_count = 60
+        features_state = LagFeaturesState.from_params(**params)
+        data_online = [features_state.update(data.iloc[:history_count])]
+        with tempfile.TemporaryDirectory() as state_path:
+            state_file = os.path.join(state_path, 'lag_features_state.json')
+            for day_num in range(history_count, data.shape[0]):
+                features_state.save(state_file)
+                features_state = LagFeaturesState.load(state_file)
+                data_online.append(features_state.update(data.iloc[day_num:day_num + 1]))
+        data_online = pd.concat(data_online)
+
+        self.assertEqual(data_online.columns.tolist(), features_state.features_names)
+        self.assertEqual(features_state.last_date, data.index[-1])
+        pd.testing.assert_frame_equal(data_online,
+                                      data_batch[features_state.features_names],
+                                      check_freq=False)
+        with self.assertRaises(ValueError):
+            features_state.update(data.iloc[-1:])
@@ -7,18 +7,18 @@ Module for cleaning weather data
 import numpy as np
 import pandas as pd
 from settings import settings
+from data_preprocessing import dataset_io
 
 
 def read_data(source_file_path: str, columns: list[str]):
     """
     Cleans weather data and saves the result
-    @param source_file_path: The path to source weather file
+    @param source_file_path: The path to source weather file (.parquet, .feather, .csv)
     @param columns: Required weather columns
     """
-    df_weather = pd.read_csv(source_file_path,
-                             usecols=columns + [settings.DATE_WEATHER_COLUMN_NAME],
-                             index_col=settings.DATE_WEATHER_COLUMN_NAME,
-                             parse_dates=True)
+    df_weather = dataset_io.read_dataset(source_file_path,
+                                         index_col=settings.DATE_WEATHER_COLUMN_NAME,
+                                         columns=columns)
 
     df_weather.reset_index(inplace=True)
     df_weather['date'] = pd.DatetimeIndex(df_weather['date'])
@@ -3,12 +3,14 @@ DVC Stage calculate-aqi - calculates AQI fro loaded and cleaned data
 """
 # pylint: disable=E0401
 
+import os
 from argparse import ArgumentParser
 import yaml
 import data_preprocessing.aqi_estimator as aqi_calc
 import data_preprocessing.merger as merger
 
 STAGE = "calculate-aqi"
+AQI_STATES_FILE = "aqi_states.json"
 
 
 def __parse_args():
@@ -19,6 +21,9 @@ def __parse_args():
                         help='Path to AQI file with cur_year')
     parser.add_argument('--output_folder', required=True, help='Path to save files with AQI')
     parser.add_argument('--params', required=True, help='Path to params')
+    parser.add_argument('--incremental', required=False, action='store_true',
+                        help='Calculate AQI only for the new days of the current year '
+                             'and append them to the saved files with AQI')
     return parser.parse_args()
 
 
@@ -30,14 +35,34 @@ if __name__ == '__main__':
         params = yaml.safe_load(file_stream)
         pollutants_codes = params["pollutants-codes"]
         date_current_year_start = params["period-settings"]["date_current_year_start"]
-    df_conc_list = merger.read_and_merge_prev_and_cur(
-        pollutants_codes, stage_args.input_folder_prev,
-        stage_args.input_folder_cur)
+    aqi_states_path = os.path.join(stage_args.output_folder, AQI_STATES_FILE)
+    stage_states = aqi_calc.read_aqi_states(aqi_states_path) \
+        if stage_args.incremental and stage_args.input_folder_cur else None
+    if stage_states is not None \
+            and stage_states["date_from"] == str(date_current_year_start) \
+            and all(str(code) in stage_states["pollutants"] for code in pollutants_codes):
+        # only the current year data is required, hours before the last calculated day
+        # needed for the rolling intervals are kept in the states
+        df_conc_list = merger.read_and_merge_prev_and_cur(
+            pollutants_codes, stage_args.input_folder_cur)
+        df_aqi_prev_list = merger.read_and_merge_prev_and_cur(
+            pollutants_codes, stage_args.output_folder)
+        df_aqi_list = aqi_calc.calculate_aqi_incremental(
+            df_conc_list, df_aqi_prev_list, pollutants_codes, stage_states["pollutants"])
+    else:
+        df_conc_list = merger.read_and_merge_prev_and_cur(
+            pollutants_codes, stage_args.input_folder_prev,
+            stage_args.input_folder_cur)
 
-    df_aqi_list = aqi_calc.calculate_aqi(df_conc_list, pollutants_codes)
-    if stage_args.input_folder_cur:
-        merger.cut_dataset_from_date(pollutants_codes, df_aqi_list,
-                                     date_current_year_start)
+        df_aqi_list = aqi_calc.calculate_aqi(df_conc_list, pollutants_codes)
+        if stage_args.input_folder_cur:
+            merger.cut_dataset_from_date(pollutants_codes, df_aqi_list,
+                                         date_current_year_start)
+        stage_states = {"date_from": str(date_current_year_start),
+                        "pollutants": aqi_calc.get_aqi_states(
+                            pollutants_codes, df_conc_list, df_aqi_list)}
     merger.save_datasets_per_pollutant(pollutants_codes, df_aqi_list,
                                        stage_args.output_folder)
+    if stage_args.incremental:
+        aqi_calc.save_aqi_states(aqi_states_path, stage_states)
     print(f'Stage {STAGE} finished')
@@ -5,9 +5,13 @@ DVC Stage clean-pollutants - cleans loaded pollutants data
 # pylint: disable=E0401
 
 from argparse import ArgumentParser
+import os
+import pandas as pd
 import yaml
 import data_preprocessing.pollutants_cleaner as pol_cleaner
 import data_preprocessing.merger as merger
+from data_preprocessing import dtypes_schema, pollutants_ingest
+from settings import settings
 
 STAGE = "clean-pollutants"
 
@@ -16,27 +20,65 @@ def __parse_args():
     parser = ArgumentParser(STAGE)
     parser.add_argument('--input_folder', required=True, help='Path to source data')
     parser.add_argument('--output_folder', required=True, help='Path to clean data')
+    parser.add_argument('--ingest_folder', required=False,
+                        help='Path to clean data partitioned by pollutant, year and bucket. '
+                             'If set, source files are read in chunks with bounded memory')
     parser.add_argument('--params', required=True, help='Path to params')
     return parser.parse_args()
 
 
-def __process_data(source_data_path: str, output_data_path: str, pol_codes: list[int]):
+def __process_data(source_data_path: str, output_data_path: str, pol_codes: list[int],
+                   workers_count: int = 1):
     df_list = merger.merge_dataframes_per_pollutant(
-        source_data_path, pol_codes)
+        source_data_path, pol_codes, workers_count=workers_count)
+    dtypes_schema.print_memory_report(f'{STAGE} read', df_list, pol_codes)
     pol_cleaner.drop_sampling_unverified_duplicates(pol_codes, df_list)
     pol_cleaner.convert_negative_values_to_nan(pol_codes, df_list)
     pol_cleaner.fix_non_hour_intervals(pol_codes, df_list)
     pol_cleaner.remove_unused_columns(pol_codes, df_list)
+    dtypes_schema.print_memory_report(f'{STAGE} cleaned', df_list, pol_codes)
     merger.set_index_per_pollutant(pol_codes, df_list)
     merger.save_datasets_per_pollutant(pol_codes, df_list, output_data_path)
 
 
+def __process_data_streaming(source_data_path: str, output_data_path: str, ingest_path: str,
+                             pol_codes: list[int], ingest_params: dict):
+    pollutants_ingest.ingest_pollutants(source_data_path, pol_codes, ingest_path,
+                                        chunk_size=ingest_params['chunk_size'],
+                                        buckets_count=ingest_params['buckets_count'],
+                                        workers_count=ingest_params['workers_count'])
+    # the batches of the buckets merged by the dates are appended one by one
+    # to keep the memory bounded
+    for pol_id in pol_codes:
+        file_path = os.path.join(output_data_path, f'{pol_id}.csv')
+        header = True
+        for year in pollutants_ingest.get_ingested_years(ingest_path, pol_id):
+            for df_batch in pollutants_ingest.iter_ingested_pollutant(
+                    ingest_path, pol_id, year, batch_size=ingest_params['chunk_size']):
+                if header:
+                    dtypes_schema.print_memory_report(f'{STAGE} batch', [df_batch], [pol_id])
+                df_batch.to_csv(file_path, mode='w' if header else 'a', header=header)
+                header = False
+        if header:
+            pd.DataFrame(columns=[settings.DATE_COLUMN_NAME, settings.CONCENTRATION_COLUMN_NAME])\
+                .to_csv(file_path, index=False)
+
+
 if __name__ == '__main__':
     print(f'Stage {STAGE} started')
     stage_args = __parse_args()
     with open(stage_args.params, 'r', encoding='UTF-8') as file_stream:
-        pollutants_codes = yaml.safe_load(file_stream)["pollutants-codes"]
-    __process_data(source_data_path=stage_args.input_folder,
-                   output_data_path=stage_args.output_folder,
-                   pol_codes=pollutants_codes)
+        params = yaml.safe_load(file_stream)
+    pollutants_codes = params["pollutants-codes"]
+    if stage_args.ingest_folder:
+        __process_data_streaming(source_data_path=stage_args.input_folder,
+                                 output_data_path=stage_args.output_folder,
+                                 ingest_path=stage_args.ingest_folder,
+                                 pol_codes=pollutants_codes,
+                                 ingest_params=params["clean-pollutants"])
+    else:
+        __process_data(source_data_path=stage_args.input_folder,
+                       output_data_path=stage_args.output_folder,
+                       pol_codes=pollutants_codes,
+                       workers_count=params.get("clean-pollutants", {}).get("workers_count", 1))
     print(f'Stage {STAGE} finished')
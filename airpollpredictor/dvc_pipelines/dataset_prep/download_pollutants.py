@@ -43,5 +43,6 @@ if __name__ == '__main__':
             country=params["country_code"],
             city=params["city"],
             station_per_pollutant=params["stations_per_pollutants"]))
-    asyncio.run(pol_loader.csv_list_load(stage_args.output_folder, urls_path))
+    asyncio.run(pol_loader.csv_list_load(stage_args.output_folder, urls_path,
+                                         revalidate=params.get("revalidate", True)))
     print(f'Stage {STAGE} finished')
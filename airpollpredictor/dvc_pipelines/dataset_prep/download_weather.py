@@ -17,6 +17,8 @@ STAGE = "download-weather"
 def __parse_args():
     parser = ArgumentParser(STAGE)
     parser.add_argument('--output_file', required=True, help='Path to save file')
+    parser.add_argument('--cache_folder', required=False, default=None,
+                        help='Path to the cached responses of Meteostat (optional)')
     parser.add_argument('--params', required=True, help='Path to params')
     parser.add_argument('--params_section', required=True, help='Section with params')
     return parser.parse_args()
@@ -29,11 +31,16 @@ if __name__ == '__main__':
     with open(stage_args.params, 'r', encoding='UTF-8') as file_stream:
         params_yaml = yaml.safe_load(file_stream)
     params = params_yaml[stage_args.params_section]
+    download_params = params_yaml.get("download-weather", {})
 
     date_from = datetime.datetime.strptime(params["date_from"], "%Y-%m-%d").date()
     date_to = datetime.datetime.strptime(params["date_to"], "%Y-%m-%d").date()
 
     asyncio.run(weather_loader.load_weather_history_from_station(
         save_file_path=stage_args.output_file, station=params["station_id"],
-        date_from=date_from, date_end=date_to))
+        date_from=date_from, date_end=date_to,
+        chunk_years=download_params.get("chunk_years", weather_loader.CHUNK_YEARS),
+        max_concurrency=download_params.get("max_concurrency",
+                                             weather_loader.MAX_CONCURRENCY),
+        cache_path=stage_args.cache_folder))
     print(f'Stage {STAGE} finished')
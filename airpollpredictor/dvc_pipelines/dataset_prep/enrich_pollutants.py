@@ -6,10 +6,15 @@ DVC Stage enrich-pollutants - add date and lag features to cleaned pollutants da
 
 from argparse import ArgumentParser
 import datetime
+import os
 
 import pandas as pd
 import yaml
 import data_preprocessing.pollutants_enricher as pol_enrich
+from data_preprocessing import dataset_io
+from data_preprocessing.features_generations.features_cache import FeaturesCache
+from data_preprocessing.features_generations.ts_lag_features_state import LagFeaturesState
+from model_tune_helpers.models_saving import json_adapter
 
 STAGE = "enrich-pollutants"
 
@@ -23,6 +28,13 @@ def __parse_args():
     parser.add_argument('--output_file', required=True, help='Path to enriched file')
     parser.add_argument('--params', required=True, help='Path to params')
     parser.add_argument('--params_section', required=True, help='Section with params')
+    parser.add_argument('--required_features_file', required=False,
+                        help='Path to json file with the features of the model, '
+                             'only the required lag features are generated')
+    parser.add_argument('--state_file', required=False,
+                        help='Path to json file with the state of the lag features of cur_year, '
+                             'only the days after the state are calculated and '
+                             'the previous days are taken from the output file')
 
     return parser.parse_args()
 
@@ -66,17 +78,49 @@ if __name__ == '__main__':
         df_aqi = df_aqi[date_cut:]
         date_save_from = datetime.datetime.strptime(date_cur_from, "%Y-%m-%d").date()
 
-    df_aqi = pol_enrich.generate_features(df_aqi_mean=df_aqi,
-                                          pollutants_codes=pollutants_codes,
-                                          lags_shift=enrich_params["lags-shifts"],
-                                          filters_aqi=enrich_params["filters"],
-                                          windows_filters_aqi=enrich_params["windows_filters_aqi"],
-                                          methods_agg_aqi=enrich_params["methods_agg_aqi"],
-                                          lags_agg_aqi=enrich_params["lag_agg_aqi"],
-                                          ewm_filters_aqi=enrich_params["ewm_filters_aqi"]
-                                          )
+    cache_params = enrich_params.get("features_cache")
+    features_cache = FeaturesCache(cache_path=cache_params["path"],
+                                   max_size_mb=cache_params["max_size_mb"],
+                                   file_format=cache_params["file_format"],
+                                   segment_freq=cache_params.get("segment_freq", "Y")) \
+        if cache_params else None
+
+    required_columns = json_adapter.read_from_json(stage_args.required_features_file) \
+        if stage_args.required_features_file else None
+
+    if stage_args.state_file is not None and stage_args.input_cur_year_folder is not None:
+        features_state, df_prev = None, None
+        if os.path.exists(stage_args.state_file) and os.path.exists(stage_args.output_file):
+            features_state = LagFeaturesState.load(stage_args.state_file)
+            df_prev = dataset_io.read_dataset(stage_args.output_file)
+        df_aqi, features_state = pol_enrich.generate_features_online(
+            df_aqi_mean=df_aqi,
+            pollutants_codes=pollutants_codes,
+            lags_shift=enrich_params["lags-shifts"],
+            filters_aqi=enrich_params["filters"],
+            windows_filters_aqi=enrich_params["windows_filters_aqi"],
+            methods_agg_aqi=enrich_params["methods_agg_aqi"],
+            lags_agg_aqi=enrich_params["lag_agg_aqi"],
+            ewm_filters_aqi=enrich_params["ewm_filters_aqi"],
+            features_state=features_state,
+            df_prev=df_prev,
+            required_columns=required_columns)
+        features_state.save(stage_args.state_file)
+    else:
+        df_aqi = pol_enrich.generate_features(
+            df_aqi_mean=df_aqi,
+            pollutants_codes=pollutants_codes,
+            lags_shift=enrich_params["lags-shifts"],
+            filters_aqi=enrich_params["filters"],
+            windows_filters_aqi=enrich_params["windows_filters_aqi"],
+            methods_agg_aqi=enrich_params["methods_agg_aqi"],
+            lags_agg_aqi=enrich_params["lag_agg_aqi"],
+            ewm_filters_aqi=enrich_params["ewm_filters_aqi"],
+            workers_count=enrich_params.get("workers_count", 1),
+            features_cache=features_cache,
+            required_columns=required_columns)
 
     df_aqi = df_aqi[date_save_from:]
-    df_aqi.to_csv(stage_args.output_file)
+    dataset_io.write_dataset(df_aqi, stage_args.output_file)
 
     print(f'Stage {STAGE} finished')
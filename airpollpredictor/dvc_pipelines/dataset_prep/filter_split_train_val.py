@@ -7,8 +7,8 @@ from argparse import ArgumentParser
 import datetime
 import pandas as pd
 import yaml
-from settings import settings
 import data_preprocessing.columns_filter as col_filter
+from data_preprocessing import dataset_io
 
 STAGE = "filter_split_train_val"
 
@@ -23,7 +23,7 @@ def __parse_args():
     return parser.parse_args()
 
 
-def __filter_columns(df_timeseries: pd.DataFrame, model_params: dict) -> pd.DataFrame:
+def __get_filtered_columns(columns: list, model_params: dict) -> list:
     pol_id = model_params["pol_id"]
     columns_filters = model_params["columns_filters"]
     columns_selected = model_params["columns_selected"]
@@ -31,8 +31,8 @@ def __filter_columns(df_timeseries: pd.DataFrame, model_params: dict) -> pd.Data
         prediction_value_type=model_params['prediction_value_type'], pol_id=pol_id)
 
     if not columns_selected and columns_filters:
-        df_filtered = col_filter.filter_data_frame(
-            df_timeseries=df_timeseries,
+        columns_filtered = col_filter.filter_columns(
+            columns=columns,
             pol_id=pol_id,
             pol_codes=columns_filters['pollutants_codes'],
             target_column_name=target_column_name,
@@ -49,8 +49,8 @@ def __filter_columns(df_timeseries: pd.DataFrame, model_params: dict) -> pd.Data
             use_weather_cols=columns_filters['use_weather_cols']
         )
     else:
-        df_filtered = df_timeseries[columns_selected]
-    return df_filtered
+        columns_filtered = columns_selected
+    return columns_filtered
 
 
 def __split_train_val(df_timeseries: pd.DataFrame, split_params: {}) \
@@ -79,13 +79,13 @@ if __name__ == '__main__':
     split_params = params["split_periods"]
     model_params = params[stage_args.params_section]
 
-    df_timeseries = pd.read_csv(stage_args.input_file, parse_dates=True,
-                                index_col=settings.DATE_COLUMN_NAME)
-
-    df_timeseries = __filter_columns(df_timeseries, model_params)
+    # only the filtered columns are read from the wide dataset
+    columns_filtered = __get_filtered_columns(
+        dataset_io.read_dataset_columns(stage_args.input_file), model_params)
+    df_timeseries = dataset_io.read_dataset(stage_args.input_file, columns=columns_filtered)
     df_train, df_val = __split_train_val(df_timeseries, split_params)
 
-    df_train.to_csv(stage_args.output_train_file)
-    df_val.to_csv(stage_args.output_val_file)
+    dataset_io.write_dataset(df_train, stage_args.output_train_file)
+    dataset_io.write_dataset(df_val, stage_args.output_val_file)
 
     print(f'Stage {STAGE} finished')
@@ -5,10 +5,9 @@ DVC Stage train_lgbm_model - trains LGBM models with updated data
 
 from argparse import ArgumentParser
 import warnings
-import pandas as pd
 import yaml
-from settings import settings
 import data_preprocessing.columns_filter as col_filter
+from data_preprocessing import dataset_io
 from model_tune_helpers import ts_splitter
 from model_tune_helpers.lgbm_optuna.optuna_lgb_search import OptunaLgbSearch
 from model_tune_helpers.models_saving import onnx_adapter, json_adapter
@@ -52,10 +51,8 @@ if __name__ == '__main__':
     target_column_name = col_filter.get_target_column(
         prediction_value_type=model_params['prediction_value_type'],
         pol_id=model_params["pol_id"])
-    df_train = pd.read_csv(stage_args.input_train_file, parse_dates=True,
-                           index_col=settings.DATE_COLUMN_NAME)
-    df_val = pd.read_csv(stage_args.input_val_file, parse_dates=True,
-                         index_col=settings.DATE_COLUMN_NAME)
+    df_train = dataset_io.read_dataset(stage_args.input_train_file)
+    df_val = dataset_io.read_dataset(stage_args.input_val_file)
     x_train, y_train = ts_splitter.extract_labels(df_train, target_column_name)
     x_val, y_val = ts_splitter.extract_labels(df_val, target_column_name)
 
@@ -10,9 +10,9 @@ import warnings
 from sklearn.model_selection import TimeSeriesSplit
 import pandas as pd
 import yaml
-from settings import settings
 import data_preprocessing.columns_filter as col_filter
-from model_tune_helpers import ts_splitter
+from data_preprocessing import dataset_io
+from model_tune_helpers import ts_splitter, features_matrix_store
 from model_tune_helpers.lgbm_optuna.optuna_lgb_search import OptunaLgbSearch
 from model_tune_helpers.models_saving import onnx_adapter, json_adapter
 from model_tune_helpers.models_saving.mlflow_adapter import MlFlowAdapter
@@ -30,6 +30,12 @@ def __parse_args():
     parser.add_argument('--output_metrics_file', required=True, help='Path to metrics file')
     parser.add_argument('--output_onnx_file', required=True, help='Path to onnx file')
     parser.add_argument('--output_pred_file', required=False, help='Path to predicts file')
+    parser.add_argument('--output_features_file', required=False,
+                        help='Path to file with the features of the model')
+    parser.add_argument('--output_train_matrix_file', required=False,
+                        help='Path to float32 matrix (.npy) of train features')
+    parser.add_argument('--output_val_matrix_file', required=False,
+                        help='Path to float32 matrix (.npy) of validation features')
     parser.add_argument('--params', required=True, help='Path to params')
     parser.add_argument('--params_section', required=True, help='Section with filter params')
     parser.add_argument('--mlflow_env_file', required=True, help='Path to env file MlFlow')
@@ -37,13 +43,19 @@ def __parse_args():
     return parser.parse_args()
 
 
-def __get_train_val(input_train_file, input_val_file, target_column):
-    df_train = pd.read_csv(input_train_file, parse_dates=True,
-                           index_col=settings.DATE_COLUMN_NAME)
-    df_val = pd.read_csv(input_val_file, parse_dates=True,
-                         index_col=settings.DATE_COLUMN_NAME)
+def __get_train_val(input_train_file, input_val_file, target_column,
+                    train_matrix_file=None, val_matrix_file=None):
+    df_train = dataset_io.read_dataset(input_train_file)
+    df_val = dataset_io.read_dataset(input_val_file)
     x_tr, y_tr = ts_splitter.extract_labels(df_train, target_column)
     x_vl, y_vl = ts_splitter.extract_labels(df_val, target_column)
+    # the trials use the memory-mapped float32 matrices instead of the float64 dataframes
+    if train_matrix_file:
+        features_matrix_store.write_matrix(x_tr, train_matrix_file)
+        x_tr = features_matrix_store.read_matrix(train_matrix_file)
+    if val_matrix_file:
+        features_matrix_store.write_matrix(x_vl, val_matrix_file)
+        x_vl = features_matrix_store.read_matrix(val_matrix_file)
     return x_tr, y_tr, x_vl, y_vl
 
 
@@ -97,7 +109,8 @@ if __name__ == '__main__':
 
     x_train, y_train, x_val, y_val = __get_train_val(
         stage_args.input_train_file, stage_args.input_val_file,
-        target_column_name)
+        target_column_name, stage_args.output_train_matrix_file,
+        stage_args.output_val_matrix_file)
 
     run_name = f'{model_params["exp_name"]}_{model_params["run_name"]}'
 
@@ -142,6 +155,9 @@ if __name__ == '__main__':
             .to_csv(stage_args.output_pred_file)
         mlflow_adapter.save_artifact_to_last_run(
             stage_args.output_pred_file, artifact_path="predictions")
+    if stage_args.output_features_file:
+        json_adapter.save_features_to_json(stage_args.output_features_file,
+                                           model_best.feature_name())
     print(f'---Model is saved')
 
     print(f'---Model trained with best params: '
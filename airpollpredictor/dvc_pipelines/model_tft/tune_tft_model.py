@@ -9,8 +9,8 @@ from argparse import ArgumentParser
 import warnings
 import pandas as pd
 import yaml
-from settings import settings
 import data_preprocessing.columns_filter as col_filter
+from data_preprocessing import dataset_io
 from model_tune_helpers.dl.tft_data_converter import TemporaryFusionTransformerAdapter
 from model_tune_helpers.models_saving.mlflow_adapter import MlFlowAdapter
 from model_tune_helpers.models_saving import lightning_adapter, json_adapter
@@ -55,8 +55,7 @@ if __name__ == '__main__':
         dataset_params=model_params["dataset_params"],
         target_column=target_column_name)
 
-    df = pd.read_csv(stage_args.input_file, parse_dates=True,
-                     index_col=settings.DATE_COLUMN_NAME)
+    df = dataset_io.read_dataset(stage_args.input_file)
     val_date_to = split_params["val_date_to"]
     df = df.loc[:val_date_to]
     tft_adapter.prepare_dataset(df=df)
@@ -0,0 +1,131 @@
+"""
+Store of the feature matrices for fitting and prediction.
+A matrix is written once as a contiguous float32 .npy file with a .json column index
+next to it. It is opened memory-mapped, so the trials and the predictor share the pages
+of the file instead of keeping float64 dataframes, and the columns are selected
+by their integer positions without casting on every call
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+_COLUMNS_EXTENSION = '.json'
+
+
+class FeaturesMatrix:
+    """
+    Float32 matrix of the features with the names of the columns
+    """
+
+    def __init__(self, values: np.ndarray, columns: list):
+        """
+        @param values: 2D array of the features values (rows x columns)
+        @param columns: The names of the columns
+        """
+        if values.ndim != 2 or values.shape[1] != len(columns):
+            raise ValueError(f'The matrix of shape {values.shape} does not match '
+                             f'{len(columns)} columns')
+        self.__values = values
+        self.__columns = pd.Index(columns)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        The float32 values of the matrix
+        """
+        return self.__values
+
+    @property
+    def columns(self) -> pd.Index:
+        """
+        The names of the columns
+        """
+        return self.__columns
+
+    @property
+    def shape(self) -> tuple:
+        """
+        The shape of the matrix (rows, columns)
+        """
+        return self.__values.shape
+
+    def get_columns_indices(self, columns: list) -> np.ndarray:
+        """
+        Returns the integer positions of the columns
+        @param columns: The names of the columns
+        @return: Array of the positions
+        """
+        indices = self.__columns.get_indexer(columns)
+        if (indices < 0).any():
+            raise KeyError(f'Columns not in the matrix: {list(pd.Index(columns)[indices < 0])}')
+        return indices
+
+    def select(self, columns: list) -> 'FeaturesMatrix':
+        """
+        Selects the columns by their integer positions
+        @param columns: The names of the columns in the required order
+        @return: The matrix of the columns, the matrix itself if all the columns are selected
+        """
+        indices = self.get_columns_indices(columns)
+        if np.array_equal(indices, np.arange(self.shape[1])):
+            return self
+        return FeaturesMatrix(np.ascontiguousarray(self.__values[:, indices]),
+                              self.__columns[indices].tolist())
+
+    def __getitem__(self, columns: list) -> 'FeaturesMatrix':
+        return self.select(columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Converts the matrix to the dataframe
+        @return: Dataframe with float32 columns
+        """
+        return pd.DataFrame(self.__values, columns=self.__columns)
+
+
+def to_float32(x_data) -> np.ndarray:
+    """
+    Returns the contiguous float32 values of the features, without a copy if they are already
+    @param x_data: FeaturesMatrix, dataframe or array of the features
+    @return: Array of the values
+    """
+    if isinstance(x_data, FeaturesMatrix):
+        x_data = x_data.values
+    elif isinstance(x_data, pd.DataFrame):
+        return x_data.to_numpy(dtype=np.float32)
+    return np.ascontiguousarray(x_data, dtype=np.float32)
+
+
+def write_matrix(x_df: pd.DataFrame, file_path: str):
+    """
+    Writes the features as the float32 matrix and the column index
+    @param x_df: Dataframe with the features
+    @param file_path: The path to the .npy file, the column index is saved to .json beside
+    """
+    values = x_df.to_numpy(dtype=np.float32)
+    tmp_file_path = f'{file_path}.tmp'
+    with open(tmp_file_path, 'wb') as file_stream:
+        np.save(file_stream, np.ascontiguousarray(values))
+    with open(__get_columns_file(file_path), 'w', encoding='UTF-8') as file_stream:
+        json.dump([str(col) for col in x_df.columns], file_stream)
+    os.replace(tmp_file_path, file_path)
+
+
+def read_matrix(file_path: str, columns: list = None, mmap: bool = True) -> FeaturesMatrix:
+    """
+    Opens the matrix written by write_matrix
+    @param file_path: The path to the .npy file
+    @param columns: The columns to select in the required order, None for all the columns
+    @param mmap: Flag if the file should be memory-mapped (read-only) instead of loaded
+    @return: The matrix of the features
+    """
+    with open(__get_columns_file(file_path), 'r', encoding='UTF-8') as file_stream:
+        matrix_columns = json.load(file_stream)
+    matrix = FeaturesMatrix(np.load(file_path, mmap_mode='r' if mmap else None), matrix_columns)
+    return matrix if columns is None else matrix.select(columns)
+
+
+def __get_columns_file(file_path: str) -> str:
+    return f'{os.path.splitext(file_path)[0]}{_COLUMNS_EXTENSION}'
@@ -11,6 +11,7 @@ import pandas as pd
 from lightgbm import early_stopping
 from lightgbm import log_evaluation
 import model_tune_helpers.lgbm_optuna.feature_importance_extractor as feat_imp
+from model_tune_helpers.features_matrix_store import FeaturesMatrix
 
 
 class OptunaLgbSearch:
@@ -35,6 +36,11 @@ class OptunaLgbSearch:
     def __init__(self, study_name: str, objective: str, metric: str, x_train, y_train, x_val, y_val,
                  default_params=None, default_category=None, categories_for_optimization=None,
                  default_top_features_count=-1):
+        """
+        @param x_train: Train features, dataframe or FeaturesMatrix.
+        The columns of FeaturesMatrix are selected by their positions for the trials
+        @param x_val: Validation features, dataframe or FeaturesMatrix
+        """
         self.study_name = study_name
         self.x_train = x_train
         self.y_train = y_train
@@ -230,9 +236,9 @@ class OptunaLgbSearch:
                                     x_val: pd.DataFrame, y_val: pd.DataFrame,
                                     pruning_callback=None, set_as_best_model=False) \
             -> (float, float, lgb.Booster):
-        lgb_train = lgb.Dataset(data=x_train, label=y_train,
+        lgb_train = lgb.Dataset(**self.__get_dataset_data(x_train), label=y_train,
                                 categorical_feature=categorical_features)
-        lgb_eval = lgb.Dataset(data=x_val, label=y_val,
+        lgb_eval = lgb.Dataset(**self.__get_dataset_data(x_val), label=y_val,
                                categorical_feature=categorical_features,
                                reference=lgb_train)
         evals_result = {}
@@ -263,7 +269,7 @@ class OptunaLgbSearch:
 
     def __run_model_cross_validation(self, params, categorical_features, x_train, y_train,
                                      cv_splitter, pruning_callback=None) -> float:
-        lgb_train = lgb.Dataset(data=x_train, label=y_train,
+        lgb_train = lgb.Dataset(**self.__get_dataset_data(x_train), label=y_train,
                                 categorical_feature=categorical_features)
         callbacks = [early_stopping(100, verbose=False), log_evaluation(0)]
 
@@ -300,16 +306,23 @@ class OptunaLgbSearch:
                                                  cv_splitter=cv_splitter,
                                                  pruning_callback=pruning_callback)
 
-    def predict_by_best_model(self, x_test: pd.DataFrame):
+    def predict_by_best_model(self, x_test: pd.DataFrame | FeaturesMatrix):
         """
         Returns the prediction for the save best model
-        @param x_test: X_test dataframe for prediction
+        @param x_test: X_test dataframe or FeaturesMatrix for prediction
         @return: The predictions
         """
         top_features = feat_imp.merge_categorical_features(
             self.best_features_list, self.best_categorical_feature)
         x_test_f = x_test[top_features]
-        return self.best_model.predict(x_test_f)
+        return self.best_model.predict(self.__get_dataset_data(x_test_f)['data'])
+
+    @staticmethod
+    def __get_dataset_data(x_data) -> dict:
+        # the float32 matrix is passed to LightGBM as is, without the conversion of a dataframe
+        if isinstance(x_data, FeaturesMatrix):
+            return {'data': x_data.values, 'feature_name': x_data.columns.tolist()}
+        return {'data': x_data}
 
     def cut_best_features(self, top_feature_count: int):
         """
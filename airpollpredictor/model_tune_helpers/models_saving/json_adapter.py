@@ -15,6 +15,16 @@ def save_params_to_json(file_path: str, params: dict):
         json.dump(params, f_stream)
 
 
+def save_features_to_json(file_path: str, features: list):
+    """
+    Save the list of the features names to json
+    @param file_path: Features file name
+    @param features: The names of the features
+    """
+    with open(file_path, 'w') as f_stream:
+        json.dump(features, f_stream)
+
+
 def save_metrics_to_json(file_path: str, train_score: float,
                          val_score: float, metric_name: str):
     """
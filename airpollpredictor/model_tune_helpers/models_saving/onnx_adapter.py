@@ -2,27 +2,46 @@
 
 # pylint: disable=E0401
 
-import numpy
+import json
 import onnx
 from onnxmltools.convert import convert_lightgbm
 import onnxruntime as rt
 import pandas as pd
 from skl2onnx.common.data_types import FloatTensorType
 import torch
+from model_tune_helpers.features_matrix_store import to_float32
+
+FEATURES_PROP = 'features'
 
 
 def save_lgbm_model(x_train_df: pd.DataFrame, model, onnx_file_path: str):
     initial_type = [('float_input', FloatTensorType([None, x_train_df.shape[1]]))]
     onnx_model = convert_lightgbm(model, initial_types=initial_type, target_opset=8)
+    # the names of the inputs are kept to generate only the required features for predictions
+    onnx.helper.set_model_props(onnx_model, {FEATURES_PROP: json.dumps(model.feature_name())})
     onnx.checker.check_model(onnx_model)
     with open(onnx_file_path, "wb") as file_stream:
         file_stream.write(onnx_model.SerializeToString())
 
 
+def get_model_features(onnx_file_path: str) -> list | None:
+    """
+    Returns the names of the features of the model saved by save_lgbm_model
+    @param onnx_file_path: Path to onnx-file with trained model
+    @return: The list of the features names or None if the model has no names
+    """
+    onnx_model = onnx.load(onnx_file_path)
+    for prop in onnx_model.metadata_props:
+        if prop.key == FEATURES_PROP:
+            return json.loads(prop.value)
+    return None
+
+
 def predict_model(x_df, onnx_file_path: str):
     """
     Loads onnx model and predict
-    @param x_df: Dataframe with feature for prediction
+    @param x_df: Dataframe, FeaturesMatrix or array with feature for prediction,
+    float32 values are passed to the model without a copy
     @param onnx_file_path: Path to onnx-file with trained model
     """
     onnx_model_pred_test = onnx.load(onnx_file_path)
@@ -30,4 +49,4 @@ def predict_model(x_df, onnx_file_path: str):
     sess = rt.InferenceSession(onnx_file_path)
     input_name = sess.get_inputs()[0].name
     label_name = sess.get_outputs()[0].name
-    return sess.run([label_name], {input_name: x_df.astype(numpy.float32).to_numpy()})[0]
+    return sess.run([label_name], {input_name: to_float32(x_df)})[0]
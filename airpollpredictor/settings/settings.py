@@ -7,6 +7,13 @@ PREDICTION_VALUE_TYPES = ['AQI']
 POL_USE_COLUMNS = ['Countrycode', 'AirQualityStation', 'SamplingPoint',
                    'SamplingProcess', 'UnitOfMeasurement', 'Concentration',
                    'AveragingTime', 'DatetimeEnd', 'Validity', 'Verification']
+# dtypes of the EEA columns applied at read time: categories for the codes,
+# float32 for the concentrations and int8 for the validity and verification flags
+POL_COLUMNS_DTYPES = {'Countrycode': 'category', 'AirQualityStation': 'category',
+                      'SamplingPoint': 'category', 'SamplingProcess': 'category',
+                      'UnitOfMeasurement': 'category', 'AveragingTime': 'category',
+                      'AirPollutant': 'category', 'Concentration': 'float32',
+                      'Validity': 'int8', 'Verification': 'int8'}
 DATE_COLUMN_NAME = 'DatetimeEnd'
 DATE_COLUMN_NUM_IND_NAME = 'date_idx'
 
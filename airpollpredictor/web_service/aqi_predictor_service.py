@@ -6,18 +6,26 @@ pollutants for the next 3 days"""
 # pylint: disable=E0401, E0611, W1514:
 
 import json
+import os
 from fastapi import FastAPI
-import pandas as pd
+from model_tune_helpers import features_matrix_store
 from model_tune_helpers.models_saving import onnx_adapter, json_adapter
-from settings import settings
+from data_preprocessing import dataset_io
 
 app = FastAPI()
 
-X_VAL_DATASET_PATH = "experiments_results/lgbm/6001/val.csv"
+X_VAL_DATASET_PATH = "experiments_results/lgbm/6001/val.parquet"
+# the deployment script writes the validation dataset as CSV
+X_VAL_CSV_DATASET_PATH = "experiments_results/lgbm/6001/val.csv"
+X_VAL_MATRIX_PATH = "experiments_results/lgbm/6001/x_val.npy"
 METRICS_PATH = "experiments_results/lgbm/6001/metrics.json"
 MODEL_PATH = "experiments_results/lgbm/6001/model.onnx"
 
 
+def __get_val_dataset_path() -> str:
+    return X_VAL_DATASET_PATH if os.path.exists(X_VAL_DATASET_PATH) else X_VAL_CSV_DATASET_PATH
+
+
 @app.get("/")
 def root():
     """
@@ -35,9 +43,15 @@ def predict():
     The model is automatically retrained afterward.
     @return: Array with 3 float values
     """
-    df_val = pd.read_csv(X_VAL_DATASET_PATH, parse_dates=True,
-                         index_col=settings.DATE_COLUMN_NAME)
-    df_val.drop(columns=['AQI_PM25'], axis=0, inplace=True)
+    # only the inputs of the model are read if the model keeps their names
+    model_features = onnx_adapter.get_model_features(MODEL_PATH)
+    if model_features is not None and os.path.exists(X_VAL_MATRIX_PATH):
+        df_val = features_matrix_store.read_matrix(X_VAL_MATRIX_PATH, columns=model_features)
+    elif model_features is None:
+        df_val = dataset_io.read_dataset(__get_val_dataset_path())
+        df_val.drop(columns=['AQI_PM25'], axis=0, inplace=True)
+    else:
+        df_val = dataset_io.read_dataset(__get_val_dataset_path(), columns=model_features)
     y_pred = onnx_adapter.predict_model(x_df=df_val, onnx_file_path=MODEL_PATH)
     result = json.dumps(list(map(float, y_pred.reshape(3))))
     return result
@@ -40,35 +40,25 @@ def converter(df_temp):
     return df
 
 ### Function which "rolls" measurements in a specific intervals as required by AQI-document
+### (i.e. column '7_8H' for O3 8H, '7_1H' for O3 1H)
 def roller(df_temp):
     df = df_temp
-    df['1_1H'] = df.iloc[:, 0:1]                                              # SO2    1H
-    df['5_24H'] = df.iloc[:, 1:2].rolling(window=24, min_periods=1).mean()    # PM10  24H
-    df['7_8H'] = df.iloc[:, 2:3].rolling(window=8, min_periods=1).mean()      # O3     8H
-    df['7_1H'] = df.iloc[:, 2:3]                                              # O3     1H
-    df['8_1H'] = df.iloc[:, 3:4]                                              # NO2    1H
-    df['10_8H'] = df.iloc[:, 4:5].rolling(window=24, min_periods=1).mean()    # CO     8H
-    df['6001_24H'] = df.iloc[:, 5:6].rolling(window=24, min_periods=1).mean() # PM2.5 24H
+    for pol_code in pol_codes:
+        for interval in sc.hourly_intervals(pol_code):
+            df[sc.rolled_column(pol_code, interval)] = \
+                df[pol_dict[pol_code]].rolling(window=interval, min_periods=1).mean()
     return df
 
 ### Function which calculates subindices for each pollutant
 def calculator(df_temp):
     df = df_temp
-    df['aqi_1'] = sc.aqi_easy_1(df, 0)
-    df['aqi_5'] = sc.aqi_easy_5(df, 1)
-    df['aqi_7_8H'] = sc.aqi_easy_7_8H(df, 2)
-    df['aqi_7_1H'] = sc.aqi_easy_7_1H(df, 2)
-    df['aqi_8'] = sc.aqi_easy_8(df, 3)
-    df['aqi_10'] = sc.aqi_easy_10(df, 4)
-    df['aqi_6001'] = sc.aqi_easy_6001(df, 5)
+    df = df.join(sc.aqi_subindices(df))
     return df
 
 ### Function which calculates final AQI from previously calculated subindices
 def combiner(df_temp):
-    df = df_temp
-    df = df.iloc[:,13:20]
-    df['aqi'] = df.iloc[:,:7].max(axis=1)
-    df = df.iloc[:,7:8]
+    df = df_temp.filter(regex='^aqi_')
+    df = df.max(axis=1).to_frame('aqi')
     return df
 
 ### Function which creates daily (24H) AQI values using hourly (1H) AQI
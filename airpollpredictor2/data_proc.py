@@ -1,10 +1,19 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 import argparse
 
+### Dtypes schema is shared with airpollpredictor package (settings.POL_COLUMNS_DTYPES)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'airpollpredictor'))
+from data_preprocessing import dtypes_schema
+
 pol_dict_rev ={'SO2': 1,'PM10': 5,'O3': 7,'NO2': 8,'CO': 10,'PM2.5': 6001}
 column_list = ['AirQualityStation', 'SamplingProcess', 'AirPollutant',\
                'AveragingTime', 'Concentration', 'DatetimeBegin', 'DatetimeEnd', 'Validity']
 drop_list = ['SamplingProcess', 'AveragingTime', 'DatetimeBegin', 'Validity', 'DatetimeDelta']
+### Dtypes applied at read time: categories for codes, float32 for concentrations, int8 for flags
+dtype_dict = dtypes_schema.get_pol_dtypes(column_list)
 
 ### Data_processor script needs to run in terminal with two named arguments
 ### inputfile - path to data file, outputfile - output file path
@@ -13,11 +22,10 @@ drop_list = ['SamplingProcess', 'AveragingTime', 'DatetimeBegin', 'Validity', 'D
 ### data_proc function accepts filepath referring to csv file
 ### then reads it, processes the copy and returns a processed copy
 def data_proc(data):
-    df = pd.read_csv(data, usecols=column_list , low_memory=True)
-    print(f'Reading data')
-    ### Convert pollutant names in main dataset to integer
-    for ele in pol_dict_rev.keys():
-        df.loc[df['AirPollutant'] == ele, 'AirPollutant'] = pol_dict_rev[ele]
+    df = pd.read_csv(data, usecols=column_list, dtype=dtype_dict, low_memory=True)
+    print(f'Reading data, memory: {memory_usage_mb(df):.1f} MB')
+    ### Convert pollutant names in main dataset to integer (only the categories are mapped)
+    df['AirPollutant'] = df['AirPollutant'].map(lambda ele: pol_dict_rev.get(ele, ele))
     print(f'Converting pollutant names')
     ### Convert columns into proper format
     df['DatetimeBegin'] = pd.to_datetime(df['DatetimeBegin'], format="%Y-%m-%d %H:%M:%S %z")
@@ -31,7 +39,7 @@ def data_proc(data):
     df = df.drop_duplicates(['AirQualityStation', 'AirPollutant', 'DatetimeEnd'], keep='first')
     print(f'Dropping duplicates')
     ### Replace all negative values with 0.0001
-    df.loc[df['Concentration'] < 0, 'Concentration'] = 0.0001
+    df.loc[df['Concentration'] < 0, 'Concentration'] = np.float32(0.0001)
     print(f'Replacing negative values')
     ### Make sure that there are only measurements where TimeDelta equals to 1 hour
     df = df[df['AveragingTime'] == 'hour'].copy()
@@ -40,9 +48,13 @@ def data_proc(data):
     print(f'Selecting data with hourly averaging time')
     ### Drop all unnecessary columns
     df.drop(columns=drop_list, inplace=True)
-    print(f'Dropping remaining unnecessary columns')
+    print(f'Dropping remaining unnecessary columns, memory: {memory_usage_mb(df):.1f} MB')
     return df
 
+### memory_usage_mb function returns the memory used by pandas dataframe in MB
+def memory_usage_mb(data) -> float:
+    return data.memory_usage(index=True, deep=True).sum() / (1024 * 1024)
+
 ### file_exp function saves pandas dataframe in chosen location
 ### It accepts pandas dataframe as first parameter
 ### and filepath for output file as second parameter
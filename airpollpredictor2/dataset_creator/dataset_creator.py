@@ -3,6 +3,10 @@ import sys
 import glob
 import pandas as pd
 
+### CSV files reader is shared with airpollpredictor package (csv_files_reader.iter_csv_files)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'airpollpredictor'))
+from data_preprocessing import csv_files_reader
+
 ### To use run *.py file with parameters separated by space
 ### Do not mix countrycodes, localIDs or citynames together
 ### The current script directory should contain data folder
@@ -24,6 +28,16 @@ def get_countrycodes() -> list[str|None]: ### extract countrycodes from data
     list_of_codes = list(set(codes))
     return list_of_codes
 
+### Function to append csv files to one output csv file file by file
+### The files are parsed in parallel, only the files parsed ahead are kept in memory,
+### so the number of files (stations) is not limited. Big files are parsed in chunks of chunksize lines
+def csv_appender(files, outputfile, workers=4, chunksize=100_000) -> None:
+    header = True
+    for df in csv_files_reader.iter_csv_files(files, workers_count=workers, chunksize=chunksize):
+        df.to_csv(outputfile, mode='w' if header else 'a', header=header,
+                  index=False, encoding='utf-8-sig' if header else 'utf-8')
+        header = False
+
 ### The following 3 functions are used to merge all csv files
 ### corresponding to specified countries, localids or cities
 def dataset_by_country(*codes) -> None:  ### pass countrycodes separated by comma
@@ -35,8 +49,7 @@ def dataset_by_country(*codes) -> None:  ### pass countrycodes separated by comm
         for code in codelist:
             if str(code).upper() in file:
                 csv2.append(file)
-    df = pd.concat([pd.read_csv(f) for f in csv2])
-    df.to_csv( "df_" + '_'.join(code for code in codelist) + ".csv", index=False, encoding='utf-8-sig')
+    csv_appender(csv2, "df_" + '_'.join(code for code in codelist) + ".csv")
     return
 
 def dataset_by_localid(*codes) -> None:  ### pass localcodes separated by comma
@@ -48,8 +61,7 @@ def dataset_by_localid(*codes) -> None:  ### pass localcodes separated by comma
         if file.split('_')[-3] in codelist:
             csv3.append(file)
     print(len(csv3))
-    df = pd.concat([pd.read_csv(file) for file in csv3])
-    df.to_csv( "df_" + '_'.join(code for code in codelist) + ".csv", index=False, encoding='utf-8-sig')
+    csv_appender(csv3, "df_" + '_'.join(code for code in codelist) + ".csv")
     return
 
 def dataset_by_city(*names) -> None:     ### pass citynames separated by comma
@@ -71,8 +83,7 @@ def dataset_by_city(*names) -> None:     ### pass citynames separated by comma
         for file in csv1:
             if int(ele) == int(file.split('_')[-3]):
                 csv4.append(file)
-    df = pd.concat([pd.read_csv(f) for f in csv4])
-    df.to_csv( "df_" + '_'.join(cityname for citynames in citynames) + ".csv", index=False, encoding='utf-8-sig')
+    csv_appender(csv4, "df_" + '_'.join(cityname for citynames in citynames) + ".csv")
     return
 
 def main() -> None:
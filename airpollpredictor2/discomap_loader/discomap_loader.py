@@ -1,10 +1,21 @@
 import os
+import io
+import sys
 import glob
-import time
+import codecs
+import asyncio
 import pathlib
-import requests
+import argparse
 import pandas as pd
-from io import StringIO
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+### CSV files reader and asyncio downloader with adaptive (AIMD) rate limiter are shared
+### with airpollpredictor package (csv_files_reader, async_downloader.AsyncDownloader)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'airpollpredictor'))
+from data_preprocessing import csv_files_reader
+from data_loaders.async_downloader import AsyncDownloader
 
 ### This is discomap URL template which can be modified according to our needs
 discomap = 'https://fme.discomap.eea.europa.eu/fmedatastreaming/AirQualityDownload/AQData_Extract.fmw?CountryCode={Countrycode}&CityName={StationCity}&Pollutant={AirPollutantCode}&Year_from={Year_from}&Year_to={Year_to}&Station={AirQualityStation}&EoICode={AirQualityStationEoICode}&Samplingpoint=&Source=All&Output=TEXT&UpdateDate=&TimeCoverage=Year'
@@ -37,28 +48,51 @@ def url_creator(discomap_url=discomap, \
         url_list1.append(temp)
     return url_list1
 
-### Function to download a lists of links to csv files
-def csv_list_loader(data_list) -> list[str]:
-    resp = requests.get('https://discomap.eea.europa.eu/map/fme/AirQualityExport.htm')
-    csv_rawlist = []
-    if resp.status_code == 200:
-        timeout_counter = 0
-        for i in range(len(data_list)):
-            try:
-                temp1 = requests.get(data_list[i], timeout=(3.07, 120)).text[3:]
-                csv_rawlist.append(temp1)
-                time.sleep(3)
-            except requests.Timeout as err:
-                print(f'Timeout during download #{i+1}')
-                csv_rawlist.append("ERROR")
-                timeout_counter = timeout_counter + 1
-                if timeout_counter>2:
-                    print(f'Discomap is temporarily unavailable for downloads')
-                    raise err
-    else:
-        print ('Error. Cannot download a list of links to csv files')
+### Shared download core for the lists of links and for the csv files (AsyncDownloader)
+### All urls are requested concurrently in one aiohttp session, the number of concurrent
+### requests (at most workers) is adapted by the rate limiter instead of fixed sleeps
+### between files. Failed urls are retried up to retries times, after 3 urls failed all
+### the attempts all the requests pause for long_pause. Errors are logged to log.txt in folder.
+### Pass the same AdaptiveRateLimiter as limiter to several calls to share the throttling of discomap.
+### Without handler the responses are saved to the files in folder, otherwise every response
+### is passed to async handler(url, response) as soon as it arrives,
+### the handler decides how to consume the body: parse, collect the text
+async def download_core(urls, folder, handler=None, workers=4, retries=3, pause=5, timeout=120,
+                        long_pause=60, limiter=None) -> dict[str, str]:
+    async with AsyncDownloader(reload_counter=retries + 1, reload_repeating_counter=3,
+                               max_requests_per_host=workers, timeout=timeout, short_pause=pause,
+                               long_pause=long_pause, rate_limiter=limiter) as downloader:
+        if handler is None:
+            downloaded = await downloader.download_files(
+                [(url, os.path.join(folder, url.split('/')[-1])) for url in urls])
+        else:
+            downloaded = await downloader.fetch_urls(urls, handler, folder)
+        for host, rate_limiter in downloader.rate_limiters.items():
+            rate_limiter.print_metrics(host)
+    return {url: 'ok' if is_downloaded else 'error' for url, is_downloaded in zip(urls, downloaded)}
+
+### Function to export the status of downloads ("ok" or "error") if there were errors
+def status_log_writer(download_status_map, folder) -> None:
+    if 'error' not in download_status_map.values():
+        print(f'There were no errors during this download attempt')
         return
-    return csv_rawlist
+    print(f'There may be unfinished downloads. Exporting download status log')
+    pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
+    with open(os.path.join(folder, 'download_status_log.txt'), 'w', encoding='UTF8') as f:
+        for key, value in download_status_map.items():
+            f.write(key + ' : ' + value + '\n')
+
+### Function to download a lists of links to csv files
+def csv_list_loader(data_list, workers=4) -> list[str]:
+    csv_texts = {}
+    async def text_saver(url, resp):
+        csv_texts[url] = await resp.text(encoding='utf-8-sig')
+    download_status_map = asyncio.run(download_core(data_list, os.getcwd(), handler=text_saver, workers=workers))
+    errors_count = list(download_status_map.values()).count('error')
+    if errors_count > 2 or errors_count == len(data_list):
+        print(f'Discomap is temporarily unavailable for downloads')
+        raise ConnectionError(f'{errors_count} lists of links to csv files were not downloaded')
+    return [csv_texts.get(url, 'ERROR') for url in data_list]
 
 ### Function to extract links to csv files into one list
 def link_extractor(csv_rawlist) -> list[str]:
@@ -78,119 +112,124 @@ def link_extractor(csv_rawlist) -> list[str]:
     return csv_list
 
 ### Function to download csv files and save them
-def csv_downloader(csv_list) -> dict[str, str]:
-    pathlib.Path(os.getcwd() + '/data').mkdir(parents=True, exist_ok=True)
-    download_status_map = {}
-    error_link_list = []
+### Responses are streamed to the files chunk by chunk, a file is renamed
+### from *.part only when it is downloaded completely
+def csv_downloader(csv_list, workers=4) -> dict[str, str]:
+    folder = pathlib.Path(os.getcwd() + '/data')
+    folder.mkdir(parents=True, exist_ok=True)
     print(f'Attempting to download')
-    for csv_link in csv_list:
-        try:
-            csv_file = str(requests.get(csv_link, timeout=(3.07, 120)).content, encoding='UTF8')
-            file_path = os.path.join(pathlib.Path(os.getcwd() + '/data'), f'{csv_link.split("/")[-1]}')
-            with open(file_path, 'w', encoding='UTF8') as f:
-                f.write(csv_file)
-            download_status_map[csv_link]='ok'
-            time.sleep(3)
-        except:
-            download_status_map[csv_link]='error'
-            error_link_list.append(csv_link)
-    if len(error_link_list)==0:
-        print(f'There were no errors during this download attempt')
-        return download_status_map
-    time.sleep(61)
-    for csv_link in error_link_list:
-        try:
-            csv_file = str(requests.get(csv_link, timeout=(3.07, 120)).content, encoding='UTF8')
-            file_path = os.path.join(pathlib.Path(os.getcwd() + '/data'), f'{csv_link.split("/")[-1]}')
-            with open(file_path, 'w', encoding='UTF8') as f:
-                f.write(csv_file)
-            download_status_map[csv_link]='ok'
-            time.sleep(3)
-        except:
-            download_status_map[csv_link]='error'
-    download_status_log = ''
-    print(f'There may be unfinished downloads. Exporting download status log')
-    for key in list(download_status_map.keys()):
-        download_status_log = download_status_log + key + ' : ' + download_status_map[key] + '\n'
-    with open(pathlib.Path(os.getcwd() + '/data' + '/download_status_log.txt'), 'w', encoding='UTF8') as f:
-                f.write(download_status_log)
+    download_status_map = asyncio.run(download_core(csv_list, folder, workers=workers))
+    status_log_writer(download_status_map, folder)
     return download_status_map
 
 ### Combine all previously downloaded csv files into one dataframe
 ### This dataframe will contain extra column with information about
 ### the source of data, if source argument is specified as "True"
-def csv_combiner(source=False) -> None:
+### The files are parsed in parallel by workers threads
+def csv_combiner(source=False, workers=4) -> None:
     print(f'Combining downloaded csv files in data folder into one dataframe')
-    if source==False:
-        df = pd.concat(map(pd.read_csv, \
-                           glob.glob(os.path.join(pathlib.Path(os.getcwd() + '/data')) + '/**/*.csv', recursive=True)))
-        return df
-    splitby = "/"
-    if os.name=='nt':
-        splitby = "\\"
-    df = pd.concat(
-        [
-            pd.read_csv(filename).assign(source=filename.split(f"{splitby}")[-1])
-            for filename in glob.glob(os.path.join(pathlib.Path(os.getcwd() + '/data')) + '/**/*.csv', recursive=True)
-        ],
-        ignore_index=True
-    )
+    files = glob.glob(os.path.join(pathlib.Path(os.getcwd() + '/data')) + '/**/*.csv', recursive=True)
+    df = csv_files_reader.read_csv_files(files, workers_count=workers,
+                                         source_column='source' if source else None)
     print(f'done')
     return df
 
-### Function to download data into dictionary
-### without saving csv files on a disk
-def stringio_loader(csv_list) -> None:
-    download_status_map = {}
-    csv_contents_map = {}
-    error_link_list = []
-    print(f'Attempting to download')
-    for csv_link in csv_list:
-        try:
-            csv_file = str(requests.get(csv_link, timeout=(3.05, 120)).content, encoding='UTF8')
-            csv_contents_map[csv_link] = csv_file
-            download_status_map[csv_link]='ok'
-            time.sleep(3)
-        except:
-            download_status_map[csv_link]='error'
-            error_link_list.append(csv_link)
-    if len(error_link_list)==0:
-        print(f'There were no errors during this download attempt')
-        return csv_contents_map
-    time.sleep(61)
-    for csv_link in error_link_list:
+### Append all previously downloaded csv files in data folder to one output csv file
+### chunk by chunk instead of combining them into one dataframe in memory
+### The output will contain extra column with the source of data, if source is "True"
+def csv_streamer(outputfile, source=False, chunksize=100_000, workers=4) -> None:
+    print(f'Appending downloaded csv files in data folder to {outputfile}')
+    header = True
+    files = glob.glob(os.path.join(pathlib.Path(os.getcwd() + '/data')) + '/**/*.csv', recursive=True)
+    for chunk in csv_files_reader.iter_csv_files(files, workers_count=workers, chunksize=chunksize,
+                                                 source_column='source' if source else None):
+        chunk.to_csv(outputfile, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    print(f'done')
+
+### Types of the numeric columns in parquet files, the other columns are strings.
+### The schema is fixed, so the batches and the files are appended to one dataset
+### even if a column of a batch is empty
+parquet_numeric_types = {'Concentration': ('float64', pa.float64()),
+                         'Validity': ('Int8', pa.int8()),
+                         'Verification': ('Int8', pa.int8())}
+
+### Function to get the partition of a csv file in parquet dataset
+### from the name of the file, i.e. DK_5_12345_2013_timeseries.csv
+### is saved as outputdir/pollutant=5/year=2013/DK_5_12345_2013_timeseries.parquet
+def parquet_path_creator(outputdir, filename) -> str:
+    parts = filename.split('_')
+    pollutant, year = (parts[1], parts[3]) if len(parts) >= 5 else ('unknown', 'unknown')
+    return os.path.join(outputdir, f'pollutant={pollutant}', f'year={year}',
+                        filename.rsplit('.', 1)[0] + '.parquet')
+
+### Function to parse one batch of csv lines and append it to parquet file
+### The writer is created by the first batch of the file
+def parquet_batch_writer(header, lines, file_path, writer, source=None):
+    df = pd.read_csv(io.BytesIO(header + b''.join(lines)), dtype=str)
+    for col, (dtype, _) in parquet_numeric_types.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col]).astype(dtype)
+    if source is not None:
+        df = df.assign(source=source)
+    if writer is None:
+        schema = pa.schema([(col, parquet_numeric_types[col][1] if col in parquet_numeric_types
+                             else pa.string()) for col in df.columns])
+        writer = pq.ParquetWriter(file_path, schema)
+    writer.write_table(pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
+    return writer
+
+### Function to download data into partitioned parquet dataset
+### without saving csv files on a disk. Every response is parsed incrementally
+### by batches of batchsize lines as it arrives, so memory is bounded by a batch
+### of the files being downloaded instead of the whole country.
+### The dataset will contain extra column with the name of the source file,
+### if source argument is specified as "True"
+def parquet_loader(csv_list, outputdir='data_parquet', source=False, workers=4, batchsize=50_000) -> dict[str, str]:
+    async def parquet_saver(url, resp):
+        filename = url.split('/')[-1]
+        file_path = parquet_path_creator(outputdir, filename)
+        pathlib.Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
+        ### hidden until complete, the files starting with "." are not read from the dataset
+        part_path = os.path.join(os.path.dirname(file_path), '.' + os.path.basename(file_path) + '.part')
+        header, lines, writer = None, [], None
         try:
-            csv_file = str(requests.get(csv_link, timeout=(3.05, 120)).content, encoding='UTF8')
-            csv_contents_map[csv_link] = csv_file
-            download_status_map[csv_link]='ok'
-            time.sleep(3)
-        except:
-            download_status_map[csv_link]='error'
-    download_status_log = ''
-    print(f'There may be unfinished downloads. Exporting download status log')
-    for key in list(download_status_map.keys()):
-        download_status_log = download_status_log + key + ' : ' + download_status_map[key] + '\n'
-    with open(pathlib.Path(os.getcwd() + '/download_status_log.txt/'), 'w', encoding='UTF8') as f:
-                f.write(download_status_log)
-    return csv_contents_map
+            async for line in resp.content:
+                if header is None:
+                    header = line.removeprefix(codecs.BOM_UTF8)
+                    continue
+                lines.append(line)
+                if len(lines) >= batchsize:
+                    writer = await asyncio.to_thread(parquet_batch_writer, header, lines, part_path,
+                                                     writer, filename if source else None)
+                    lines = []
+            if header is None:
+                raise ValueError(f'{filename} is empty')
+            if lines or writer is None:
+                writer = await asyncio.to_thread(parquet_batch_writer, header, lines, part_path,
+                                                 writer, filename if source else None)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(part_path, file_path)
+    print(f'Attempting to download')
+    pathlib.Path(outputdir).mkdir(parents=True, exist_ok=True)
+    download_status_map = asyncio.run(download_core(csv_list, outputdir, handler=parquet_saver, workers=workers))
+    status_log_writer(download_status_map, os.getcwd())
+    return download_status_map
 
-### Combine all downloaded csv data within dict into dataframe
-### This dataframe will contain extra column with information about
-### the source of data, if source argument is specified as "True"
-def stringio_combiner(dict1, source=False) -> None:
-    print(f'Combining downloaded csv files within "csv_contents_map" into one dataframe')
-    csv_contents_map = dict1
-    if source==False:
-        df = pd.concat([pd.read_csv(StringIO(ele)) for ele in list(csv_contents_map.values())])
-        return df
-    splitby = "/"
-    df = pd.concat(
-        [
-            pd.read_csv(StringIO(csv_contents_map[key])).assign(source=key.split(f"{splitby}")[-1])
-            for key in list(csv_contents_map.keys())
-        ],
-        ignore_index=True
-    )
+### Combine downloaded parquet files into dataframe
+### The partitions pollutant and year are read as columns
+### If files are specified (i.e. the files of the current run) only these files are read,
+### otherwise the whole dataset in outputdir including the files of previous runs
+def parquet_combiner(outputdir='data_parquet', files=None) -> pd.DataFrame:
+    print(f'Combining downloaded parquet files in {outputdir} into one dataframe')
+    if files is None:
+        df = pd.read_parquet(outputdir)
+    else:
+        dataset = ds.dataset(files, format='parquet', partition_base_dir=outputdir,
+                             partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+        df = dataset.to_table().to_pandas()
     print(f'done')
     return df
 
@@ -201,8 +240,13 @@ def ez_data_retriever_v1(Countrycode, Year_from, Year_to, AirQualityStation, sou
     return df46
 
 ### Combined superfunction to create dataset without saving downloaded csv files
-def ez_data_retriever_v2(Countrycode, Year_from, Year_to, AirQualityStation, source1) -> None:
-    df45 = stringio_combiner(stringio_loader(link_extractor(csv_list_loader(url_creator(Countrycode=Countrycode, Year_from=Year_from, Year_to=Year_to, AirQualityStation=AirQualityStation)))),source=source1)
+### The data is streamed to partitioned parquet dataset in outputdir, the dataframe
+### contains only the files downloaded by this run, not the files of previous runs in outputdir
+def ez_data_retriever_v2(Countrycode, Year_from, Year_to, AirQualityStation, source1, outputdir='data_parquet') -> None:
+    download_status_map = parquet_loader(link_extractor(csv_list_loader(url_creator(Countrycode=Countrycode, Year_from=Year_from, Year_to=Year_to, AirQualityStation=AirQualityStation))), outputdir=outputdir, source=source1)
+    files = [parquet_path_creator(outputdir, url.split('/')[-1])
+             for url, status in download_status_map.items() if status == 'ok']
+    df45 = parquet_combiner(outputdir, files=files)
     return df45
 
 ### Script can be run in terminal with required parameters
@@ -218,6 +262,8 @@ def main() -> None:
     parser.add_argument("--station", type=str, required=False, help="AirQualityStation, for example 'STA-DK0034A'")
     parser.add_argument("--save_csv", type=str, required=False, help="specify this if csv files need to be saved")
     parser.add_argument("--source", type=bool, required=False, help="specify this if you need source within df")
+    parser.add_argument("--outputfile", type=str, required=False, help="path to combined csv file, written chunk by chunk (requires save_csv)")
+    parser.add_argument("--parquet_dir", type=str, required=False, help="folder of parquet dataset if csv files are not saved, data_parquet by default")
     args = parser.parse_args()
     params = {'Countrycode':'DK', 'Year_from':'2013', 'Year_to':'2023', 'AirQualityStation':'', 'source1':True}
     if args.countrycode:
@@ -231,9 +277,13 @@ def main() -> None:
     if args.source:
         params['source1'] = args.source
     if not args.save_csv:
-        ez_data_retriever_v2(**params)
+        ez_data_retriever_v2(**params, outputdir=args.parquet_dir or 'data_parquet')
         print(f'done')
         return
+    if args.outputfile:
+        csv_downloader(link_extractor(csv_list_loader(url_creator(Countrycode=params['Countrycode'], Year_from=params['Year_from'], Year_to=params['Year_to'], AirQualityStation=params['AirQualityStation']))))
+        csv_streamer(args.outputfile, source=params['source1'])
+        return
     ez_data_retriever_v1(**params)
     print(f'done')
     return